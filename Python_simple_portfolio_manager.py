@@ -5,203 +5,3596 @@ Created on Fri JAN 2 15:52:42 2025
 @author: Nicolas ANNON 
 """
 
-import yfinance as yf
+import argparse
+import asyncio
+import cProfile
+import contextlib
 import datetime
-import pandas as pd
-from binance.client import Client
-import matplotlib.pyplot as plt
+import functools
+import importlib
+import io
+import json
+import math
+import os
+import pstats
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from functools import lru_cache
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 
+class _ModuleParesseux:
+    """
+    Module importé seulement au premier accès à l'un de ses attributs.
+
+    Les dépendances lourdes (pandas, numpy, yfinance) ne sont ainsi chargées que par les
+    commandes qui s'en servent. Après l'import, les attributs du module sont recopiés sur
+    le mandataire : les accès suivants sont des lectures d'attribut ordinaires.
+    """
+
+    def __init__(self, nom):
+        self._nom_module = nom
+
+    def __getattr__(self, attribut):
+        module = importlib.import_module(self._nom_module)
+        self.__dict__.update(vars(module))
+        return getattr(module, attribut)
+
+
+np = _ModuleParesseux("numpy")
+pd = _ModuleParesseux("pandas")
+yf = _ModuleParesseux("yfinance")
+
+
+# ======================  CONFIGURATION  ======================
+
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+FICHIER_CONFIGURATION = os.path.join(REPERTOIRE, "portefeuille_config.json")
+
+CONFIGURATION_PAR_DEFAUT = {
+    "binance": {"api_key": None, "api_secret": None},
+    "taille_pool": 10,
+    "hors_ligne": False,
+    "ttl": {},
+    # Historique des prix persistant ; "chemin": null le désactive
+    "historique": {"chemin": os.path.join(REPERTOIRE, "historique_prix.sqlite"), "fraicheur": 900},
+    # Courbe de taux zéro-coupon (CSV ou JSON) utilisée pour valoriser les obligations
+    "courbe_taux": None,
+    # Mesures de performance (INSTRUMENTATION) actives dès le démarrage
+    "instrumentation": False,
+    # Réglages de l'ordonnanceur par fournisseur, par ex. {"binance": {"debit": 10, "capacite": 20}}
+    "limites": {},
+    # Devise de valorisation et du PnL (null : montants non convertis), durée de validité des cours
+    "devise_base": "EUR",
+    "ttl_change": 300,
+    "devise_obligations": "EUR",
+}
+
+
+def charger_configuration(chemin=None):
+    """
+    Charge la configuration des fournisseurs de données de marché.
+
+    Les valeurs sont lues dans le fichier JSON 'chemin' (par défaut portefeuille_config.json
+    à côté du script, s'il existe), puis surchargées par les variables d'environnement
+    BINANCE_API_KEY et BINANCE_API_SECRET.
+    """
+    config = json.loads(json.dumps(CONFIGURATION_PAR_DEFAUT))
+    chemin = chemin or FICHIER_CONFIGURATION
+    if os.path.exists(chemin):
+        with open(chemin, encoding="utf-8") as fichier:
+            lu = json.load(fichier)
+        for cle, valeur in lu.items():
+            if isinstance(valeur, dict) and isinstance(config.get(cle), dict):
+                config[cle].update(valeur)
+            else:
+                config[cle] = valeur
+    config["binance"]["api_key"] = os.environ.get("BINANCE_API_KEY", config["binance"]["api_key"])
+    config["binance"]["api_secret"] = os.environ.get("BINANCE_API_SECRET", config["binance"]["api_secret"])
+    return config
+
+
+# ======================  INSTRUMENTATION  ======================
+
+# Bornes (en millisecondes) des classes des histogrammes de latence par symbole
+BORNES_LATENCE_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class _Chronometre:
+    __slots__ = ("instrumentation", "nom", "debut")
+
+    def __init__(self, instrumentation, nom):
+        self.instrumentation = instrumentation
+        self.nom = nom
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instrumentation.enregistrer(self.nom, time.perf_counter() - self.debut)
+        return False
+
+
+class Instrumentation:
+    """
+    Chronomètres, compteurs, histogrammes de latence par symbole et erreurs par fournisseur.
+
+    Désactivée par défaut : chaque point de mesure se réduit alors à un test de 'actif'.
+    Le profilage cProfile est indépendant et ne couvre que les tâches lancées par profiler().
+    """
+
+    def __init__(self):
+        self.actif = False
+        self.profilage = False
+        self._verrou = threading.Lock()
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        with self._verrou:
+            self.durees = {}      # nom -> [nombre, total, max] (secondes)
+            self.compteurs = {}
+            self.latences = {}    # symbole -> [nombre, total, max, effectifs par classe]
+            self.erreurs = {}     # fournisseur -> {type d'exception: nombre}
+            self._profils = []
+
+    def mesurer(self, nom):
+        """
+        Gestionnaire de contexte chronométrant son bloc sous 'nom'.
+        """
+        return _Chronometre(self, nom) if self.actif else nullcontext()
+
+    def enregistrer(self, nom, duree):
+        with self._verrou:
+            duree_nom = self.durees.get(nom)
+            if duree_nom is None:
+                self.durees[nom] = [1, duree, duree]
+            else:
+                duree_nom[0] += 1
+                duree_nom[1] += duree
+                duree_nom[2] = max(duree_nom[2], duree)
+
+    def compter(self, nom, nombre=1):
+        if self.actif:
+            with self._verrou:
+                self.compteurs[nom] = self.compteurs.get(nom, 0) + nombre
+
+    def latence(self, symboles, duree):
+        """
+        Ajoute 'duree' à l'histogramme de chacun des symboles servis par un même appel.
+        """
+        classe = np.searchsorted(BORNES_LATENCE_MS, duree * 1000)
+        with self._verrou:
+            for symbole in symboles:
+                latence = self.latences.get(symbole)
+                if latence is None:
+                    latence = self.latences[symbole] = [0, 0.0, 0.0, [0] * (len(BORNES_LATENCE_MS) + 1)]
+                latence[0] += 1
+                latence[1] += duree
+                latence[2] = max(latence[2], duree)
+                latence[3][classe] += 1
+
+    def erreur(self, fournisseur, exception):
+        if self.actif:
+            with self._verrou:
+                erreurs = self.erreurs.setdefault(fournisseur, {})
+                type_erreur = type(exception).__name__
+                erreurs[type_erreur] = erreurs.get(type_erreur, 0) + 1
+
+    def profiler(self, fonction, *args, **kwargs):
+        """
+        Exécute fonction(*args, **kwargs), sous cProfile si le profilage est activé.
+        Chaque exécution a son propre profil (cProfile ne suit que le thread courant).
+        """
+        if not self.profilage:
+            return fonction(*args, **kwargs)
+        profil = cProfile.Profile()
+        try:
+            return profil.runcall(fonction, *args, **kwargs)
+        finally:
+            with self._verrou:
+                self._profils.append(profil)
+
+    def rapport_profil(self, lignes=30, tri="cumulative"):
+        """
+        Retourne les 'lignes' fonctions les plus coûteuses de l'ensemble des profils capturés.
+        """
+        with self._verrou:
+            profils = list(self._profils)
+        if not profils:
+            return "Aucun profil capturé."
+        sortie = io.StringIO()
+        pstats.Stats(*profils, stream=sortie).sort_stats(tri).print_stats(lignes)
+        return sortie.getvalue()
+
+    @staticmethod
+    def _quantile(effectifs, q):
+        seuil = q * sum(effectifs)
+        cumul = 0
+        for borne, effectif in zip(BORNES_LATENCE_MS + (float("inf"),), effectifs):
+            cumul += effectif
+            if cumul >= seuil:
+                return borne
+        return float("inf")
+
+    def statistiques(self):
+        """
+        Retourne toutes les mesures sous forme de dictionnaire sérialisable en JSON.
+        Les quantiles de latence sont les bornes supérieures (ms) des classes de l'histogramme.
+        """
+        etiquettes = [f"<={borne}ms" for borne in BORNES_LATENCE_MS] + [f">{BORNES_LATENCE_MS[-1]}ms"]
+        with self._verrou:
+            return {
+                "actif": self.actif,
+                "durees": {nom: {"nombre": nombre, "total_s": total, "moyenne_s": total / nombre, "max_s": maximum}
+                           for nom, (nombre, total, maximum) in self.durees.items()},
+                "compteurs": dict(self.compteurs),
+                "erreurs": {fournisseur: dict(erreurs) for fournisseur, erreurs in self.erreurs.items()},
+                "latences": {symbole: {"nombre": nombre, "moyenne_s": total / nombre, "max_s": maximum,
+                                       "p50_ms": self._quantile(effectifs, 0.5),
+                                       "p95_ms": self._quantile(effectifs, 0.95),
+                                       "histogramme": dict(zip(etiquettes, effectifs))}
+                             for symbole, (nombre, total, maximum, effectifs) in self.latences.items()},
+                "cache": CACHE_PRIX.statistiques() if "CACHE_PRIX" in globals() else None,
+            }
+
+    def exporter_json(self, chemin):
+        with open(chemin, "w", encoding="utf-8") as fichier:
+            json.dump(self.statistiques(), fichier, indent=2, default=str)
+
+    def resume(self, symboles=10):
+        """
+        Texte lisible des mesures : chronomètres par temps total décroissant, compteurs,
+        erreurs et symboles les plus lents.
+        """
+        stats = self.statistiques()
+        lignes = [f"{'Mesure':<45}{'Nombre':>8}{'Total (s)':>12}{'Moy. (ms)':>12}{'Max (ms)':>12}"]
+        for nom, duree in sorted(stats["durees"].items(), key=lambda item: -item[1]["total_s"]):
+            lignes.append(f"{nom:<45}{duree['nombre']:>8}{duree['total_s']:>12.3f}"
+                          f"{duree['moyenne_s'] * 1000:>12.2f}{duree['max_s'] * 1000:>12.2f}")
+        if stats["compteurs"]:
+            lignes += ["", "Compteurs :"] + [f"  {nom}: {valeur}" for nom, valeur in sorted(stats["compteurs"].items())]
+        if stats["erreurs"]:
+            lignes += ["", "Erreurs par fournisseur :"]
+            lignes += [f"  {fournisseur}: {erreurs}" for fournisseur, erreurs in stats["erreurs"].items()]
+        if stats["cache"]:
+            lignes += ["", f"Cache de prix : {stats['cache']}"]
+        lents = sorted(stats["latences"].items(), key=lambda item: -item[1]["moyenne_s"])[:symboles]
+        if lents:
+            lignes += ["", "Symboles les plus lents (latence moyenne, p95) :"]
+            lignes += [f"  {symbole}: {latence['moyenne_s'] * 1000:.1f} ms, p95 <= {latence['p95_ms']} ms "
+                       f"({latence['nombre']} appels)" for symbole, latence in lents]
+        return "\n".join(lignes)
+
+
+INSTRUMENTATION = Instrumentation()
+
+
+def chronometre(nom):
+    """
+    Décorateur chronométrant chaque appel de la fonction sous 'nom'.
+    """
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if not INSTRUMENTATION.actif:
+                return fonction(*args, **kwargs)
+            with _Chronometre(INSTRUMENTATION, nom):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorateur
+
+
+def mesure_fournisseur(fonction):
+    """
+    Décorateur des méthodes prix_actuels / historique des fournisseurs : chronomètre l'appel,
+    alimente l'histogramme de latence de chaque symbole servi et compte les exceptions.
+    """
+    @functools.wraps(fonction)
+    def enveloppe(self, symboles, *args, **kwargs):
+        if not INSTRUMENTATION.actif:
+            return fonction(self, symboles, *args, **kwargs)
+        servis = [symboles] if isinstance(symboles, str) else list(symboles)
+        debut = time.perf_counter()
+        try:
+            return fonction(self, symboles if isinstance(symboles, str) else servis, *args, **kwargs)
+        except Exception as e:
+            INSTRUMENTATION.erreur(self.nom, e)
+            raise
+        finally:
+            duree = time.perf_counter() - debut
+            INSTRUMENTATION.enregistrer(f"fournisseur.{self.nom}.{fonction.__name__}", duree)
+            INSTRUMENTATION.latence(servis, duree)
+    return enveloppe
+
+
+# ======================  FOURNISSEURS DE DONNÉES DE MARCHÉ  ======================
+
+class FournisseurYahoo:
+    """
+    Fournisseur de prix des actions via yfinance.
+    Tous les symboles demandés sont récupérés en une seule requête multi-ticker ;
+    les objets Ticker de l'historique sont conservés et réutilisés.
+    """
+    nom = "yahoo"
+    # La devise d'un symbole se lit dans ses métadonnées : une requête par symbole
+    devises_locales = False
+
+    def __init__(self, session=None):
+        self.session = session
+        self._tickers = {}
+
+    def _ticker(self, symbole):
+        ticker = self._tickers.get(symbole)
+        if ticker is None:
+            ticker = self._tickers[symbole] = yf.Ticker(symbole, session=self.session)
+        return ticker
+
+    @mesure_fournisseur
+    def prix_actuels(self, symboles):
+        """
+        Retourne un dictionnaire {symbole: dernier prix de clôture}.
+        Les symboles sans donnée sont absents du résultat.
+        """
+        symboles = list(symboles)
+        if not symboles:
+            return {}
+        # Une erreur est propagée : FournisseurPlanifie réessaie, puis sert les derniers prix connus
+        data = yf.download(symboles, period="5d", progress=False, session=self.session)
+        if data is None or data.empty:
+            return {}
+        derniers = data["Close"].ffill().iloc[-1]
+        return {symbole: float(prix) for symbole, prix in derniers.items() if pd.notna(prix)}
+
+    @mesure_fournisseur
+    def devises(self, symboles):
+        """
+        Retourne {symbole: devise de cotation} d'après les métadonnées Yahoo (une requête par symbole).
+        Une erreur est propagée : FournisseurPlanifie demande les symboles un par un et réessaie.
+        """
+        devises = {symbole: self._ticker(symbole).fast_info["currency"] for symbole in symboles}
+        return {symbole: devise for symbole, devise in devises.items() if devise}
+
+    @mesure_fournisseur
+    def historique(self, symbole, debut, fin):
+        """
+        Retourne la série des clôtures journalières de 'symbole' entre 'debut' (inclus)
+        et 'fin' (exclu), indexée par date.
+        """
+        data = self._ticker(symbole).history(start=debut, end=fin)
+        if data.empty:
+            return pd.Series(dtype=float)
+        index = data.index.tz_localize(None) if data.index.tz is not None else data.index
+        return pd.Series(data["Close"].to_numpy(), index=index.normalize())
+
+
+class FournisseurBinance:
+    """
+    Fournisseur de prix des cryptos via l'API Binance.
+    Un seul appel "all tickers" suffit pour tous les symboles demandés.
+
+    Le client est créé une seule fois, sans ping initial, et sa session HTTP garde
+    ses connexions ouvertes (keep-alive) dans un pool de 'taille_pool' connexions.
+    Les clefs API sont optionnelles pour les données publiques de prix.
+    """
+    nom = "binance"
+    devises_locales = True
+
+    def __init__(self, api_key=None, api_secret=None, taille_pool=10):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.taille_pool = taille_pool
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from binance.client import Client
+            from requests.adapters import HTTPAdapter
+            client = Client(api_key=self.api_key, api_secret=self.api_secret, ping=False)
+            adaptateur = HTTPAdapter(pool_connections=self.taille_pool, pool_maxsize=self.taille_pool)
+            client.session.mount("https://", adaptateur)
+            self._client = client
+        return self._client
+
+    @mesure_fournisseur
+    def prix_actuels(self, symboles):
+        symboles = set(symboles)
+        if not symboles:
+            return {}
+        tickers = self.client.get_all_tickers()
+        return {t["symbol"]: float(t["price"]) for t in tickers if t["symbol"] in symboles}
+
+    def devises(self, symboles):
+        # La devise d'une paire est son actif de cotation : aucune requête
+        devises = {symbole: devise_cotation(symbole) for symbole in symboles}
+        return {symbole: devise for symbole, devise in devises.items() if devise}
+
+    @mesure_fournisseur
+    def historique(self, symbole, debut, fin):
+        from binance.client import Client
+        klines = self.client.get_historical_klines(
+            symbole, Client.KLINE_INTERVAL_1DAY, debut.strftime("%d %b, %Y"), fin.strftime("%d %b, %Y"))
+        if not klines:
+            return pd.Series(dtype=float)
+        index = pd.to_datetime([kline[0] for kline in klines], unit="ms").normalize()
+        return pd.Series([float(kline[4]) for kline in klines], index=index)
+
+
+class FournisseurObligation:
+    """
+    Prix des obligations calculés par le moteur obligataire, à partir de la courbe de taux
+    et des caractéristiques enregistrées (REGISTRE_OBLIGATIONS).
+    Sans courbe, ou pour une obligation sans date de maturité, le prix reste simulé à 100.
+    Toutes les obligations sont libellées dans 'devise'.
+    """
+    nom = "obligation"
+    devises_locales = True
+
+    def __init__(self, courbe=None, devise="EUR"):
+        self.courbe = courbe
+        self.devise = devise
+        self._livre = None
+
+    @mesure_fournisseur
+    def prix_actuels(self, symboles):
+        prix = {symbole: 100 for symbole in symboles}
+        connues = tuple(symbole for symbole in prix if symbole in REGISTRE_OBLIGATIONS)
+        if self.courbe is None or not connues:
+            return prix
+        date_valorisation = datetime.date.today()
+        # Le livre (échéanciers empilés) est conservé tant que les obligations et la date
+        # ne changent pas : un changement de courbe ne refait que l'actualisation
+        if self._livre is None or self._livre.cle != (connues, date_valorisation):
+            self._livre = LivreObligataire(connues, date_valorisation)
+        prix.update(zip(connues, self._livre.prix(self.courbe).tolist()))
+        return prix
+
+    def devises(self, symboles):
+        return dict.fromkeys(symboles, self.devise) if self.devise else {}
+
+    @mesure_fournisseur
+    def historique(self, symbole, debut, fin):
+        return pd.Series(dtype=float)
+
+
+class FournisseurLocal:
+    """
+    Fournisseur hors ligne servant des prix fixés à l'avance, pour les tests et benchmarks.
+    Compte les appels reçus, ce qui permet de tester le regroupement des requêtes ;
+    'latence' (en secondes) simule le temps d'aller-retour d'un vrai fournisseur.
+
+    'limite' = (débit, rafale) fait respecter une limite de requêtes comme un vrai fournisseur :
+    une requête en excès lève LimiteDepassee (429) ; après 'bannissement' refus consécutifs,
+    le client est banni (418) pendant 'duree_bannissement' secondes.
+    Sans 'devises' ({symbole: devise}), les montants ne sont pas convertis.
+    """
+    devises_locales = True
+
+    def __init__(self, prix=None, historiques=None, nom="local", latence=0.0, limite=None,
+                 bannissement=None, duree_bannissement=60.0, devises=None):
+        self.nom = nom
+        self.prix = dict(prix or {})
+        self._devises = dict(devises or {})
+        self.historiques = dict(historiques or {})
+        self.latence = latence
+        self.appels = 0
+        self.symboles_demandes = 0
+        self.seau = SeauJetons(*limite) if limite else None
+        self.bannissement = bannissement
+        self.duree_bannissement = duree_bannissement
+        self.refus = 0
+        self.bannissements = 0
+        self._refus_consecutifs = 0
+        self._banni_jusqua = 0.0
+
+    def _controler_limite(self):
+        if self.seau is None:
+            return
+        maintenant = time.monotonic()
+        if maintenant < self._banni_jusqua:
+            self.refus += 1
+            raise LimiteDepassee(f"{self.nom} : client banni", status_code=418,
+                                 retry_after=self._banni_jusqua - maintenant)
+        attente = self.seau.essayer()
+        if attente == 0:
+            self._refus_consecutifs = 0
+            return
+        self.refus += 1
+        self._refus_consecutifs += 1
+        if self.bannissement is not None and self._refus_consecutifs >= self.bannissement:
+            self.bannissements += 1
+            self._refus_consecutifs = 0
+            self._banni_jusqua = maintenant + self.duree_bannissement
+        raise LimiteDepassee(f"{self.nom} : trop de requêtes", retry_after=attente)
+
+    @mesure_fournisseur
+    def prix_actuels(self, symboles):
+        symboles = list(symboles)
+        self._controler_limite()
+        self.appels += 1
+        if self.latence:
+            time.sleep(self.latence)
+        self.symboles_demandes += len(symboles)
+        return {symbole: self.prix[symbole] for symbole in symboles if symbole in self.prix}
+
+    @mesure_fournisseur
+    def historique(self, symbole, debut, fin):
+        self._controler_limite()
+        self.appels += 1
+        if self.latence:
+            time.sleep(self.latence)
+        serie = self.historiques.get(symbole)
+        if serie is None:
+            return pd.Series(dtype=float)
+        return serie[(serie.index >= pd.Timestamp(debut)) & (serie.index < pd.Timestamp(fin))]
+
+    def devises(self, symboles):
+        return {symbole: self._devises[symbole] for symbole in symboles if symbole in self._devises}
+
+
+# ======================  MOTEUR OBLIGATAIRE  ======================
+
+# Caractéristiques des obligations connues, par ISIN :
+# {"taux_coupon", "date_maturite", "frequence", "debut"}
+REGISTRE_OBLIGATIONS = {}
+
+# Nombres de coupons par an acceptés (périodes d'un nombre entier de mois)
+FREQUENCES_COUPON = (1, 2, 4, 12)
+
+JOURS_PAR_ANNEE = 365.25
+
+
+def enregistrer_obligation(isin, taux_coupon, date_maturite, frequence=1, date_transaction=None):
+    """
+    Enregistre les caractéristiques d'une obligation pour le moteur obligataire.
+    'taux_coupon' est un taux annuel en décimal (0.035 pour 3,5 %), 'frequence' le nombre
+    de coupons par an. L'échéancier remonte jusqu'à la plus ancienne date de transaction.
+    """
+    debut = date_transaction or datetime.date.today()
+    ancienne = REGISTRE_OBLIGATIONS.get(isin)
+    if ancienne is not None:
+        debut = min(debut, ancienne["debut"])
+    REGISTRE_OBLIGATIONS[isin] = {
+        "taux_coupon": float(taux_coupon or 0.0),
+        "date_maturite": date_maturite,
+        "frequence": int(frequence or 1),
+        "debut": debut,
+    }
+
+
+def conditions_obligations(isins):
+    """
+    Retourne (dates de maturité, fréquences) des ISIN enregistrés, pour l'export :
+    NaT et NaN pour les symboles absents de REGISTRE_OBLIGATIONS.
+    """
+    caracteristiques = [REGISTRE_OBLIGATIONS.get(isin) for isin in isins]
+    maturites = np.array([np.datetime64("NaT") if c is None else np.datetime64(c["date_maturite"], "D")
+                          for c in caracteristiques], dtype="datetime64[D]")
+    frequences = np.array([np.nan if c is None else c["frequence"] for c in caracteristiques], dtype=float)
+    return maturites, frequences
+
+
+@lru_cache(maxsize=100000)
+def echeancier(taux_coupon, date_maturite, frequence, debut, nominal=100.0):
+    """
+    Échéancier des flux d'une obligation, calculé une fois puis gardé en cache.
+
+    Les dates de coupon sont générées à rebours depuis la maturité, tous les 12/frequence mois,
+    jusqu'à la dernière date de coupon précédant 'debut' incluse.
+    Retourne (dates en datetime64[D], montants pour 'nominal' de nominal).
+    """
+    pas = 12 // frequence
+    maturite = np.datetime64(date_maturite, "D")
+    debut = np.datetime64(debut, "D")
+    mois_maturite = maturite.astype("datetime64[M]")
+    jour = maturite - mois_maturite.astype("datetime64[D]")
+    # Mois de coupon à rebours, un de plus que nécessaire pour atteindre une date <= debut
+    ecart = int((mois_maturite - debut.astype("datetime64[M]")).astype(int))
+    mois = mois_maturite - np.arange(max(ecart, 0) // pas + 2)[::-1] * pas
+    # Même jour du mois que la maturité, ramené au dernier jour des mois plus courts
+    longueur = (mois + 1).astype("datetime64[D]") - mois.astype("datetime64[D]")
+    dates = mois.astype("datetime64[D]") + np.minimum(jour, longueur - 1)
+    dates = dates[max(np.searchsorted(dates, debut, side="right") - 1, 0):]
+    montants = np.full(len(dates), nominal * taux_coupon / frequence)
+    montants[0] = 0.0  # date de coupon précédant l'achat : sert au calcul du coupon couru
+    montants[-1] += nominal
+    return dates, montants
+
+
+class CourbeTaux:
+    """
+    Courbe de taux zéro-coupon : taux actuariels annuels par maturité (en années),
+    interpolés linéairement et prolongés à plat au-delà des points fournis.
+    """
+
+    def __init__(self, maturites, taux):
+        ordre = np.argsort(maturites)
+        self.maturites = np.asarray(maturites, dtype=float)[ordre]
+        self.taux = np.asarray(taux, dtype=float)[ordre]
+
+    @classmethod
+    def depuis_fichier(cls, chemin):
+        """
+        Lit une courbe stockée localement : CSV aux colonnes "maturite" et "taux",
+        ou JSON {"maturites": [...], "taux": [...]}.
+        """
+        if chemin.lower().endswith(".json"):
+            with open(chemin, encoding="utf-8") as fichier:
+                donnees = json.load(fichier)
+            return cls(donnees["maturites"], donnees["taux"])
+        donnees = pd.read_csv(chemin)
+        return cls(donnees["maturite"].to_numpy(), donnees["taux"].to_numpy())
+
+    def taux_zero(self, maturites):
+        return np.interp(maturites, self.maturites, self.taux)
+
+    def facteurs_actualisation(self, maturites):
+        maturites = np.asarray(maturites, dtype=float)
+        return (1 + self.taux_zero(maturites)) ** -maturites
+
+    def decaler(self, points_de_base):
+        """
+        Retourne la courbe translatée de 'points_de_base' (1 pb = 0,01 %).
+        """
+        return CourbeTaux(self.maturites, self.taux + points_de_base / 10000)
+
+
+class LivreObligataire:
+    """
+    Ensemble d'obligations préparé pour une date de valorisation : les flux futurs de chaque
+    obligation sont empilés dans deux matrices (obligations × flux) de maturités en années
+    et de montants, complétées par des zéros.
+
+    Valoriser le livre sur une courbe revient alors à une interpolation vectorisée et un
+    produit matriciel ; après un choc de courbe, les matrices sont réutilisées telles quelles.
+    Prix, coupon couru et mesures sont exprimés pour 100 de nominal.
+    """
+
+    def __init__(self, isins, date_valorisation):
+        self.isins = tuple(isins)
+        self.date_valorisation = date_valorisation
+        self.cle = (self.isins, date_valorisation)
+        valorisation = np.datetime64(date_valorisation, "D")
+
+        flux_futurs = []
+        self.coupon_couru = np.zeros(len(self.isins))
+        self.frequences = np.ones(len(self.isins))
+        for i, isin in enumerate(self.isins):
+            caracteristiques = REGISTRE_OBLIGATIONS[isin]
+            dates, montants = echeancier(caracteristiques["taux_coupon"], caracteristiques["date_maturite"],
+                                         caracteristiques["frequence"], caracteristiques["debut"])
+            futurs = dates > valorisation
+            flux_futurs.append(((dates[futurs] - valorisation).astype(float) / JOURS_PAR_ANNEE, montants[futurs]))
+            self.frequences[i] = caracteristiques["frequence"]
+            if futurs.any() and not futurs.all():
+                precedente = dates[~futurs][-1]
+                suivante = dates[futurs][0]
+                coupon = 100 * caracteristiques["taux_coupon"] / caracteristiques["frequence"]
+                self.coupon_couru[i] = coupon * (valorisation - precedente) / (suivante - precedente)
+
+        largeur = max((len(temps) for temps, _ in flux_futurs), default=0)
+        self.temps = np.zeros((len(self.isins), largeur))
+        self.flux = np.zeros((len(self.isins), largeur))
+        for i, (temps, montants) in enumerate(flux_futurs):
+            self.temps[i, :len(temps)] = temps
+            self.flux[i, :len(montants)] = montants
+
+    def prix_plein(self, courbe):
+        """
+        Prix coupon couru inclus, actualisé sur la courbe de taux.
+        """
+        return (self.flux * courbe.facteurs_actualisation(self.temps)).sum(axis=1)
+
+    def prix(self, courbe):
+        """
+        Prix pied de coupon (coté) : prix plein moins coupon couru.
+        """
+        return self.prix_plein(courbe) - self.coupon_couru
+
+    def _actualisation_actuarielle(self, rendements):
+        periodes = self.frequences[:, None]
+        return (1 + rendements[:, None] / periodes) ** (-periodes * self.temps)
+
+    def rendement_actuariel(self, prix_plein, iterations=50, tolerance=1e-12):
+        """
+        Taux de rendement actuariel (composé 'frequence' fois par an) qui égalise les flux
+        actualisés et le prix plein, résolu par Newton simultanément pour toutes les obligations.
+        """
+        prix_plein = np.asarray(prix_plein, dtype=float)
+        rendements = np.full(len(self.isins), 0.03)
+        periodes = self.frequences[:, None]
+        for _ in range(iterations):
+            actualisation = self._actualisation_actuarielle(rendements)
+            ecart = (self.flux * actualisation).sum(axis=1) - prix_plein
+            derivee = -(self.flux * self.temps * actualisation / (1 + rendements[:, None] / periodes)).sum(axis=1)
+            pas = np.divide(ecart, derivee, out=np.zeros_like(ecart), where=derivee != 0)
+            rendements -= pas
+            if np.all(np.abs(pas) < tolerance):
+                break
+        return rendements
+
+    def mesures(self, courbe):
+        """
+        Retourne un DataFrame par ISIN : prix pied de coupon, coupon couru, prix plein,
+        rendement actuariel, duration de Macaulay, duration modifiée et convexité.
+        """
+        prix_plein = self.prix_plein(courbe)
+        rendements = self.rendement_actuariel(prix_plein)
+        actualisation = self._actualisation_actuarielle(rendements)
+        valeurs = self.flux * actualisation
+        base = np.where(prix_plein != 0, prix_plein, np.nan)
+        duration = (valeurs * self.temps).sum(axis=1) / base
+        periodes = self.frequences
+        convexite = ((valeurs * self.temps * (self.temps + 1 / periodes[:, None])).sum(axis=1)
+                     / (base * (1 + rendements / periodes) ** 2))
+        return pd.DataFrame({
+            "prix": prix_plein - self.coupon_couru,
+            "coupon_couru": self.coupon_couru,
+            "prix_plein": prix_plein,
+            "rendement": rendements,
+            "duration": duration,
+            "duration_modifiee": duration / (1 + rendements / periodes),
+            "convexite": convexite,
+        }, index=pd.Index(self.isins, name="isin"))
+
+
+# ======================  CACHE DES PRIX  ======================
+
+# Durée de validité (en secondes) d'un prix en cache, par classe d'actif
+TTL_PAR_CLASSE = {
+    "Action": 60,
+    "Crypto": 10,
+    "Obligation": 3600,
+}
+
+
+# Durée maximale (secondes) pendant laquelle un symbole sans prix n'est pas redemandé
+TTL_ABSENT = 60
+
+# Valeur en cache d'un symbole demandé pour lequel le fournisseur n'a rien renvoyé
+PRIX_ABSENT = object()
+
+
+class CachePrix:
+    """
+    Cache des prix de marché indexé par (fournisseur, symbole).
+
+    Chaque entrée expire après son TTL ; au-delà de 'taille_max' entrées,
+    la moins récemment utilisée est évincée (LRU).
+    """
+
+    def __init__(self, taille_max=10000):
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lire(self, cle):
+        """
+        Retourne le prix en cache pour 'cle', ou None s'il est absent ou expiré.
+        """
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.misses += 1
+                return None
+            prix, expiration = entree
+            if time.monotonic() >= expiration:
+                del self._entrees[cle]
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return prix
+
+    def ecrire(self, cle, prix, ttl):
+        with self._verrou:
+            self._entrees[cle] = (prix, time.monotonic() + ttl)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def invalider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def statistiques(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taux_hit": self.hits / total if total else 0.0,
+            "taille": len(self._entrees),
+        }
+
+
+class FournisseurEnCache:
+    """
+    Enveloppe un fournisseur : seuls les symboles absents ou expirés du cache
+    sont demandés au fournisseur sous-jacent, en une seule requête.
+    Un symbole demandé sans réponse (radié, mal orthographié) est aussi retenu,
+    pendant 'ttl_absent' secondes, pour ne pas être redemandé à chaque vue.
+    """
+
+    def __init__(self, fournisseur, cache, ttl, ttl_absent=None):
+        self.fournisseur = fournisseur
+        self.cache = cache
+        self.ttl = ttl
+        self.ttl_absent = min(ttl, TTL_ABSENT) if ttl_absent is None else ttl_absent
+
+    @property
+    def nom(self):
+        return self.fournisseur.nom
+
+    @chronometre("cache.prix_actuels")
+    def prix_actuels(self, symboles):
+        prix = {}
+        manquants = []
+        for symbole in symboles:
+            valeur = self.cache.lire((self.nom, symbole))
+            if valeur is None:
+                manquants.append(symbole)
+            elif valeur is not PRIX_ABSENT:
+                prix[symbole] = valeur
+        if manquants:
+            nouveaux = self.fournisseur.prix_actuels(manquants)
+            for symbole in manquants:
+                if symbole in nouveaux:
+                    self.cache.ecrire((self.nom, symbole), nouveaux[symbole], self.ttl)
+                else:
+                    self.cache.ecrire((self.nom, symbole), PRIX_ABSENT, self.ttl_absent)
+            prix.update(nouveaux)
+        return prix
+
+    @chronometre("cache.historique")
+    def historique(self, symbole, debut, fin):
+        return self.fournisseur.historique(symbole, debut, fin)
+
+    @property
+    def devises_locales(self):
+        return self.fournisseur.devises_locales
+
+    def devises(self, symboles):
+        return self.fournisseur.devises(symboles)
+
+
+# ======================  PLANIFICATION DES REQUÊTES  ======================
+
+# Débit (requêtes par seconde) et rafale autorisés par défaut pour chaque fournisseur réseau
+LIMITES_PAR_FOURNISSEUR = {
+    "yahoo": {"debit": 2.0, "capacite": 5},
+    "binance": {"debit": 5.0, "capacite": 10},
+}
+
+
+class LimiteDepassee(Exception):
+    """
+    Refus d'un fournisseur pour dépassement de sa limite de requêtes
+    (HTTP 429, ou 418 une fois le client banni).
+    """
+
+    def __init__(self, message, status_code=429, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOuvert(Exception):
+    """
+    Le disjoncteur du fournisseur est ouvert : aucune requête n'est envoyée.
+    """
+
+
+def _est_limitation(exception):
+    return getattr(exception, "status_code", None) in (418, 429)
+
+
+class SeauJetons:
+    """
+    Limiteur de débit à seau de jetons : 'debit' jetons par seconde, au plus 'capacite'
+    en réserve pour absorber une rafale. Partagé entre threads.
+    """
+
+    def __init__(self, debit, capacite=None):
+        self.debit = float(debit)
+        self.capacite = float(capacite or max(1.0, self.debit))
+        self._jetons = self.capacite
+        self._instant = time.monotonic()
+        self._pause = 0.0
+        self._verrou = threading.Lock()
+
+    def essayer(self, jetons=1):
+        """
+        Prend 'jetons' sans attendre. Retourne 0 en cas de succès, sinon le temps
+        (en secondes) à attendre avant qu'ils soient disponibles.
+        """
+        with self._verrou:
+            maintenant = time.monotonic()
+            if maintenant < self._pause:
+                return self._pause - maintenant
+            self._jetons = min(self.capacite, self._jetons + (maintenant - self._instant) * self.debit)
+            self._instant = maintenant
+            if self._jetons >= jetons:
+                self._jetons -= jetons
+                return 0.0
+            return (jetons - self._jetons) / self.debit
+
+    def prendre(self, jetons=1, delai_max=None):
+        """
+        Attend que 'jetons' soient disponibles et les prend ; False si l'attente dépasserait 'delai_max'.
+        """
+        limite = None if delai_max is None else time.monotonic() + delai_max
+        while True:
+            attente = self.essayer(jetons)
+            if attente == 0:
+                return True
+            if limite is not None and time.monotonic() + attente > limite:
+                return False
+            time.sleep(attente)
+
+    def suspendre(self, secondes):
+        """
+        Vide le seau et bloque toute prise pendant 'secondes' (limite signalée par le fournisseur).
+        """
+        with self._verrou:
+            self._pause = max(self._pause, time.monotonic() + secondes)
+            self._instant = self._pause
+            self._jetons = 0.0
+
+
+class Disjoncteur:
+    """
+    Coupe les appels à un fournisseur après 'seuil_echecs' échecs consécutifs.
+    Après 'delai_reouverture' secondes, une seule requête d'essai est laissée passer :
+    son succès referme le circuit, son échec le rouvre.
+    """
+
+    def __init__(self, seuil_echecs=5, delai_reouverture=30.0):
+        self.seuil_echecs = seuil_echecs
+        self.delai_reouverture = delai_reouverture
+        self.echecs = 0
+        self.ouvert_depuis = None
+        self._essai_en_cours = False
+        self._verrou = threading.Lock()
+
+    @property
+    def etat(self):
+        if self.ouvert_depuis is None:
+            return "fermé"
+        if time.monotonic() - self.ouvert_depuis >= self.delai_reouverture:
+            return "semi-ouvert"
+        return "ouvert"
+
+    def autoriser(self):
+        with self._verrou:
+            if self.ouvert_depuis is None:
+                return True
+            if self._essai_en_cours or time.monotonic() - self.ouvert_depuis < self.delai_reouverture:
+                return False
+            self._essai_en_cours = True
+            return True
+
+    def succes(self):
+        with self._verrou:
+            self.echecs = 0
+            self.ouvert_depuis = None
+            self._essai_en_cours = False
+
+    def echec(self):
+        with self._verrou:
+            self.echecs += 1
+            if self._essai_en_cours or self.echecs >= self.seuil_echecs:
+                self.ouvert_depuis = time.monotonic()
+                self._essai_en_cours = False
+
+
+class FournisseurPlanifie:
+    """
+    Ordonnanceur des requêtes vers un fournisseur réseau :
+
+    - débit limité par un seau de jetons propre au fournisseur ;
+    - dédoublonnage des requêtes en vol : un symbole déjà demandé par un autre thread
+      n'est pas redemandé, le résultat de la requête en cours est partagé ;
+    - nouvel essai avec attente exponentielle aléatoire ("full jitter") ; une limite signalée
+      par le fournisseur (429 / 418) suspend toutes les requêtes pendant l'attente ;
+    - disjoncteur : circuit ouvert, les derniers prix connus sont servis sans requête.
+
+    Les devises obtenues par requête sont demandées symbole par symbole, chacune étant une requête
+    planifiée comme les autres, puis conservées.
+
+    Avec 'secours' à False, les derniers prix ne sont pas servis par l'ordonnanceur
+    (l'historique SQLite s'en charge quand il est placé au-dessus).
+    """
+
+    def __init__(self, fournisseur, debit=5.0, capacite=None, tentatives=4, attente_base=0.5, attente_max=30.0,
+                 seuil_echecs=5, delai_reouverture=30.0, delai_max=60.0, secours=True):
+        self.fournisseur = fournisseur
+        self.seau = SeauJetons(debit, capacite)
+        self.disjoncteur = Disjoncteur(seuil_echecs, delai_reouverture)
+        self.tentatives = tentatives
+        self.attente_base = attente_base
+        self.attente_max = attente_max
+        self.delai_max = delai_max
+        self.secours = secours
+        self.derniers = {}
+        self.devises_connues = {}
+        self._en_vol = {}
+        self._verrou = threading.Lock()
+        self.requetes = 0
+        self.reessais = 0
+        self.dedoublonnes = 0
+        self.servis_en_secours = 0
+
+    @property
+    def nom(self):
+        return self.fournisseur.nom
+
+    def _appeler(self, methode, *args):
+        for tentative in range(self.tentatives):
+            if not self.seau.prendre(delai_max=self.delai_max):
+                raise LimiteDepassee(f"Débit {self.nom} saturé : attente supérieure à {self.delai_max} s")
+            if not self.disjoncteur.autoriser():
+                raise CircuitOuvert(f"Circuit ouvert pour {self.nom}")
+            with self._verrou:
+                self.requetes += 1
+            try:
+                resultat = methode(*args)
+            except Exception as e:
+                self.disjoncteur.echec()
+                if tentative + 1 >= self.tentatives:
+                    raise
+                plafond = min(self.attente_max, self.attente_base * 2 ** tentative)
+                attente = random.uniform(0, plafond)
+                if _est_limitation(e):
+                    attente = max(plafond, getattr(e, "retry_after", None) or 0)
+                    self.seau.suspendre(attente)
+                with self._verrou:
+                    self.reessais += 1
+                time.sleep(attente)
+            else:
+                self.disjoncteur.succes()
+                return resultat
+
+    def _reserver(self, cles):
+        # Retourne (clés à demander par ce thread, {clé: Future} de toutes les clés)
+        a_demander, attendus = [], {}
+        with self._verrou:
+            for cle in cles:
+                futur = self._en_vol.get(cle)
+                if futur is None:
+                    futur = self._en_vol[cle] = Future()
+                    a_demander.append(cle)
+                else:
+                    self.dedoublonnes += 1
+                attendus[cle] = futur
+        return a_demander, attendus
+
+    @chronometre("planificateur.prix_actuels")
+    def prix_actuels(self, symboles):
+        a_demander, attendus = self._reserver(dict.fromkeys(symboles))
+        prix = {}
+        try:
+            if a_demander:
+                try:
+                    prix = self._appeler(self.fournisseur.prix_actuels, a_demander)
+                except Exception as e:
+                    print(f"Erreur lors de la récupération des prix {self.nom} : {e}")
+                    if self.secours:
+                        with self._verrou:
+                            prix = {symbole: self.derniers[symbole] for symbole in a_demander
+                                    if symbole in self.derniers}
+                            self.servis_en_secours += len(prix)
+                        INSTRUMENTATION.compter(f"planificateur.{self.nom}.secours", len(prix))
+                else:
+                    with self._verrou:
+                        self.derniers.update(prix)
+        finally:
+            with self._verrou:
+                for symbole in a_demander:
+                    self._en_vol.pop(symbole).set_result(prix.get(symbole))
+        resultat = {}
+        for symbole, futur in attendus.items():
+            valeur = futur.result()
+            if valeur is not None:
+                resultat[symbole] = valeur
+        return resultat
+
+    @chronometre("planificateur.historique")
+    def historique(self, symbole, debut, fin):
+        cle = ("historique", symbole, debut, fin)
+        a_demander, attendus = self._reserver([cle])
+        if a_demander:
+            futur = attendus[cle]
+            try:
+                futur.set_result(self._appeler(self.fournisseur.historique, symbole, debut, fin))
+            except BaseException as e:
+                futur.set_exception(e)
+            finally:
+                with self._verrou:
+                    self._en_vol.pop(cle)
+        return attendus[cle].result()
+
+    @property
+    def devises_locales(self):
+        return self.fournisseur.devises_locales
+
+    def devises(self, symboles):
+        if self.devises_locales:
+            return self.fournisseur.devises(symboles)
+        devises = {}
+        for symbole in symboles:
+            try:
+                devise = self.devises_connues.get(symbole) or self._devise(symbole)
+            except (CircuitOuvert, LimiteDepassee) as e:
+                print(f"Devises {self.nom} interrompues : {e}")
+                break
+            except Exception as e:
+                print(f"Erreur lors de la récupération de la devise de {symbole} : {e}")
+                continue
+            if devise:
+                devises[symbole] = devise
+        return devises
+
+    def _devise(self, symbole):
+        cle = ("devise", symbole)
+        a_demander, attendus = self._reserver([cle])
+        if a_demander:
+            futur = attendus[cle]
+            try:
+                devise = self._appeler(self.fournisseur.devises, [symbole]).get(symbole)
+                if devise:
+                    with self._verrou:
+                        self.devises_connues[symbole] = devise
+                futur.set_result(devise)
+            except BaseException as e:
+                futur.set_exception(e)
+            finally:
+                with self._verrou:
+                    self._en_vol.pop(cle)
+        return attendus[cle].result()
+
+    def statistiques(self):
+        return {
+            "requetes": self.requetes,
+            "reessais": self.reessais,
+            "dedoublonnes": self.dedoublonnes,
+            "servis_en_secours": self.servis_en_secours,
+            "disjoncteur": self.disjoncteur.etat,
+        }
+
+
+# ======================  HISTORIQUE DES PRIX (SQLite)  ======================
+
+class StockHistoriquePrix:
+    """
+    Historique des prix persistant sur disque, dans une base SQLite.
+
+    - cours : clôtures journalières par (fournisseur, symbole, date),
+    - couverture : période [debut, fin) déjà synchronisée pour chaque symbole,
+    - derniers : dernier prix de marché connu et heure de sa récupération,
+    - devises : devise de cotation de chaque symbole.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cours (
+            fournisseur TEXT, symbole TEXT, date TEXT, cloture REAL,
+            PRIMARY KEY (fournisseur, symbole, date)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS couverture (
+            fournisseur TEXT, symbole TEXT, debut TEXT, fin TEXT,
+            PRIMARY KEY (fournisseur, symbole)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS derniers (
+            fournisseur TEXT, symbole TEXT, prix REAL, maj REAL,
+            PRIMARY KEY (fournisseur, symbole)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS devises (
+            fournisseur TEXT, symbole TEXT, devise TEXT,
+            PRIMARY KEY (fournisseur, symbole)) WITHOUT ROWID;
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        # Connexion partagée entre le thread Tk et les threads de rafraîchissement
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False)
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        self._connexion.executescript(self.SCHEMA)
+        self._verrou = threading.Lock()
+
+    def lire(self, fournisseur, symbole, debut, fin):
+        """
+        Retourne les clôtures stockées entre 'debut' (inclus) et 'fin' (exclu).
+        """
+        with self._verrou:
+            lignes = self._connexion.execute(
+                "SELECT date, cloture FROM cours WHERE fournisseur=? AND symbole=? AND date>=? AND date<? "
+                "ORDER BY date", (fournisseur, symbole, str(debut), str(fin))).fetchall()
+        if not lignes:
+            return pd.Series(dtype=float)
+        dates, clotures = zip(*lignes)
+        return pd.Series(clotures, index=pd.DatetimeIndex(dates), dtype=float)
+
+    def ecrire(self, fournisseur, symbole, serie):
+        dates = pd.DatetimeIndex(serie.index).strftime("%Y-%m-%d")
+        with self._verrou, self._connexion:
+            self._connexion.executemany(
+                "INSERT OR REPLACE INTO cours VALUES (?, ?, ?, ?)",
+                [(fournisseur, symbole, date, float(cloture)) for date, cloture in zip(dates, serie.to_numpy())])
+
+    def couverture(self, fournisseur, symbole):
+        with self._verrou:
+            ligne = self._connexion.execute(
+                "SELECT debut, fin FROM couverture WHERE fournisseur=? AND symbole=?",
+                (fournisseur, symbole)).fetchone()
+        if ligne is None:
+            return None
+        return datetime.date.fromisoformat(ligne[0]), datetime.date.fromisoformat(ligne[1])
+
+    def etendre_couverture(self, fournisseur, symbole, debut, fin):
+        actuelle = self.couverture(fournisseur, symbole)
+        if actuelle is not None:
+            debut, fin = min(debut, actuelle[0]), max(fin, actuelle[1])
+        with self._verrou, self._connexion:
+            self._connexion.execute("INSERT OR REPLACE INTO couverture VALUES (?, ?, ?, ?)",
+                                    (fournisseur, symbole, str(debut), str(fin)))
+
+    def derniers_prix(self, fournisseur, symboles):
+        """
+        Retourne {symbole: (prix, heure de mise à jour)} pour les symboles connus.
+        """
+        symboles = list(symboles)
+        resultat = {}
+        with self._verrou:
+            for debut in range(0, len(symboles), 500):
+                morceau = symboles[debut:debut + 500]
+                marqueurs = ", ".join("?" * len(morceau))
+                for symbole, prix, maj in self._connexion.execute(
+                        f"SELECT symbole, prix, maj FROM derniers WHERE fournisseur=? AND symbole IN ({marqueurs})",
+                        [fournisseur] + morceau):
+                    resultat[symbole] = (prix, maj)
+        return resultat
+
+    def ecrire_derniers_prix(self, fournisseur, prix):
+        maintenant = time.time()
+        with self._verrou, self._connexion:
+            self._connexion.executemany(
+                "INSERT OR REPLACE INTO derniers VALUES (?, ?, ?, ?)",
+                [(fournisseur, symbole, float(valeur), maintenant) for symbole, valeur in prix.items()])
+
+    def devises(self, fournisseur, symboles):
+        """
+        Retourne {symbole: devise} pour les symboles dont la devise est stockée.
+        """
+        symboles = list(symboles)
+        resultat = {}
+        with self._verrou:
+            for debut in range(0, len(symboles), 500):
+                morceau = symboles[debut:debut + 500]
+                marqueurs = ", ".join("?" * len(morceau))
+                resultat.update(self._connexion.execute(
+                    f"SELECT symbole, devise FROM devises WHERE fournisseur=? AND symbole IN ({marqueurs})",
+                    [fournisseur] + morceau))
+        return resultat
+
+    def ecrire_devises(self, fournisseur, devises):
+        with self._verrou, self._connexion:
+            self._connexion.executemany(
+                "INSERT OR REPLACE INTO devises VALUES (?, ?, ?)",
+                [(fournisseur, symbole, devise) for symbole, devise in devises.items()])
+
+    def fermer(self):
+        self._connexion.close()
+
+
+class FournisseurAvecHistorique:
+    """
+    Enveloppe un fournisseur avec le stock d'historique persistant.
+
+    - historique : seules les périodes absentes du stock (en général la fin, depuis
+      la dernière synchronisation) sont demandées au fournisseur ;
+    - prix_actuels : un dernier prix stocké depuis moins de 'fraicheur' secondes est
+      réutilisé, et le dernier prix connu sert de repli si le fournisseur échoue.
+    En mode 'hors_ligne', le fournisseur sous-jacent n'est jamais appelé.
+    """
+
+    def __init__(self, fournisseur, stock, fraicheur=900, hors_ligne=False):
+        self.fournisseur = fournisseur
+        self.stock = stock
+        self.fraicheur = fraicheur
+        self.hors_ligne = hors_ligne
+
+    @property
+    def nom(self):
+        return self.fournisseur.nom
+
+    @chronometre("historique_sqlite.prix_actuels")
+    def prix_actuels(self, symboles):
+        symboles = list(symboles)
+        locaux = self.stock.derniers_prix(self.nom, symboles)
+        if self.hors_ligne:
+            return {symbole: prix for symbole, (prix, _) in locaux.items()}
+
+        limite = time.time() - self.fraicheur
+        prix = {symbole: valeur for symbole, (valeur, maj) in locaux.items() if maj >= limite}
+        manquants = [symbole for symbole in symboles if symbole not in prix]
+        if manquants:
+            nouveaux = self.fournisseur.prix_actuels(manquants)
+            self.stock.ecrire_derniers_prix(self.nom, nouveaux)
+            prix.update(nouveaux)
+            for symbole in manquants:
+                if symbole not in prix and symbole in locaux:
+                    prix[symbole] = locaux[symbole][0]
+        return prix
+
+    @chronometre("historique_sqlite.historique")
+    def historique(self, symbole, debut, fin):
+        if not self.hors_ligne:
+            self.synchroniser(symbole, debut, fin)
+        return self.stock.lire(self.nom, symbole, debut, fin)
+
+    @property
+    def devises_locales(self):
+        return self.fournisseur.devises_locales
+
+    def devises(self, symboles):
+        """
+        Les devises stockées sont servies sans requête ; les autres sont demandées au fournisseur
+        puis stockées. Hors ligne, seules les devises déduites sans requête (paires Binance) s'y ajoutent.
+        """
+        symboles = list(symboles)
+        devises = self.stock.devises(self.nom, symboles)
+        manquants = [symbole for symbole in symboles if symbole not in devises]
+        if manquants and (not self.hors_ligne or self.devises_locales):
+            nouvelles = self.fournisseur.devises(manquants)
+            self.stock.ecrire_devises(self.nom, nouvelles)
+            devises.update(nouvelles)
+        return devises
+
+    def synchroniser(self, symbole, debut, fin=None):
+        """
+        Complète le stock pour couvrir [debut, fin) : seules les périodes manquantes
+        (avant le début ou après la fin de la couverture actuelle) sont téléchargées.
+        La couverture reste une seule période continue : une demande disjointe est prolongée
+        jusqu'à la couverture existante, pour ne jamais laisser de trou marqué comme couvert.
+        La journée en cours n'est jamais considérée comme couverte.
+        """
+        aujourd_hui = datetime.date.today()
+        fin = min(fin or aujourd_hui + datetime.timedelta(days=1), aujourd_hui + datetime.timedelta(days=1))
+        couverture = self.stock.couverture(self.nom, symbole)
+        if couverture is None:
+            manquants = [(debut, fin)]
+        else:
+            manquants = [(debut, couverture[0]), (couverture[1], fin)]
+        for debut_manquant, fin_manquante in manquants:
+            if debut_manquant >= fin_manquante:
+                continue
+            serie = self.fournisseur.historique(symbole, debut_manquant, fin_manquante)
+            self.stock.ecrire(self.nom, symbole, serie)
+            self.stock.etendre_couverture(self.nom, symbole, debut_manquant, min(fin_manquante, aujourd_hui))
+
+
+# ======================  DEVISES ET TAUX DE CHANGE  ======================
+
+# Actifs de cotation Binance reconnus en suffixe d'un symbole (BTCUSDT -> USDT), les plus longs d'abord
+ACTIFS_COTATION = ("FDUSD", "USDT", "USDC", "BUSD", "TUSD", "DAI", "BTC", "ETH", "BNB",
+                   "USD", "EUR", "GBP", "TRY", "BRL", "JPY", "AUD")
+# Devises cotées par Yahoo sous la forme BTC-USD (les autres sous la forme EURUSD=X)
+CRYPTOS_CHANGE = {"BTC", "ETH", "BNB", "USDT", "USDC", "BUSD", "FDUSD", "TUSD", "DAI"}
+# Sous-unités utilisées par certaines places (pence à Londres...) : (devise, nombre de sous-unités)
+SOUS_UNITES = {"GBp": ("GBP", 100), "GBX": ("GBP", 100), "ZAc": ("ZAR", 100), "ILA": ("ILS", 100)}
+
+
+def devise_cotation(symbole):
+    """
+    Retourne l'actif de cotation d'une paire Binance (ETHBTC -> BTC), None s'il n'est pas reconnu.
+    """
+    for actif in ACTIFS_COTATION:
+        if symbole.endswith(actif) and len(symbole) > len(actif):
+            return actif
+    return None
+
+
+class FournisseurChange:
+    """
+    Cours de change lus comme des prix Yahoo (EURUSD=X, BTC-USD), toutes les devises
+    en une seule requête. Par défaut le fournisseur des actions est utilisé, avec son
+    cache, son ordonnanceur et son historique.
+    """
+    nom = "change"
+
+    def __init__(self, fournisseur=None):
+        self.fournisseur = fournisseur
+
+    @staticmethod
+    def symbole(devise, pivot):
+        return f"{devise}-{pivot}" if devise in CRYPTOS_CHANGE else f"{devise}{pivot}=X"
+
+    @mesure_fournisseur
+    def taux(self, devises, pivot):
+        """
+        Retourne {devise: valeur d'une unité en 'pivot'} ; les devises sans cours sont absentes.
+        """
+        fournisseur = self.fournisseur or Action.fournisseur
+        symboles = {self.symbole(devise, pivot): devise for devise in devises if devise != pivot}
+        prix = fournisseur.prix_actuels(list(symboles)) if symboles else {}
+        taux = {symboles[symbole]: valeur for symbole, valeur in prix.items() if symbole in symboles}
+        if pivot in devises:
+            taux[pivot] = 1.0
+        return taux
+
+
+class MatriceChange:
+    """
+    Cours croisés entre toutes les devises du portefeuille.
+
+    Seule la valeur de chaque devise dans la devise 'pivot' est récupérée, en une requête ;
+    le cours de toute paire s'en déduit par triangulation : cours(a -> b) = valeur(a) / valeur(b).
+    Les valeurs sont conservées 'ttl' secondes ; un cours introuvable garde sa dernière valeur connue.
+    Une devise sans aucun cours est signalée une fois par période de validité et ses montants
+    ne sont pas convertis (facteur 1). 'base' est la devise de valorisation par défaut (None : aucune conversion).
+    """
+
+    def __init__(self, fournisseur=None, pivot="USD", ttl=300, base=None):
+        self.fournisseur = fournisseur or FournisseurChange()
+        self.pivot = pivot
+        self.ttl = ttl
+        self.base = base
+        self.devises = []
+        self._indice = {}
+        self._valeurs = np.empty(0)
+        self._introuvables = set()
+        self._expiration = 0.0
+        self._verrou = threading.Lock()
+        self.chargements = 0
+
+    @chronometre("change.charger")
+    def charger(self, devises):
+        """
+        Garantit une valeur à jour pour chacune des 'devises' : une seule requête pour les devises
+        encore inconnues, ou pour toutes les devises suivies quand le TTL est dépassé.
+        """
+        devises = {devise for devise in devises if devise}
+        with self._verrou:
+            expire = time.monotonic() >= self._expiration
+            if expire:
+                a_charger = devises | set(self.devises) | self._introuvables
+                self._introuvables = set()
+            else:
+                a_charger = devises - set(self._indice) - self._introuvables
+            if not a_charger:
+                return
+            principales = {SOUS_UNITES.get(devise, (devise, 1))[0] for devise in a_charger}
+            taux = self.fournisseur.taux(principales, self.pivot)
+            self.chargements += 1
+            valeurs = dict(zip(self.devises, self._valeurs.tolist()))
+            for devise in a_charger:
+                principale, sous_unites = SOUS_UNITES.get(devise, (devise, 1))
+                if principale in taux:
+                    valeurs[devise] = taux[principale] / sous_unites
+                elif devise not in valeurs:
+                    self._introuvables.add(devise)
+                    print(f"Aucun cours de change pour {devise}/{self.pivot} : montants non convertis")
+            self.devises = list(valeurs)
+            self._indice = {devise: i for i, devise in enumerate(self.devises)}
+            self._valeurs = np.array(list(valeurs.values()), dtype=float)
+            if expire:
+                self._expiration = time.monotonic() + self.ttl
+
+    def invalider(self):
+        with self._verrou:
+            self._expiration = 0.0
+
+    def matrice(self, devises=None):
+        """
+        Retourne la matrice des cours croisés (DataFrame) : ligne a, colonne b = prix d'une unité de a en b.
+        """
+        self.charger(devises or [])
+        with self._verrou:
+            devises = [devise for devise in (devises or self.devises) if devise in self._indice]
+            valeurs = self._valeurs[[self._indice[devise] for devise in devises]]
+        return pd.DataFrame(valeurs[:, None] / valeurs[None, :], index=devises, columns=devises)
+
+    def facteurs(self, devises, vers, charger=True):
+        """
+        Facteurs de conversion vers 'vers' d'un tableau de devises (une par ligne) :
+        chaque devise distincte est convertie une fois, puis le facteur est diffusé sur ses lignes.
+        Une devise inconnue (None ou "") n'est pas convertie (facteur 1) ; une devise sans cours
+        de change, ou vers une devise sans cours, donne NaN : ses montants sont à exclure des totaux.
+        Avec 'charger' à False, aucune requête n'est faite : un cours pas encore chargé donne aussi NaN.
+        """
+        codes, distinctes = pd.factorize(pd.Series(devises, dtype=object).fillna(""))
+        a_convertir = [devise for devise in distinctes if devise and devise != vers]
+        if not a_convertir:
+            return np.ones(len(codes))
+        if charger:
+            self.charger(a_convertir + [vers])
+        with self._verrou:
+            taux = np.ones(len(distinctes))
+            for i, devise in enumerate(distinctes):
+                if devise not in a_convertir:
+                    continue
+                if devise in self._indice and vers in self._indice:
+                    taux[i] = self._valeurs[self._indice[devise]] / self._valeurs[self._indice[vers]]
+                else:
+                    taux[i] = np.nan
+        return taux[codes]
+
+    def taux(self, de, vers):
+        return float(self.facteurs([de], vers)[0])
+
+
+CHANGE = MatriceChange()
+
+
+def facteur_change(devise):
+    """
+    Facteur de conversion d'un montant en 'devise' vers CHANGE.base (1 sans devise de base,
+    NaN sans cours de change).
+    """
+    if CHANGE.base is None or not devise:
+        return 1.0
+    return CHANGE.taux(devise, CHANGE.base)
+
+
+def devises_symboles(fournisseur, symboles):
+    """
+    Devises de 'symboles' selon leur fournisseur ; "" pour un symbole dont la devise est inconnue
+    (ses montants ne seront pas convertis).
+    """
+    devises = fournisseur.devises(symboles) if fournisseur is not None else {}
+    inconnus = [symbole for symbole in symboles if symbole not in devises]
+    if inconnus and fournisseur is not None:
+        print(f"Devise inconnue pour {', '.join(inconnus[:10])}{'...' if len(inconnus) > 10 else ''} : "
+              f"montants non convertis")
+    return {symbole: devises.get(symbole, "") for symbole in symboles}
+
+
+def resoudre_devises(actifs):
+    """
+    Fixe la devise des actifs qui n'en ont pas : une requête par fournisseur pour ses symboles distincts.
+    """
+    groupes = {}
+    for actif in actifs:
+        if actif.devise is None:
+            _, lots = groupes.setdefault(id(actif.fournisseur), (actif.fournisseur, {}))
+            lots.setdefault(actif.nom, []).append(actif)
+    for fournisseur, lots in groupes.values():
+        for symbole, devise in devises_symboles(fournisseur, list(lots)).items():
+            for actif in lots[symbole]:
+                actif.devise = devise
+
+
+# ======================  CLASSES DU PORTFEUILLE  ======================
+
+class Actif:
+    fournisseur = None
+    flux = None
+    taux_coupon = None
+    date_maturite = None
+    frequence = None
+    # Devise de cotation, résolue à la demande (resoudre_devises) ; "" si elle est inconnue
+    devise = None
+
+    def __init__(self, nom, quantite, date_transaction, prix_achat=None):
+        self.nom = nom  
+        self.quantite = quantite
+        self.date_transaction = date_transaction
+        self.prix_achat = prix_achat      
+        
+        self.prix_marche = None
+
+    def mise_a_jour_prix(self):
+        """
+        Récupère le prix de marché actuel auprès du fournisseur de la classe d'actif.
+        """
+        if self.fournisseur is None:
+            return
+        prix = self.fournisseur.prix_actuels([self.nom])
+        if self.nom in prix:
+            self.prix_marche = prix[self.nom]
+        else:
+            INSTRUMENTATION.compter(f"prix_manquants.{self.fournisseur.nom}")
+            print(f"Aucune donnée trouvée pour {self.nom}")
+
+    def valorisation(self):
+        """
+        Retourne la valeur de l'actif (quantité * prix de marché).
+        """
+        if self.prix_marche is None:
+            self.mise_a_jour_prix()
+        return self.quantite * self.prix_marche
+
+    @property
+    def classe(self):
+        return self.__class__.__name__
+
+class Action(Actif):
+    fournisseur = FournisseurPlanifie(FournisseurYahoo(), **LIMITES_PAR_FOURNISSEUR["yahoo"])
+
+    def __init__(self, symbole, quantite, date_transaction, prix_achat=None, resoudre_prix=True):
+        super().__init__(symbole, quantite, date_transaction, prix_achat)
+        if self.prix_achat is None and resoudre_prix:
+            resoudre_prix_achat([self])
+
+
+class Obligation(Actif):
+    fournisseur = FournisseurObligation()
+
+    def __init__(self, isin, quantite, date_transaction, taux_coupon, prix_achat=None,
+                 date_maturite=None, frequence=1):
+        super().__init__(isin, quantite, date_transaction, prix_achat)
+        self.taux_coupon = taux_coupon
+        self.date_maturite = date_maturite
+        self.frequence = frequence
+        if self.prix_achat is None:
+            self.prix_achat = 100
+        if date_maturite is not None:
+            enregistrer_obligation(isin, taux_coupon, date_maturite, frequence, date_transaction)
+
+
+class Crypto(Actif):
+    fournisseur = FournisseurPlanifie(FournisseurBinance(), **LIMITES_PAR_FOURNISSEUR["binance"])
+
+    def __init__(self, symbole, quantite, date_transaction, prix_achat=None, resoudre_prix=True):
+        super().__init__(symbole, quantite, date_transaction, prix_achat)
+        if self.prix_achat is None and resoudre_prix:
+            resoudre_prix_achat([self])
+
+
+# Nombre de jours d'historique demandés avant la première date de transaction,
+# pour retrouver la clôture précédente d'un achat daté d'un week-end ou d'un jour férié
+JOURS_RECUL_HISTORIQUE = 7
+
+
+@chronometre("resoudre_prix_achat")
+def resoudre_prix_achat(actifs):
+    """
+    Fixe le prix d'achat des actifs qui n'en ont pas à partir de l'historique des cours.
+
+    Les actifs sont regroupés par (fournisseur, symbole) : une seule requête d'historique
+    couvre toutes les dates de transaction d'un symbole, puis chaque date prend la
+    dernière clôture connue à cette date (recherche "as-of" vectorisée).
+    """
+    groupes = {}
+    for actif in actifs:
+        if actif.prix_achat is not None or actif.fournisseur is None:
+            continue
+        groupes.setdefault((id(actif.fournisseur), actif.nom), []).append(actif)
+
+    for lots in groupes.values():
+        dates = pd.DatetimeIndex([pd.Timestamp(actif.date_transaction) for actif in lots])
+        prix = prix_historiques_asof(lots[0].fournisseur, lots[0].nom, dates)
+        for actif, valeur in zip(lots, prix.tolist()):
+            actif.prix_achat = valeur
+
+
+def prix_historiques_asof(fournisseur, symbole, dates):
+    """
+    Retourne, pour chaque date de 'dates', la dernière clôture de 'symbole' connue à cette date.
+    Une seule requête d'historique couvre toutes les dates ; les dates sans cours
+    antérieur valent 0.0.
+    """
+    dates = pd.DatetimeIndex(dates)
+    debut = (dates.min() - pd.Timedelta(days=JOURS_RECUL_HISTORIQUE)).date()
+    fin = (dates.max() + pd.Timedelta(days=1)).date()
+    try:
+        clotures = fournisseur.historique(symbole, debut, fin).dropna().sort_index()
+    except Exception as e:
+        INSTRUMENTATION.erreur(getattr(fournisseur, "nom", "inconnu"), e)
+        print(f"Erreur lors de la récupération du prix d'achat pour {symbole} : {e}")
+        clotures = pd.Series(dtype=float)
+
+    positions = clotures.index.searchsorted(dates, side="right") - 1
+    valeurs = clotures.to_numpy(dtype=float)
+    trouves = positions >= 0
+    prix = np.zeros(len(dates))
+    prix[trouves] = valeurs[positions[trouves]]
+    for date in dates[~trouves]:
+        print(f"Aucune donnée pour fixer le prix d'achat de {symbole} à la date {date.date()}")
+    return prix
+
+
+def activer_cache_prix(cache=None, ttl_par_classe=None):
+    """
+    Place un cache de prix partagé devant le fournisseur de chaque classe d'actif.
+    Retourne le cache, dont les compteurs hits / misses peuvent être consultés.
+    """
+    cache = cache if cache is not None else CachePrix()
+    ttl_par_classe = {**TTL_PAR_CLASSE, **(ttl_par_classe or {})}
+    for classe in (Action, Obligation, Crypto):
+        fournisseur = classe.fournisseur
+        if isinstance(fournisseur, FournisseurEnCache):
+            fournisseur = fournisseur.fournisseur
+        classe.fournisseur = FournisseurEnCache(fournisseur, cache, ttl_par_classe[classe.__name__])
+    return cache
+
+
+CACHE_PRIX = activer_cache_prix()
+
+
+def initialiser_fournisseurs(config=None, cache=None):
+    """
+    Crée une fois pour toutes les fournisseurs de données de marché et les injecte
+    dans les classes d'actifs, derrière le cache de prix partagé.
+
+    Yahoo et Binance sont placés derrière un ordonnanceur (FournisseurPlanifie) réglé par
+    LIMITES_PAR_FOURNISSEUR et l'entrée "limites" de la configuration.
+    Si un historique persistant est configuré, ils passent d'abord par lui ;
+    avec "hors_ligne", seules les données locales sont alors utilisées. Sans historique,
+    "hors_ligne" remplace Yahoo et Binance par des fournisseurs locaux vides.
+    Retourne le cache utilisé.
+    """
+    config = config if config is not None else charger_configuration()
+    INSTRUMENTATION.actif = bool(config.get("instrumentation", False))
+    hors_ligne = config.get("hors_ligne", False)
+    historique = config.get("historique") or {}
+    limites = config.get("limites") or {}
+
+    def planifier(fournisseur, secours=True):
+        reglages = {**LIMITES_PAR_FOURNISSEUR.get(fournisseur.nom, {}), **limites.get(fournisseur.nom, {})}
+        return FournisseurPlanifie(fournisseur, secours=secours, **reglages)
+
+    yahoo = FournisseurYahoo()
+    binance = FournisseurBinance(
+        api_key=config["binance"]["api_key"],
+        api_secret=config["binance"]["api_secret"],
+        taille_pool=config.get("taille_pool", 10),
+    )
+    if historique.get("chemin"):
+        stock = StockHistoriquePrix(historique["chemin"])
+        fraicheur = historique.get("fraicheur", 900)
+        # L'historique sert lui-même les derniers prix connus en cas d'échec
+        Action.fournisseur = FournisseurAvecHistorique(planifier(yahoo, secours=False), stock, fraicheur, hors_ligne)
+        Crypto.fournisseur = FournisseurAvecHistorique(planifier(binance, secours=False), stock, fraicheur,
+                                                       hors_ligne)
+    elif hors_ligne:
+        Action.fournisseur = FournisseurLocal(nom="yahoo")
+        Crypto.fournisseur = FournisseurLocal(nom="binance")
+    else:
+        Action.fournisseur = planifier(yahoo)
+        Crypto.fournisseur = planifier(binance)
+    if hors_ligne:
+        # Marche aléatoire locale à la place des flux temps réel
+        Action.flux = Crypto.flux = FluxRejeu(cadence=config.get("cadence_rejeu", 1000))
+    else:
+        Action.flux = FluxYahoo()
+        Crypto.flux = FluxBinance(config["binance"]["api_key"], config["binance"]["api_secret"])
+    courbe = CourbeTaux.depuis_fichier(config["courbe_taux"]) if config.get("courbe_taux") else None
+    Obligation.fournisseur = FournisseurObligation(courbe, config.get("devise_obligations", "EUR"))
+    CHANGE.base = config.get("devise_base")
+    CHANGE.ttl = config.get("ttl_change", 300)
+    CHANGE.invalider()
+    return activer_cache_prix(cache if cache is not None else CACHE_PRIX, config.get("ttl"))
+
+
+# Méthodes de sortie des lots lors d'une vente partielle
+METHODES_VENTE = ("FIFO", "LIFO", "PMP")
+
+
+class Portefeuille:
+    """
+    Registre des lots du portefeuille.
+
+    Les lots sont indexés par symbole (file triée par date de transaction) et par
+    identité dans un dictionnaire ordonné : la recherche d'un symbole est en O(1)
+    et la sortie d'un lot en O(1) amorti.
+
+    Les ajouts et les ventes se font sous 'verrou' ; les calculs travaillent sur un
+    instantané des lots (actifs), pris sous ce même verrou, et peuvent tourner dans
+    un autre thread pendant qu'un lot est ajouté ou vendu.
+    """
+
+    def __init__(self):
+        self._lots = {}
+        self._lots_par_symbole = {}
+        self.pnl_realise = {}
+        self.verrou = threading.RLock()
+        # Vrai quand le prix de chaque lot a été demandé depuis le dernier ajout : les totaux
+        # ne redemandent pas alors les symboles restés sans prix
+        self._prix_demandes = False
+
+    @property
+    def actifs(self):
+        with self.verrou:
+            return list(self._lots.values())
+
+    def lots(self, nom):
+        """
+        Retourne les lots détenus sur le symbole 'nom', du plus ancien au plus récent.
+        """
+        with self.verrou:
+            return list(self._lots_par_symbole.get(nom, ()))
+
+    def devise(self, nom):
+        with self.verrou:
+            lots = self._lots_par_symbole.get(nom)
+            return lots[0].devise if lots else None
+
+    def ajouter_actif(self, actif):
+        with self.verrou:
+            self._prix_demandes = False
+            self._lots[id(actif)] = actif
+            lots = self._lots_par_symbole.setdefault(actif.nom, deque())
+            if not lots or lots[-1].date_transaction <= actif.date_transaction:
+                lots.append(actif)
+                return
+            # Lot antidaté : insertion à sa place pour conserver l'ordre FIFO
+            position = next(i for i, lot in enumerate(lots) if lot.date_transaction > actif.date_transaction)
+            lots.insert(position, actif)
+
+    @chronometre("portefeuille.ajouter_actifs")
+    def ajouter_actifs(self, actifs):
+        """
+        Ajoute un lot d'actifs (import) : même résultat qu'une suite d'ajouter_actif, mais
+        la file de chaque symbole touché est triée une seule fois par date de transaction,
+        en O(n log n) même quand les dates arrivent dans le désordre.
+        """
+        par_symbole = {}
+        with self.verrou:
+            self._prix_demandes = False
+            for actif in actifs:
+                self._lots[id(actif)] = actif
+                par_symbole.setdefault(actif.nom, []).append(actif)
+            for nom, nouveaux in par_symbole.items():
+                # Tri stable : à date égale, les lots déjà détenus puis les nouveaux dans leur ordre
+                lots = list(self._lots_par_symbole.get(nom, ())) + nouveaux
+                lots.sort(key=lambda lot: lot.date_transaction)
+                self._lots_par_symbole[nom] = deque(lots)
+
+    @chronometre("portefeuille.mise_a_jour_prix_actifs")
+    def mise_a_jour_prix_actifs(self, rappel=None, annulation=None, lots=None):
+        """
+        Met à jour le prix de marché de chacun des actifs du portefeuille.
+
+        Les positions sont regroupées par fournisseur et les symboles dédoublonnés :
+        chaque fournisseur reçoit une seule requête pour tous ses symboles, puis
+        le prix obtenu est reporté sur chaque actif détenant ce symbole.
+
+        Parameters:
+            rappel (callable, optionnel): appelé avec (fait, total, symbole) après chaque symbole.
+            annulation (threading.Event, optionnel): interrompt la mise à jour entre deux fournisseurs.
+            lots (iterable, optionnel): restreint la mise à jour à ces lots.
+        """
+        if lots is None:
+            self._prix_demandes = True
+        groupes = {}
+        for actif in self.actifs if lots is None else lots:
+            fournisseur = actif.fournisseur
+            if fournisseur is None:
+                actif.mise_a_jour_prix()
+                continue
+            _, positions = groupes.setdefault(id(fournisseur), (fournisseur, {}))
+            positions.setdefault(actif.nom, []).append(actif)
+
+        total = sum(len(positions) for _, positions in groupes.values())
+        fait = 0
+        for fournisseur, positions in groupes.values():
+            if annulation is not None and annulation.is_set():
+                self._prix_demandes = False
+                return
+            prix = fournisseur.prix_actuels(list(positions))
+            for symbole, actifs in positions.items():
+                fait += 1
+                if symbole not in prix:
+                    INSTRUMENTATION.compter(f"prix_manquants.{fournisseur.nom}")
+                    print(f"Aucune donnée trouvée pour {symbole}")
+                else:
+                    for actif in actifs:
+                        actif.prix_marche = prix[symbole]
+                if rappel is not None:
+                    rappel(fait, total, symbole)
+
+    @chronometre("portefeuille.facteurs_change")
+    def facteurs_change(self, devise=None, resoudre=True, lots=None):
+        """
+        Retourne le facteur de conversion de chaque lot vers 'devise' (par défaut CHANGE.base),
+        après avoir résolu les devises des lots ; des 1 sans devise de référence.
+        Avec 'resoudre' à False, seules les devises et les cours déjà connus sont utilisés,
+        sans requête : un facteur encore inconnu vaut NaN.
+        'lots' est l'instantané (actifs) auquel les facteurs doivent correspondre.
+        """
+        lots = self.actifs if lots is None else lots
+        devise = devise or CHANGE.base
+        if devise is None:
+            return [1.0] * len(lots)
+        if resoudre:
+            resoudre_devises(lots)
+        facteurs = CHANGE.facteurs([lot.devise for lot in lots], devise, charger=resoudre)
+        if not resoudre:
+            facteurs[np.array([lot.devise is None for lot in lots], dtype=bool)] = np.nan
+        return facteurs.tolist()
+
+    def _prix_complets(self):
+        # Les lots sans prix de marché sont complétés en une requête par fournisseur,
+        # sauf si une mise à jour les a déjà demandés
+        if self._prix_demandes:
+            return
+        self._prix_demandes = True
+        manquants = [actif for actif in self.actifs if actif.prix_marche is None]
+        if manquants:
+            self.mise_a_jour_prix_actifs(lots=manquants)
+
+    def lots_sans_prix(self):
+        """
+        Nombre de lots restés sans prix de marché : ils sont exclus des totaux.
+        """
+        return sum(actif.prix_marche is None for actif in self.actifs)
+
+    def lots_sans_change(self, devise=None):
+        """
+        Nombre de lots ayant un prix mais dont la devise n'a pas de cours vers 'devise' :
+        ils sont exclus des totaux, plutôt que d'y mêler des montants non convertis.
+        """
+        lots = self.actifs
+        return sum(actif.prix_marche is not None and math.isnan(facteur)
+                   for actif, facteur in zip(lots, self.facteurs_change(devise, lots=lots)))
+
+    @chronometre("portefeuille.valorisation_totale")
+    def valorisation_totale(self, devise=None):
+        """
+        Calcule la valorisation totale du portefeuille, convertie dans 'devise' (voir facteurs_change).
+        Les lots sans prix de marché ou sans cours de change n'y entrent pas
+        (voir lots_sans_prix et lots_sans_change).
+        """
+        self._prix_complets()
+        lots = self.actifs
+        total = 0
+        for actif, facteur in zip(lots, self.facteurs_change(devise, lots=lots)):
+            if actif.prix_marche is not None and not math.isnan(facteur):
+                total += actif.valorisation() * facteur
+        return total
+
+    @chronometre("portefeuille.calcul_pnl")
+    def calcul_pnl(self, devise=None):
+        """
+        Calcule le PnL du portefeuille entre le prix d'achat et le prix de marché actuel.
+
+        PnL = (prix_marche - prix_achat) * quantite * facteur de change
+
+        Retourne un dictionnaire du PnL latent agrégé par symbole (tous lots confondus)
+        et le PnL latent total, convertis dans 'devise' au cours du jour.
+        Le PnL réalisé des ventes est suivi à part (calcul_pnl_realise).
+        Un symbole sans prix de marché ou sans cours de change a un PnL NaN et n'entre pas dans le total.
+        """
+        self._prix_complets()
+        lots = self.actifs
+        total_pnl = 0.0
+        pnl_details = {}
+        for actif, facteur in zip(lots, self.facteurs_change(devise, lots=lots)):
+            if actif.prix_marche is None or math.isnan(facteur):
+                pnl_details[actif.nom] = np.nan
+                continue
+            pnl = (actif.prix_marche - actif.prix_achat) * actif.quantite * facteur
+            pnl_details[actif.nom] = pnl_details.get(actif.nom, 0.0) + pnl
+            total_pnl += pnl
+        return pnl_details, total_pnl
+
+    def calcul_pnl_realise(self):
+        """
+        Retourne le PnL réalisé par symbole et le PnL réalisé total des ventes passées.
+        """
+        total = 0.0
+        for pnl in self.pnl_realise.values():
+            total += pnl
+        return dict(self.pnl_realise), total
+
+    @chronometre("portefeuille.distribution_par_classe")
+    def distribution_par_classe(self, devise=None):
+        """
+        Retourne la valorisation agrégée par classe d'actif : {classe: valeur}.
+        """
+        self._prix_complets()
+        lots = self.actifs
+        distribution = {}
+        for actif, facteur in zip(lots, self.facteurs_change(devise, lots=lots)):
+            exclu = actif.prix_marche is None or math.isnan(facteur)
+            valeur = 0 if exclu else actif.valorisation() * facteur
+            distribution[actif.classe] = distribution.get(actif.classe, 0) + valeur
+        return distribution
+
+    def vers_dataframe(self):
+        """
+        Retourne les lots du portefeuille sous forme de DataFrame (colonnes de COLONNES_EXPORT).
+        """
+        lots = self.actifs
+        return pd.DataFrame({
+            "Classe": [lot.classe for lot in lots],
+            "Nom": [lot.nom for lot in lots],
+            "Quantité": np.array([lot.quantite for lot in lots], dtype=float),
+            "Date de transaction": pd.to_datetime([lot.date_transaction for lot in lots]),
+            "Prix dachat": np.array([lot.prix_achat for lot in lots], dtype=float),
+            "Prix de marché": np.array([np.nan if lot.prix_marche is None else lot.prix_marche
+                                        for lot in lots], dtype=float),
+            "Taux Coupon": np.array([np.nan if lot.taux_coupon is None else lot.taux_coupon
+                                     for lot in lots], dtype=float),
+            "Date de maturité": pd.to_datetime([lot.date_maturite for lot in lots]),
+            "Fréquence": np.array([np.nan if lot.date_maturite is None else lot.frequence
+                                   for lot in lots], dtype=float),
+        }, columns=COLONNES_EXPORT)
+
+    @chronometre("portefeuille.supprimer_actif")
+    def supprimer_actif(self, nom, quantite=None, methode="FIFO", prix_vente=None):
+        """
+        Supprime (ou vend) un actif du portefeuille.
+
+        Si 'quantite' est précisée, elle est prélevée sur les lots du symbole selon 'methode' :
+          - "FIFO" : les lots les plus anciens d'abord,
+          - "LIFO" : les lots les plus récents d'abord,
+          - "PMP"  : prix moyen pondéré, les lots restants prennent le coût moyen.
+        Si aucune quantité n'est précisée, ou si elle couvre toute la position,
+        tous les lots du symbole sont supprimés.
+
+        Le PnL réalisé est calculé au 'prix_vente', ou à défaut au prix de marché
+        (récupéré si nécessaire), converti dans CHANGE.base au cours du jour de la vente,
+        et cumulé dans pnl_realise.
+
+        Parameters:
+            nom (str): Le nom (symbole ou ISIN) de l'actif.
+            quantite (float, optionnel): La quantité à vendre.
+            methode (str, optionnel): "FIFO", "LIFO" ou "PMP".
+            prix_vente (float, optionnel): Le prix de vente unitaire.
+
+        Returns:
+            float ou None: le PnL réalisé par cette vente, None si aucun prix n'est connu.
+        """
+        if methode not in METHODES_VENTE:
+            raise ValueError(f"Méthode de vente inconnue : {methode}")
+        lots = self.lots(nom)
+        if not lots:
+            print(f"Aucun actif trouvé avec le nom {nom}.")
+            return None
+
+        # Prix et change sont récupérés hors du verrou : seule la modification des lots le prend
+        if prix_vente is None:
+            if lots[0].prix_marche is None:
+                lots[0].mise_a_jour_prix()
+            prix_vente = lots[0].prix_marche
+        if prix_vente is None:
+            print(f"Prix de marché indisponible pour {nom} : PnL réalisé non calculé.")
+        elif CHANGE.base is not None:
+            resoudre_devises(lots)
+        facteur = facteur_change(lots[0].devise) if prix_vente is not None else 1.0
+        if math.isnan(facteur):
+            print(f"Aucun cours de change pour {nom} : PnL réalisé non calculé.")
+            prix_vente = None
+        with self.verrou:
+            return self._vendre(nom, quantite, methode, prix_vente, facteur)
+
+    def _vendre(self, nom, quantite, methode, prix_vente, facteur):
+        lots = self._lots_par_symbole.get(nom)
+        if not lots:
+            return None
+        quantite_detenue = sum(lot.quantite for lot in lots)
+        reste = quantite_detenue if quantite is None else min(quantite, quantite_detenue)
+        vendu = reste
+
+        if methode == "PMP" and quantite_detenue > 0:
+            cout_moyen = sum(lot.quantite * lot.prix_achat for lot in lots) / quantite_detenue
+            for lot in lots:
+                lot.prix_achat = cout_moyen
+
+        pnl = 0.0
+        while reste > 0 and lots:
+            lot = lots[-1] if methode == "LIFO" else lots[0]
+            prelevement = min(reste, lot.quantite)
+            if prix_vente is not None:
+                pnl += (prix_vente - lot.prix_achat) * prelevement
+            reste -= prelevement
+            if prelevement >= lot.quantite:
+                if methode == "LIFO":
+                    lots.pop()
+                else:
+                    lots.popleft()
+                del self._lots[id(lot)]
+            else:
+                lot.quantite -= prelevement
+
+        if not lots:
+            del self._lots_par_symbole[nom]
+            print(f"Actif {nom} entièrement vendu et supprimé du portefeuille.")
+        else:
+            print(f"Vente de {vendu} de {nom}. Nouvelle quantité: {quantite_detenue - vendu}")
+            if prix_vente is not None:
+                print(f"Montant de la vente: {vendu * prix_vente}")
+
+        if prix_vente is None:
+            return None
+        pnl *= facteur
+        self.pnl_realise[nom] = self.pnl_realise.get(nom, 0.0) + pnl
+        return pnl
+
+
+# ======================  STOCKAGE COLONNAIRE (NumPy)  ======================
+
+# Code de classe stocké dans PortefeuilleColonnaire.code_classe
+CLASSES_ACTIF = (Action, Obligation, Crypto)
+CODE_CLASSE = {classe.__name__: code for code, classe in enumerate(CLASSES_ACTIF)}
+
+
+class VueActif:
+    """
+    Vue légère sur une ligne d'un PortefeuilleColonnaire, exposant la même interface
+    qu'un Actif. Les lectures et écritures passent directement par les colonnes.
+    Une vue n'est plus valide après la suppression d'une ligne du portefeuille.
+    """
+    __slots__ = ("_portefeuille", "_ligne")
+
+    def __init__(self, portefeuille, ligne):
+        self._portefeuille = portefeuille
+        self._ligne = ligne
+
+    @property
+    def classe(self):
+        return CLASSES_ACTIF[self._portefeuille.code_classe[self._ligne]].__name__
+
+    @property
+    def fournisseur(self):
+        return CLASSES_ACTIF[self._portefeuille.code_classe[self._ligne]].fournisseur
+
+    @property
+    def nom(self):
+        return self._portefeuille.symboles[self._portefeuille.symbole_id[self._ligne]]
+
+    @property
+    def quantite(self):
+        return float(self._portefeuille.quantite[self._ligne])
+
+    @quantite.setter
+    def quantite(self, valeur):
+        self._portefeuille.quantite[self._ligne] = valeur
+
+    @property
+    def prix_achat(self):
+        return float(self._portefeuille.prix_achat[self._ligne])
+
+    @prix_achat.setter
+    def prix_achat(self, valeur):
+        self._portefeuille.prix_achat[self._ligne] = valeur
+
+    @property
+    def prix_marche(self):
+        prix = self._portefeuille.prix_marche[self._ligne]
+        return None if np.isnan(prix) else float(prix)
+
+    @prix_marche.setter
+    def prix_marche(self, valeur):
+        self._portefeuille.prix_marche[self._ligne] = np.nan if valeur is None else valeur
+
+    @property
+    def date_transaction(self):
+        return self._portefeuille.date_transaction[self._ligne].astype(datetime.date)
+
+    @property
+    def taux_coupon(self):
+        taux = self._portefeuille.taux_coupon[self._ligne]
+        return None if np.isnan(taux) else float(taux)
+
+    @property
+    def devise(self):
+        return self._portefeuille.devises.get(self.nom)
+
+    @devise.setter
+    def devise(self, valeur):
+        self._portefeuille.devises[self.nom] = valeur
+
+    def mise_a_jour_prix(self):
+        Actif.mise_a_jour_prix(self)
+
+    def valorisation(self):
+        return Actif.valorisation(self)
+
+
+class PortefeuilleColonnaire:
+    """
+    Variante de Portefeuille pour les gros volumes de lots (100k et plus).
+
+    Les positions sont rangées dans des tableaux NumPy contigus (identifiant de symbole,
+    quantité, prix d'achat, prix de marché, date, code de classe) et la valorisation,
+    le PnL et la répartition par classe sont des réductions vectorisées.
+    Les sommes sont cumulées dans l'ordre des lignes, comme dans Portefeuille,
+    pour donner exactement les mêmes résultats. Un prix de marché non récupéré vaut NaN.
+    La devise est tenue par symbole ('devises') et convertie par un facteur diffusé sur les lignes.
+    """
+
+    COLONNES = ("symbole_id", "quantite", "prix_achat", "prix_marche",
+                "date_transaction", "code_classe", "taux_coupon")
+
+    def __init__(self, capacite=1024):
+        # Même rôle que Portefeuille.verrou, pour les lectures cohérentes de la grille
+        self.verrou = threading.RLock()
+        self._prix_demandes = False  # même rôle que dans Portefeuille
+        self.symboles = []
+        self._id_symbole = {}
+        self.devises = {}
+        self.taille = 0
+        self.pnl_realise = {}
+        self._capacite = capacite
+        self._symbole_id = np.empty(capacite, dtype=np.int64)
+        self._quantite = np.empty(capacite, dtype=np.float64)
+        self._prix_achat = np.empty(capacite, dtype=np.float64)
+        self._prix_marche = np.empty(capacite, dtype=np.float64)
+        self._date_transaction = np.empty(capacite, dtype="datetime64[D]")
+        self._code_classe = np.empty(capacite, dtype=np.int8)
+        self._taux_coupon = np.empty(capacite, dtype=np.float64)
+
+    # Colonnes visibles : uniquement les lignes occupées
+    symbole_id = property(lambda self: self._symbole_id[:self.taille])
+    quantite = property(lambda self: self._quantite[:self.taille])
+    prix_achat = property(lambda self: self._prix_achat[:self.taille])
+    prix_marche = property(lambda self: self._prix_marche[:self.taille])
+    date_transaction = property(lambda self: self._date_transaction[:self.taille])
+    code_classe = property(lambda self: self._code_classe[:self.taille])
+    taux_coupon = property(lambda self: self._taux_coupon[:self.taille])
+
+    @property
+    def actifs(self):
+        return [VueActif(self, ligne) for ligne in range(self.taille)]
+
+    def _reserver(self, nombre):
+        besoin = self.taille + nombre
+        if besoin <= self._capacite:
+            return
+        capacite = max(besoin, 2 * self._capacite)
+        for colonne in self.COLONNES:
+            ancien = getattr(self, "_" + colonne)
+            nouveau = np.empty(capacite, dtype=ancien.dtype)
+            nouveau[:self.taille] = ancien[:self.taille]
+            setattr(self, "_" + colonne, nouveau)
+        self._capacite = capacite
+
+    def _ids_symboles(self, noms):
+        ids = np.empty(len(noms), dtype=np.int64)
+        for i, nom in enumerate(noms):
+            identifiant = self._id_symbole.get(nom)
+            if identifiant is None:
+                identifiant = self._id_symbole[nom] = len(self.symboles)
+                self.symboles.append(nom)
+            ids[i] = identifiant
+        return ids
+
+    def ajouter_lots(self, classe, noms, quantites, prix_achat, dates, taux_coupon=None, prix_marche=None):
+        """
+        Ajoute en bloc des lots d'une même classe ('Action', 'Obligation' ou 'Crypto').
+        Les prix d'achat doivent être déjà résolus (voir resoudre_prix_achat).
+        """
+        nombre = len(noms)
+        self._prix_demandes = False
+        self._reserver(nombre)
+        debut, fin = self.taille, self.taille + nombre
+        self._symbole_id[debut:fin] = self._ids_symboles(noms)
+        self._quantite[debut:fin] = quantites
+        self._prix_achat[debut:fin] = prix_achat
+        self._prix_marche[debut:fin] = np.nan if prix_marche is None else prix_marche
+        self._date_transaction[debut:fin] = np.asarray(dates, dtype="datetime64[D]")
+        self._code_classe[debut:fin] = CODE_CLASSE[classe]
+        self._taux_coupon[debut:fin] = np.nan if taux_coupon is None else taux_coupon
+        self.taille = fin
+
+    @chronometre("colonnaire.importer_fichier")
+    def importer_fichier(self, filename, taille_bloc=None, annulation=None):
+        """
+        Importe un fichier de portefeuille (xlsx, xls, csv ou parquet) bloc par bloc,
+        directement dans les colonnes, sans créer d'objets Actif.
+        Les prix d'achat manquants sont ensuite résolus en bloc.
+        Retourne le RapportImport des lignes rejetées.
+        """
+        rapport = RapportImport()
+        debut = self.taille
+        for bloc in lire_blocs_portefeuille(filename, taille_bloc, rapport):
+            if annulation is not None and annulation.is_set():
+                break
+            enregistrer_obligations(bloc)
+            for classe, lignes in bloc.groupby("classe", sort=False):
+                self.ajouter_lots(classe, lignes["nom"].tolist(), lignes["quantite"].to_numpy(),
+                                  lignes["prix_achat"].to_numpy(), lignes["date_transaction"].to_numpy(),
+                                  taux_coupon=lignes["taux_coupon"].to_numpy())
+        self.resoudre_prix_achat(np.arange(self.taille) >= debut)
+        return rapport
+
+    @chronometre("colonnaire.resoudre_prix_achat")
+    def resoudre_prix_achat(self, lignes=None):
+        """
+        Fixe les prix d'achat manquants (NaN) : une requête d'historique par symbole distinct.
+        """
+        manquants = np.isnan(self.prix_achat)
+        if lignes is not None:
+            manquants &= lignes
+        for code, classe in enumerate(CLASSES_ACTIF):
+            masque = manquants & (self.code_classe == code)
+            if not masque.any():
+                continue
+            if classe is Obligation:
+                self.prix_achat[masque] = 100
+                continue
+            for identifiant in np.unique(self.symbole_id[masque]):
+                lignes_symbole = np.flatnonzero(masque & (self.symbole_id == identifiant))
+                self.prix_achat[lignes_symbole] = prix_historiques_asof(
+                    classe.fournisseur, self.symboles[identifiant], self.date_transaction[lignes_symbole])
+
+    def vers_dataframe(self):
+        """
+        Retourne les lignes du portefeuille sous forme de DataFrame (colonnes de COLONNES_EXPORT),
+        construit directement à partir des colonnes.
+        """
+        noms_classes = np.array([classe.__name__ for classe in CLASSES_ACTIF], dtype=object)
+        symboles = np.array(self.symboles, dtype=object)
+        # Les conditions des obligations sont celles du registre, diffusées sur les lignes
+        maturites, frequences = conditions_obligations(self.symboles)
+        obligation = self.code_classe == CODE_CLASSE["Obligation"]
+        return pd.DataFrame({
+            "Classe": noms_classes[self.code_classe],
+            "Nom": symboles[self.symbole_id],
+            "Quantité": self.quantite.copy(),
+            "Date de transaction": self.date_transaction.astype("datetime64[ns]"),
+            "Prix dachat": self.prix_achat.copy(),
+            "Prix de marché": self.prix_marche.copy(),
+            "Taux Coupon": self.taux_coupon.copy(),
+            "Date de maturité": np.where(obligation, maturites[self.symbole_id],
+                                         np.datetime64("NaT")).astype("datetime64[ns]"),
+            "Fréquence": np.where(obligation, frequences[self.symbole_id], np.nan),
+        }, columns=COLONNES_EXPORT)
+
+    def ajouter_actif(self, actif):
+        self.ajouter_lots(
+            actif.classe, [actif.nom], [actif.quantite], [actif.prix_achat], [actif.date_transaction],
+            taux_coupon=[np.nan if actif.taux_coupon is None else actif.taux_coupon],
+            prix_marche=[np.nan if actif.prix_marche is None else actif.prix_marche],
+        )
+        if actif.devise is not None:
+            self.devises[actif.nom] = actif.devise
+
+    @chronometre("colonnaire.mise_a_jour_prix_actifs")
+    def mise_a_jour_prix_actifs(self, lignes=None, rappel=None, annulation=None):
+        """
+        Met à jour les prix de marché : une requête par classe d'actif pour ses symboles
+        distincts, puis diffusion vectorisée des prix sur toutes les lignes.
+        'lignes' (masque booléen) restreint la mise à jour à certaines lignes ;
+        'rappel' et 'annulation' ont le même rôle que pour Portefeuille.
+        """
+        if lignes is None:
+            self._prix_demandes = True
+            lignes = np.ones(self.taille, dtype=bool)
+        masques = [lignes & (self.code_classe == code) for code in range(len(CLASSES_ACTIF))]
+        total = sum(len(np.unique(self.symbole_id[masque])) for masque in masques)
+        fait = 0
+        for code, classe in enumerate(CLASSES_ACTIF):
+            masque = masques[code]
+            if not masque.any() or classe.fournisseur is None:
+                continue
+            if annulation is not None and annulation.is_set():
+                self._prix_demandes = False
+                return
+            ids = np.unique(self.symbole_id[masque])
+            prix = classe.fournisseur.prix_actuels([self.symboles[i] for i in ids])
+            table = np.full(len(self.symboles), np.nan)
+            for i in ids:
+                symbole = self.symboles[i]
+                fait += 1
+                if symbole in prix:
+                    table[i] = prix[symbole]
+                else:
+                    INSTRUMENTATION.compter(f"prix_manquants.{classe.fournisseur.nom}")
+                    print(f"Aucune donnée trouvée pour {symbole}")
+                if rappel is not None:
+                    rappel(fait, total, symbole)
+            nouveaux = table[self.symbole_id]
+            masque &= ~np.isnan(nouveaux)
+            self.prix_marche[masque] = nouveaux[masque]
+
+    def _prix_complets(self):
+        if not self._prix_demandes:
+            self._prix_demandes = True
+            manquants = np.isnan(self.prix_marche)
+            if manquants.any():
+                self.mise_a_jour_prix_actifs(manquants)
+        return self.prix_marche
+
+    @staticmethod
+    def _somme(valeurs, depart=0):
+        # Somme séquentielle (et non par paires) pour reproduire une boucle Python
+        if len(valeurs) == 0:
+            return depart
+        return float(np.cumsum(valeurs)[-1]) + depart
+
+    def devise(self, nom):
+        return self.devises.get(nom)
+
+    def _resoudre_devises(self):
+        # Une requête par classe d'actif pour ses symboles dont la devise n'est pas encore connue
+        for code, classe in enumerate(CLASSES_ACTIF):
+            ids = np.unique(self.symbole_id[self.code_classe == code])
+            inconnus = [self.symboles[i] for i in ids if self.symboles[i] not in self.devises]
+            if inconnus:
+                self.devises.update(devises_symboles(classe.fournisseur, inconnus))
+
+    @chronometre("colonnaire.facteurs_change")
+    def facteurs_change(self, devise=None, resoudre=True):
+        """
+        Même rôle que Portefeuille.facteurs_change : un facteur par symbole, diffusé sur les lignes.
+        """
+        devise = devise or CHANGE.base
+        if devise is None:
+            return np.ones(self.taille)
+        if resoudre:
+            self._resoudre_devises()
+        par_symbole = CHANGE.facteurs([self.devises.get(symbole) for symbole in self.symboles], devise,
+                                      charger=resoudre)
+        if not resoudre:
+            par_symbole[np.array([symbole not in self.devises for symbole in self.symboles], dtype=bool)] = np.nan
+        return par_symbole[self.symbole_id]
+
+    def lots_sans_prix(self):
+        """
+        Nombre de lots restés sans prix de marché : ils sont exclus des totaux.
+        """
+        return int(np.isnan(self.prix_marche).sum())
+
+    def lots_sans_change(self, devise=None):
+        """
+        Même rôle que Portefeuille.lots_sans_change.
+        """
+        return int((np.isnan(self.facteurs_change(devise)) & ~np.isnan(self.prix_marche)).sum())
+
+    def valorisations(self, devise=None):
+        return self.quantite * self._prix_complets() * self.facteurs_change(devise)
+
+    @chronometre("colonnaire.valorisation_totale")
+    def valorisation_totale(self, devise=None):
+        """
+        Somme des valorisations des lots ayant un prix de marché et un cours de change
+        (voir lots_sans_prix et lots_sans_change).
+        """
+        valeurs = self.valorisations(devise)
+        return self._somme(valeurs[~np.isnan(valeurs)])
+
+    @chronometre("colonnaire.calcul_pnl")
+    def calcul_pnl(self, devise=None):
+        """
+        Même résultat que Portefeuille.calcul_pnl : ({nom: PnL latent}, PnL latent total).
+        """
+        pnl = (self._prix_complets() - self.prix_achat) * self.quantite * self.facteurs_change(devise)
+        # bincount accumule dans l'ordre des lignes, comme la boucle de Portefeuille
+        par_symbole = np.bincount(self.symbole_id, weights=pnl, minlength=len(self.symboles))
+        _, premieres = np.unique(self.symbole_id, return_index=True)
+        ids = self.symbole_id[np.sort(premieres)]
+        pnl_details = {self.symboles[i]: float(par_symbole[i]) for i in ids}
+        # Un symbole sans prix ou sans cours garde un PnL NaN, mais n'entre pas dans le total
+        return pnl_details, self._somme(pnl[~np.isnan(pnl)], 0.0)
+
+    def calcul_pnl_realise(self):
+        return Portefeuille.calcul_pnl_realise(self)
+
+    @chronometre("colonnaire.distribution_par_classe")
+    def distribution_par_classe(self, devise=None):
+        valeurs = self.valorisations(devise)
+        codes = self.code_classe
+        _, premieres = np.unique(codes, return_index=True)
+        distribution = {}
+        for code in codes[np.sort(premieres)]:
+            classe = valeurs[codes == code]
+            distribution[CLASSES_ACTIF[code].__name__] = self._somme(classe[~np.isnan(classe)])
+        return distribution
+
+    def _retirer_lignes(self, lignes):
+        conservees = np.ones(self.taille, dtype=bool)
+        conservees[lignes] = False
+        taille = int(conservees.sum())
+        for colonne in self.COLONNES:
+            tableau = getattr(self, "_" + colonne)
+            tableau[:taille] = tableau[:self.taille][conservees]
+        self.taille = taille
+
+    @chronometre("colonnaire.supprimer_actif")
+    def supprimer_actif(self, nom, quantite=None, methode="FIFO", prix_vente=None):
+        """
+        Même comportement que Portefeuille.supprimer_actif.
+        """
+        if methode not in METHODES_VENTE:
+            raise ValueError(f"Méthode de vente inconnue : {methode}")
+        identifiant = self._id_symbole.get(nom)
+        lignes = np.flatnonzero(self.symbole_id == identifiant) if identifiant is not None else []
+        if len(lignes) == 0:
+            print(f"Aucun actif trouvé avec le nom {nom}.")
+            return None
+        # Ordre FIFO : date de transaction, puis ordre d'ajout
+        lignes = lignes[np.argsort(self.date_transaction[lignes], kind="stable")]
+
+        if prix_vente is None:
+            if np.isnan(self.prix_marche[lignes[0]]):
+                self.mise_a_jour_prix_actifs(self.symbole_id == identifiant)
+            prix_vente = VueActif(self, lignes[0]).prix_marche
+        if prix_vente is None:
+            print(f"Prix de marché indisponible pour {nom} : PnL réalisé non calculé.")
+        elif CHANGE.base is not None and nom not in self.devises:
+            classe = CLASSES_ACTIF[self.code_classe[lignes[0]]]
+            self.devises.update(devises_symboles(classe.fournisseur, [nom]))
+        facteur = facteur_change(self.devises.get(nom)) if prix_vente is not None else 1.0
+        if math.isnan(facteur):
+            print(f"Aucun cours de change pour {nom} : PnL réalisé non calculé.")
+            prix_vente = None
+
+        quantite_detenue = sum(self.quantite[lignes].tolist())
+        reste = quantite_detenue if quantite is None else min(quantite, quantite_detenue)
+        vendu = reste
+
+        if methode == "PMP" and quantite_detenue > 0:
+            couts = (self.quantite[lignes] * self.prix_achat[lignes]).tolist()
+            self.prix_achat[lignes] = sum(couts) / quantite_detenue
+        if methode == "LIFO":
+            lignes = lignes[::-1]
+
+        pnl = 0.0
+        soldees = []
+        for ligne in lignes:
+            if reste <= 0:
+                break
+            quantite_lot = float(self.quantite[ligne])
+            prelevement = min(reste, quantite_lot)
+            if prix_vente is not None:
+                pnl += (prix_vente - float(self.prix_achat[ligne])) * prelevement
+            reste -= prelevement
+            if prelevement >= quantite_lot:
+                soldees.append(ligne)
+            else:
+                self.quantite[ligne] = quantite_lot - prelevement
+        self._retirer_lignes(soldees)
+
+        if len(soldees) == len(lignes):
+            print(f"Actif {nom} entièrement vendu et supprimé du portefeuille.")
+        else:
+            print(f"Vente de {vendu} de {nom}. Nouvelle quantité: {quantite_detenue - vendu}")
+            if prix_vente is not None:
+                print(f"Montant de la vente: {vendu * prix_vente}")
+
+        if prix_vente is None:
+            return None
+        pnl *= facteur
+        self.pnl_realise[nom] = self.pnl_realise.get(nom, 0.0) + pnl
+        return pnl
+
+
+# ======================  SÉRIES HISTORIQUES  ======================
+
+@chronometre("series.matrice_prix_historiques")
+def matrice_prix_historiques(symboles, dates):
+    """
+    Matrice (dates × symboles) des dernières clôtures connues, NaN avant la première cotation.
+    'symboles' est une liste de couples (classe, nom) ; une requête d'historique par symbole.
+    """
+    prix = np.full((len(dates), len(symboles)), np.nan)
+    debut = (dates[0] - pd.Timedelta(days=JOURS_RECUL_HISTORIQUE)).date()
+    fin = (dates[-1] + pd.Timedelta(days=1)).date()
+    for j, (classe, nom) in enumerate(symboles):
+        fournisseur = CLASSES_ACTIF[CODE_CLASSE[classe]].fournisseur
+        try:
+            serie = fournisseur.historique(nom, debut, fin).dropna()
+        except Exception as e:
+            INSTRUMENTATION.erreur(fournisseur.nom, e)
+            print(f"Erreur lors de la récupération de l'historique de {nom} : {e}")
+            continue
+        if serie.empty:
+            continue
+        serie = serie[~serie.index.duplicated(keep="last")].sort_index()
+        prix[:, j] = serie.reindex(dates, method="ffill").to_numpy()
+    return prix
+
+
+def _valeurs_periode(lots, debut, fin):
+    """
+    Valeur, coût d'achat cumulé et apports quotidiens du portefeuille sur [debut, fin].
+
+    Les lots antérieurs à 'debut' sont comptés dès 'debut'. Une matrice des positions
+    (dates × symboles), cumul des quantités achetées, est multipliée par la matrice des prix
+    en une passe ; faute de cotation, un symbole est valorisé à son coût moyen.
+    """
+    dates = pd.date_range(debut, fin, freq="D")
+    cles = lots["Classe"] + "\x00" + lots["Nom"]
+    colonnes, uniques = pd.factorize(cles)
+    symboles = [tuple(cle.split("\x00", 1)) for cle in uniques]
+    dates_lots = lots["Date de transaction"].to_numpy()
+    lignes = dates.searchsorted(dates_lots)
+    # Lots postérieurs à 'fin' ignorés
+    garder = lignes < len(dates)
+    lignes, colonnes = lignes[garder], colonnes[garder]
+    anterieurs = dates_lots[garder] < dates[0].to_datetime64()
+    quantites = lots["Quantité"].to_numpy()[garder]
+    couts_lots = quantites * lots["Prix dachat"].to_numpy()[garder]
+
+    achats_quantite = np.zeros((len(dates), len(symboles)))
+    achats_cout = np.zeros((len(dates), len(symboles)))
+    np.add.at(achats_quantite, (lignes, colonnes), quantites)
+    np.add.at(achats_cout, (lignes, colonnes), couts_lots)
+    positions = np.cumsum(achats_quantite, axis=0)
+    couts = np.cumsum(achats_cout, axis=0)
+    # Les lots antérieurs à la période sont détenus dès le départ : ce ne sont pas des apports
+    apports = np.bincount(lignes[~anterieurs], weights=couts_lots[~anterieurs], minlength=len(dates))
+
+    prix = matrice_prix_historiques(symboles, dates)
+    cout_moyen = np.divide(couts, positions, out=np.zeros_like(couts), where=positions != 0)
+    prix = np.where(np.isnan(prix), cout_moyen, prix)
+
+    return pd.DataFrame({
+        "valeur": (positions * prix).sum(axis=1),
+        "cout": couts.sum(axis=1),
+        "apport": apports,
+    }, index=dates)
+
+
+def _completer_rendements(periode, valeur_precedente=float("nan"), indice_depart=1.0, plus_haut=1.0):
+    """
+    Ajoute PnL, rendement quotidien, indice de performance pondéré par le temps et drawdown.
+    Le rendement d'un jour neutralise les achats du jour : (V_t - apport_t) / V_(t-1) - 1.
+    """
+    valeur = periode["valeur"].to_numpy()
+    precedente = np.concatenate(([valeur_precedente], valeur[:-1]))
+    rendement = np.divide(valeur - periode["apport"].to_numpy(), precedente,
+                          out=np.ones_like(valeur), where=precedente > 0) - 1
+    indice = indice_depart * np.cumprod(1 + rendement)
+    plus_hauts = np.maximum.accumulate(np.concatenate(([plus_haut], indice)))[1:]
+    periode = periode.copy()
+    periode["pnl"] = periode["valeur"] - periode["cout"]
+    periode["rendement"] = rendement
+    periode["indice"] = indice
+    periode["drawdown"] = indice / plus_hauts - 1
+    return periode
+
+
+class SerieHistorique:
+    """
+    Série quotidienne de valeur, PnL et rendement d'un portefeuille, de la première date
+    de transaction à aujourd'hui.
+
+    Seuls les lots actuellement détenus sont pris en compte, chacun à partir de sa date
+    de transaction. mettre_a_jour() n'ajoute que les jours manquants à la série en cache,
+    tant que les lots du portefeuille n'ont pas changé.
+    """
+
+    def __init__(self, portefeuille):
+        self.portefeuille = portefeuille
+        self.serie = None
+        self._signature = None
+
+    def _lots(self):
+        lots = self.portefeuille.vers_dataframe()
+        signature = pd.util.hash_pandas_object(
+            lots[["Classe", "Nom", "Quantité", "Date de transaction", "Prix dachat"]], index=False).sum()
+        return lots, signature
+
+    @chronometre("serie_historique.calculer")
+    def calculer(self, fin=None):
+        """
+        Recalcule toute la série. Colonnes : valeur, cout, apport, pnl, rendement, indice, drawdown.
+        """
+        lots, self._signature = self._lots()
+        fin = pd.Timestamp(fin or datetime.date.today())
+        if lots.empty:
+            self.serie = _completer_rendements(pd.DataFrame(
+                {"valeur": [], "cout": [], "apport": []}, index=pd.DatetimeIndex([])))
+            return self.serie
+        debut = lots["Date de transaction"].min()
+        self.serie = _completer_rendements(_valeurs_periode(lots, debut, fin))
+        return self.serie
+
+    @chronometre("serie_historique.mettre_a_jour")
+    def mettre_a_jour(self, fin=None):
+        """
+        Prolonge la série en cache jusqu'à 'fin' (aujourd'hui par défaut) en ne calculant
+        que les nouveaux jours ; recalcule tout si les lots ont changé.
+        """
+        lots, signature = self._lots()
+        fin = pd.Timestamp(fin or datetime.date.today())
+        if self.serie is None or self.serie.empty or signature != self._signature:
+            return self.calculer(fin)
+        dernier = self.serie.index[-1]
+        if fin <= dernier:
+            return self.serie
+        periode = _valeurs_periode(lots, dernier + pd.Timedelta(days=1), fin)
+        precedent = self.serie.iloc[-1]
+        nouveaux = _completer_rendements(periode, precedent["valeur"], precedent["indice"],
+                                         self.serie["indice"].max())
+        self.serie = pd.concat([self.serie, nouveaux])
+        return self.serie
+
+    def rendement_pondere_temps(self):
+        """
+        Rendement pondéré par le temps (TWR) sur toute la série.
+        """
+        return float(self.serie["indice"].iloc[-1] - 1) if len(self.serie) else 0.0
+
+    def drawdown_max(self):
+        return float(self.serie["drawdown"].min()) if len(self.serie) else 0.0
+
+
+def graphique_repartition_portefeuille(portefeuille):
+    """
+    Affiche un camembert de la répartition du portefeuille par classe d'actif,
+    basé sur la valorisation de chaque actif.
+    """
+    portefeuille.mise_a_jour_prix_actifs()
+    distribution = portefeuille.distribution_par_classe()
+    labels = list(distribution.keys())
+    sizes = list(distribution.values())
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(8, 8))
+    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
+    plt.title("Répartition du portefeuille par classe d'actif")
+    plt.axis('equal')
+    plt.show()
+
+
+# ======================  FLUX TEMPS RÉEL  ======================
+#
+# Un flux expose 'nom' et un générateur asynchrone ticks(symboles) produisant des
+# couples (symbole, prix). 'symboles' est un dictionnaire {symbole: dernier prix connu} ;
+# un flux réel n'en utilise que les clés.
+
+# Fréquence maximale de rafraîchissement de l'affichage temps réel
+IMAGES_PAR_SECONDE = 10
+
+
+class FluxYahoo:
+    """
+    Cotations des actions en continu via le websocket Yahoo Finance.
+    """
+    nom = "yahoo"
+
+    async def ticks(self, symboles):
+        messages = asyncio.Queue()
+        async with yf.AsyncWebSocket(verbose=False) as websocket:
+            await websocket.subscribe(list(symboles))
+            ecoute = asyncio.create_task(websocket.listen(messages.put_nowait))
+            try:
+                while True:
+                    message = await messages.get()
+                    if "price" in message:
+                        yield message["id"], float(message["price"])
+            finally:
+                ecoute.cancel()
+
+
+class FluxBinance:
+    """
+    Cotations des cryptos en continu via les websockets Binance (flux "miniTicker").
+    """
+    nom = "binance"
+
+    def __init__(self, api_key=None, api_secret=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+
+    async def ticks(self, symboles):
+        from binance import AsyncClient, BinanceSocketManager
+        client = await AsyncClient.create(self.api_key, self.api_secret)
+        try:
+            gestionnaire = BinanceSocketManager(client)
+            flux = [f"{symbole.lower()}@miniTicker" for symbole in symboles]
+            async with gestionnaire.multiplex_socket(flux) as socket:
+                while True:
+                    message = await socket.recv()
+                    donnees = message.get("data") or {}
+                    if "s" in donnees and "c" in donnees:
+                        yield donnees["s"], float(donnees["c"])
+        finally:
+            await client.close_connection()
+
+
+class FluxRejeu:
+    """
+    Flux local pour les tests, les benchmarks et le mode hors ligne.
+
+    Rejoue la suite de (symbole, prix) 'ticks' fournie, ou à défaut génère une marche
+    aléatoire sans fin à partir des derniers prix connus des symboles abonnés.
+    'cadence' limite le nombre de ticks par seconde (aucune limite par défaut).
+    """
+    nom = "rejeu"
+
+    def __init__(self, ticks=None, cadence=None, volatilite=0.001, graine=0, taille_lot=256):
+        self._ticks = ticks
+        self.cadence = cadence
+        self.volatilite = volatilite
+        self.graine = graine
+        self.taille_lot = taille_lot
+
+    def _lots(self, symboles):
+        if self._ticks is not None:
+            lot = []
+            for tick in self._ticks:
+                lot.append(tick)
+                if len(lot) >= self.taille_lot:
+                    yield lot
+                    lot = []
+            if lot:
+                yield lot
+            return
+        noms = list(symboles)
+        if not noms:
+            return
+        prix = np.array([symboles[nom] or 100.0 for nom in noms], dtype=float)
+        generateur = np.random.default_rng(self.graine)
+        while True:
+            indices = generateur.integers(0, len(noms), self.taille_lot)
+            chocs = np.exp(generateur.normal(0.0, self.volatilite, self.taille_lot))
+            lot = []
+            for i, choc in zip(indices.tolist(), chocs.tolist()):
+                prix[i] *= choc
+                lot.append((noms[i], float(prix[i])))
+            yield lot
+
+    async def ticks(self, symboles):
+        debut = time.perf_counter()
+        emis = 0
+        for lot in self._lots(symboles):
+            for tick in lot:
+                yield tick
+            emis += len(lot)
+            attente = emis / self.cadence - (time.perf_counter() - debut) if self.cadence else 0
+            # Rend la main à la boucle entre deux lots, même sans limite de cadence
+            await asyncio.sleep(max(attente, 0))
+
+
+class PositionsTempsReel:
+    """
+    Totaux courants du portefeuille tenus à jour tick par tick.
+
+    Les lots sont agrégés par symbole une fois pour toutes (quantité, coût, classe).
+    Un tick ne modifie que la contribution de son symbole : valorisation, PnL latent
+    et répartition par classe sont mis à jour en O(1), quel que soit le nombre de lots.
+    Un symbole sans prix de marché connu part de son prix de revient moyen ; un symbole
+    sans cours de change est laissé de côté (compté dans 'sans_change').
+    Les totaux sont exprimés dans CHANGE.base, au cours de change du démarrage ;
+    la construction peut donc faire des requêtes et se fait hors du thread Tk.
+    """
+
+    # Nombre de ticks après lequel les totaux sont recalculés, pour effacer les erreurs d'arrondi
+    RECALCUL_TICKS = 1_000_000
+
+    def __init__(self, portefeuille):
+        # Devises et cours chargés d'abord, puis lots et facteurs lus ensemble sous le verrou
+        portefeuille.facteurs_change()
+        with portefeuille.verrou:
+            lots = portefeuille.vers_dataframe()
+            lots["Facteur"] = np.asarray(portefeuille.facteurs_change(resoudre=False), dtype=float)
+        lots["Coût"] = lots["Quantité"] * lots["Prix dachat"]
+        groupes = lots.groupby("Nom", sort=False)
+        positions = groupes.agg(classe=("Classe", "first"), quantite=("Quantité", "sum"),
+                                cout=("Coût", "sum"), prix=("Prix de marché", "last"),
+                                facteur=("Facteur", "first"))
+        sans_change = positions["facteur"].isna()
+        self.sans_change = int(sans_change.sum())
+        positions = positions[~sans_change]
+        revient = positions["cout"] / positions["quantite"].where(positions["quantite"] != 0)
+        positions["prix"] = positions["prix"].fillna(revient).fillna(0.0)
+        # [quantité, coût converti, prix, classe, facteur de change] : listes modifiables en place,
+        # accès direct par symbole ; le prix reste dans la devise du symbole
+        self._positions = {nom: [quantite, cout * facteur, prix, classe, facteur]
+                           for nom, classe, quantite, cout, prix, facteur
+                           in zip(positions.index, positions["classe"], positions["quantite"],
+                                  positions["cout"], positions["prix"], positions["facteur"])}
+        self.ticks = 0
+        self.recalculer()
+
+    def recalculer(self):
+        """
+        Recalcule exactement les totaux à partir des positions (O(nombre de symboles)).
+        """
+        self.valeur = 0.0
+        self.cout = 0.0
+        self.distribution = {}
+        for quantite, cout, prix, classe, facteur in self._positions.values():
+            self.valeur += quantite * prix * facteur
+            self.cout += cout
+            self.distribution[classe] = self.distribution.get(classe, 0.0) + quantite * prix * facteur
+        self._depuis_recalcul = 0
+
+    @property
+    def pnl(self):
+        return self.valeur - self.cout
+
+    @property
+    def symboles(self):
+        return {nom: position[2] for nom, position in self._positions.items()}
+
+    def classe(self, symbole):
+        return self._positions[symbole][3]
+
+    def appliquer(self, symbole, prix):
+        """
+        Applique un tick ; retourne False si le symbole n'est pas détenu.
+        """
+        position = self._positions.get(symbole)
+        if position is None:
+            return False
+        ecart = position[0] * (prix - position[2]) * position[4]
+        position[2] = prix
+        self.valeur += ecart
+        self.distribution[position[3]] += ecart
+        self.ticks += 1
+        self._depuis_recalcul += 1
+        if self._depuis_recalcul >= self.RECALCUL_TICKS:
+            self.recalculer()
+        return True
+
+    def pnl_symbole(self, symbole):
+        quantite, cout, prix, _, facteur = self._positions[symbole]
+        return quantite * prix * facteur - cout
+
+    def reporter(self, portefeuille):
+        """
+        Reporte les derniers prix reçus sur les lots du portefeuille.
+        """
+        for actif in portefeuille.actifs:
+            position = self._positions.get(actif.nom)
+            if position is not None:
+                actif.prix_marche = position[2]
+
+
+class DiffusionTempsReel:
+    """
+    Abonne les positions aux flux de leurs classes d'actifs dans une boucle asyncio
+    tournant sur un thread dédié. Chaque tick est appliqué dès réception ;
+    l'interface relève l'état (etat()) à sa propre cadence.
+    """
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.erreur = None
+        self._verrou = threading.Lock()
+        self._arret = threading.Event()
+        self._boucle = None
+        self._principale = None
+        self._thread = None
+        self.abonnements = {}
+        classes = {classe.__name__: classe for classe in CLASSES_ACTIF}
+        for symbole, prix in positions.symboles.items():
+            flux = classes[positions.classe(symbole)].flux
+            if flux is not None:
+                _, symboles = self.abonnements.setdefault(id(flux), (flux, {}))
+                symboles[symbole] = prix
+
+    def demarrer(self):
+        self._thread = threading.Thread(target=asyncio.run, args=(self._executer(),), daemon=True)
+        self._thread.start()
+
+    async def _executer(self):
+        self._boucle = asyncio.get_running_loop()
+        self._principale = asyncio.current_task()
+        if self._arret.is_set():
+            return
+        try:
+            await asyncio.gather(*(self._suivre(flux, symboles) for flux, symboles in self.abonnements.values()))
+        except asyncio.CancelledError:
+            pass  # arrêt demandé par arreter()
+        finally:
+            # Flux terminés ou en erreur : asyncio.run va fermer la boucle, arreter() ne doit plus y toucher
+            with self._verrou:
+                self._boucle = None
+                self._principale = None
+
+    async def _suivre(self, flux, symboles):
+        try:
+            async for symbole, prix in flux.ticks(symboles):
+                with self._verrou:
+                    self.positions.appliquer(symbole, prix)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            INSTRUMENTATION.erreur(f"flux.{flux.nom}", e)
+            print(f"Erreur du flux {flux.nom} : {e}")
+            self.erreur = e
+
+    def etat(self):
+        """
+        Retourne (valorisation, PnL latent, répartition par classe, nombre de ticks appliqués).
+        """
+        with self._verrou:
+            return (self.positions.valeur, self.positions.pnl, dict(self.positions.distribution),
+                    self.positions.ticks)
+
+    def arreter(self, attendre=1.0):
+        self._arret.set()
+        with self._verrou:
+            if self._thread is not None and self._thread.is_alive() and self._boucle is not None:
+                self._boucle.call_soon_threadsafe(self._principale.cancel)
+        if self._thread is not None:
+            self._thread.join(attendre)
+
+    def prix(self):
+        """
+        Retourne les derniers prix reçus : {symbole: prix}.
+        """
+        with self._verrou:
+            return self.positions.symboles
+
+    def reporter(self, portefeuille):
+        with self._verrou:
+            self.positions.reporter(portefeuille)
+
+
+# ======================  IMPORT / EXPORT  ======================
+
+COLONNES_IMPORT = ["Classe", "Nom", "Quantité", "Prix dachat", "Date de transaction"]
+COLONNES_IMPORT_OPTIONNELLES = ["Taux Coupon", "Date de maturité", "Fréquence"]
+CLASSES_IMPORT = {"action": "Action", "obligation": "Obligation", "crypto": "Crypto"}
+
+# Nombre de lignes lues et validées à la fois : borne la mémoire de l'import
+TAILLE_BLOC_IMPORT = 50000
+
+
+class RapportImport:
+    """
+    Rapport unique des lignes rejetées lors d'un import.
+    Seuls les 'max_messages' premiers messages sont conservés, toutes les erreurs sont comptées.
+    """
+
+    def __init__(self, max_messages=1000):
+        self.max_messages = max_messages
+        self.nombre = 0
+        self.messages = []
+
+    def ajouter(self, message):
+        self.nombre += 1
+        if len(self.messages) < self.max_messages:
+            self.messages.append(message)
+
+    def resume(self, lignes=20):
+        texte = "\n".join(self.messages[:lignes])
+        if self.nombre > lignes:
+            texte += f"\n... et {self.nombre - lignes} autre(s) ligne(s) ignorée(s)."
+        return texte
+
+
+def _blocs_xlsx(filename, taille_bloc):
+    # Lecture en flux (read_only) : les lignes ne sont jamais toutes en mémoire
+    from openpyxl import load_workbook
+    classeur = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        lignes = classeur.active.iter_rows(values_only=True)
+        entete = ["" if cellule is None else str(cellule).strip() for cellule in next(lignes, ())]
+        largeur = len(entete)
+        bloc = []
+        for ligne in lignes:
+            if all(cellule is None for cellule in ligne):
+                continue
+            ligne = tuple(ligne[:largeur])
+            bloc.append(ligne + (None,) * (largeur - len(ligne)))
+            if len(bloc) >= taille_bloc:
+                yield pd.DataFrame.from_records(bloc, columns=entete)
+                bloc = []
+        if bloc or not entete:
+            yield pd.DataFrame.from_records(bloc, columns=entete)
+    finally:
+        classeur.close()
+
+
+def _blocs_parquet(filename, taille_bloc):
+    import pyarrow.parquet as pq
+    fichier = pq.ParquetFile(filename)
+    colonnes = [col for col in COLONNES_IMPORT + COLONNES_IMPORT_OPTIONNELLES if col in fichier.schema_arrow.names]
+    for lot in fichier.iter_batches(batch_size=taille_bloc, columns=colonnes):
+        yield lot.to_pandas()
+
+
+def lire_blocs_bruts(filename, taille_bloc=None):
+    """
+    Lit un fichier de portefeuille par blocs de 'taille_bloc' lignes, selon son extension :
+    xlsx en lecture seule openpyxl, csv par morceaux, parquet par groupes de lignes.
+    Les anciens fichiers xls sont lus d'un seul tenant.
+    """
+    taille_bloc = taille_bloc or TAILLE_BLOC_IMPORT
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _blocs_xlsx(filename, taille_bloc)
+    if extension == ".csv":
+        return pd.read_csv(filename, chunksize=taille_bloc, float_precision="round_trip")
+    if extension == ".parquet":
+        return _blocs_parquet(filename, taille_bloc)
+    return iter([pd.read_excel(filename)])
+
+
+def _convertir_dates(colonne):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        dates = pd.to_datetime(colonne, errors="coerce")
+    # Formats hétérogènes : seules les valeurs non reconnues sont relues une à une
+    a_relire = dates.isna() & colonne.notna()
+    if a_relire.any():
+        dates[a_relire] = pd.to_datetime(colonne[a_relire].astype(str), errors="coerce", format="mixed")
+    return dates.dt.normalize()
+
+
+def valider_bloc(df, premiere_ligne, rapport):
+    """
+    Valide et convertit un bloc brut de façon vectorisée.
+
+    Retourne un DataFrame aux colonnes classe, nom, quantite, prix_achat (NaN si absent),
+    date_transaction, taux_coupon, date_maturite (NaT si absente) et frequence ;
+    les lignes rejetées sont ajoutées au rapport.
+    """
+    if "Prix dachat" not in df.columns and "Prix d'achat" in df.columns:
+        # Fichiers produits par les anciennes versions de l'export
+        df = df.rename(columns={"Prix d'achat": "Prix dachat"})
+    for col in COLONNES_IMPORT:
+        if col not in df.columns:
+            raise ValueError(f"Colonne '{col}' manquante.")
+
+    numeros = np.arange(premiere_ligne, premiere_ligne + len(df))
+    classe_brute = df["Classe"].astype(str).str.strip()
+    classe = classe_brute.str.lower().map(CLASSES_IMPORT)
+    nom = df["Nom"].astype(str).str.strip()
+    quantite = pd.to_numeric(df["Quantité"], errors="coerce")
+    prix_achat = pd.to_numeric(df["Prix dachat"], errors="coerce")
+    dates = _convertir_dates(df["Date de transaction"])
+    if "Taux Coupon" in df.columns:
+        taux_coupon = pd.to_numeric(df["Taux Coupon"], errors="coerce")
+    else:
+        taux_coupon = pd.Series(np.nan, index=df.index)
+    # Seules les obligations portent un coupon, nul par défaut
+    taux_coupon = taux_coupon.where(classe != "Obligation", taux_coupon.fillna(0.0))
+    if "Date de maturité" in df.columns:
+        date_maturite = _convertir_dates(df["Date de maturité"])
+    else:
+        date_maturite = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    if "Fréquence" in df.columns:
+        frequence = pd.to_numeric(df["Fréquence"], errors="coerce").fillna(1)
+    else:
+        frequence = pd.Series(1, index=df.index)
+
+    quantite_invalide = quantite.isna().to_numpy()
+    date_invalide = dates.isna().to_numpy() & ~quantite_invalide
+    classe_invalide = classe.isna().to_numpy() & ~quantite_invalide & ~date_invalide
+    frequence_invalide = (~frequence.isin(FREQUENCES_COUPON).to_numpy() & (classe == "Obligation").to_numpy()
+                          & ~quantite_invalide & ~date_invalide)
+    for numero in numeros[quantite_invalide]:
+        rapport.ajouter(f"Ligne {numero}: Quantité invalide, ignorée.")
+    for numero in numeros[date_invalide]:
+        rapport.ajouter(f"Ligne {numero}: Date de transaction invalide, ignorée.")
+    for numero, valeur in zip(numeros[classe_invalide], classe_brute[classe_invalide]):
+        rapport.ajouter(f"Ligne {numero}: Classe '{valeur}' inconnue, ignorée.")
+    for numero in numeros[frequence_invalide]:
+        rapport.ajouter(f"Ligne {numero}: Fréquence de coupon invalide, ignorée.")
+
+    valides = ~(quantite_invalide | date_invalide | classe_invalide | frequence_invalide)
+    return pd.DataFrame({
+        "classe": classe[valides],
+        "nom": nom[valides],
+        "quantite": quantite[valides].astype(float),
+        "prix_achat": prix_achat[valides].astype(float),
+        "date_transaction": dates[valides],
+        "taux_coupon": taux_coupon[valides].astype(float),
+        "date_maturite": date_maturite[valides],
+        "frequence": frequence[valides].astype(int),
+    })
+
+
+def lire_blocs_portefeuille(filename, taille_bloc=None, rapport=None):
+    """
+    Générateur de blocs validés (voir valider_bloc) pour un fichier de portefeuille.
+    Lève ValueError si le fichier est illisible ou s'il manque une colonne.
+    """
+    rapport = rapport if rapport is not None else RapportImport()
+    premiere_ligne = 0
+    try:
+        blocs = iter(lire_blocs_bruts(filename, taille_bloc))
+    except Exception as e:
+        raise ValueError(f"Impossible de lire le fichier {filename}.\n{e}")
+    while True:
+        try:
+            with INSTRUMENTATION.mesurer("import.lecture"):
+                bloc = next(blocs, None)
+        except Exception as e:
+            raise ValueError(f"Impossible de lire le fichier {filename}.\n{e}")
+        if bloc is None:
+            return
+        bloc = bloc.reset_index(drop=True)
+        with INSTRUMENTATION.mesurer("import.validation"):
+            valide = valider_bloc(bloc, premiere_ligne, rapport)
+        INSTRUMENTATION.compter("import.lignes", len(bloc))
+        yield valide
+        premiere_ligne += len(bloc)
+
+
+def _maturites(bloc):
+    return [None if pd.isna(date) else date.date() for date in bloc["date_maturite"]]
+
+
+def enregistrer_obligations(bloc):
+    """
+    Enregistre dans le moteur obligataire les obligations d'un bloc validé qui ont une date de maturité.
+    """
+    obligations = bloc[(bloc["classe"] == "Obligation") & bloc["date_maturite"].notna()]
+    for nom, taux_coupon, maturite, frequence, date_transaction in zip(
+            obligations["nom"].tolist(), obligations["taux_coupon"].tolist(), _maturites(obligations),
+            obligations["frequence"].tolist(), obligations["date_transaction"].dt.date.tolist()):
+        enregistrer_obligation(nom, taux_coupon, maturite, frequence, date_transaction)
 
 
-# ======================  CLASSES DU PORTFEUILLE  ======================
+@chronometre("import.lire_portefeuille")
+def lire_portefeuille(filename, annulation=None, taille_bloc=None):
+    """
+    Lit un fichier de portefeuille et construit les actifs correspondants.
 
-class Actif:
-    def __init__(self, nom, quantite, date_transaction, prix_achat=None):
-        self.nom = nom  
-        self.quantite = quantite
-        self.date_transaction = date_transaction
-        self.prix_achat = prix_achat      
-        
-        self.prix_marche = None
+    Les lignes invalides sont ignorées et décrites dans un RapportImport ;
+    les prix d'achat manquants sont résolus en bloc (resoudre_prix_achat).
+    Lève ValueError si le fichier est illisible ou s'il manque une colonne.
 
-    def mise_a_jour_prix(self):
-        pass
+    Returns:
+        (list, RapportImport): les actifs lus et le rapport, ou None si 'annulation' a été déclenchée.
+    """
+    constructeurs = {"Action": Action, "Crypto": Crypto}
+    rapport = RapportImport()
+    nouveaux_actifs = []
+    for bloc in lire_blocs_portefeuille(filename, taille_bloc, rapport):
+        if annulation is not None and annulation.is_set():
+            return None
+        prix_achat = bloc["prix_achat"].astype(object).where(bloc["prix_achat"].notna(), None)
+        colonnes = zip(bloc["classe"].tolist(), bloc["nom"].tolist(), bloc["quantite"].tolist(),
+                       bloc["date_transaction"].dt.date.tolist(), prix_achat.tolist(),
+                       bloc["taux_coupon"].tolist(), _maturites(bloc), bloc["frequence"].tolist())
+        # Le prix d'achat manquant est résolu en bloc après la lecture du fichier
+        with INSTRUMENTATION.mesurer("import.construction"):
+            for classe, nom, quantite, date_transaction, prix, taux_coupon, maturite, frequence in colonnes:
+                if classe == "Obligation":
+                    actif = Obligation(nom, quantite, date_transaction, taux_coupon=taux_coupon, prix_achat=prix,
+                                       date_maturite=maturite, frequence=frequence)
+                else:
+                    actif = constructeurs[classe](nom, quantite, date_transaction, prix_achat=prix,
+                                                  resoudre_prix=False)
+                nouveaux_actifs.append(actif)
 
-    def valorisation(self):
-        """
-        Retourne la valeur de l'actif (quantité * prix de marché).
-        """
-        if self.prix_marche is None:
-            self.mise_a_jour_prix()
-        return self.quantite * self.prix_marche
+    if annulation is not None and annulation.is_set():
+        return None
+    resoudre_prix_achat(nouveaux_actifs)
+    return nouveaux_actifs, rapport
 
-class Action(Actif):
-    def __init__(self, symbole, quantite, date_transaction, prix_achat=None):
-        super().__init__(symbole, quantite, date_transaction, prix_achat)
-        if self.prix_achat is None:
-            ticker = yf.Ticker(self.nom)
-            start_date = self.date_transaction
-            end_date = self.date_transaction + datetime.timedelta(days=1)
-            data = ticker.history(start=start_date, end=end_date)
-            if not data.empty:
-                self.prix_achat = data['Close'].iloc[0]
-            else:
-                print(f"Aucune donnée pour fixer le prix d'achat de {self.nom} à la date {self.date_transaction}")
-                self.prix_achat = 0.0
 
-    def mise_a_jour_prix(self):
-        """
-        Récupère le dernier prix de clôture actuel via yfinance.
-        """
-        ticker = yf.Ticker(self.nom)
-        data = ticker.history(period="1d")
-        if not data.empty:
-            self.prix_marche = data['Close'].iloc[-1]
+# Colonnes exportées : les noms sont ceux attendus par l'import, pour permettre l'aller-retour
+COLONNES_EXPORT = ["Classe", "Nom", "Quantité", "Date de transaction", "Prix dachat",
+                   "Prix de marché", "Taux Coupon", "Date de maturité", "Fréquence"]
+
+
+def _ecrire_xlsx(df, filename, taille_bloc):
+    # Classeur en écriture seule : les lignes sont envoyées au fichier au fil de l'eau.
+    # Les colonnes sont remises dans l'ordre de l'en-tête ; une colonne absente reste vide.
+    from openpyxl import Workbook
+    df = df.reindex(columns=COLONNES_EXPORT)
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet()
+    feuille.append(COLONNES_EXPORT)
+    for debut in range(0, len(df), taille_bloc):
+        bloc = df.iloc[debut:debut + taille_bloc].copy()
+        for colonne in ("Date de transaction", "Date de maturité"):
+            bloc[colonne] = pd.to_datetime(bloc[colonne]).dt.date
+        bloc = bloc.astype(object).where(bloc.notna(), None)
+        for ligne in bloc.itertuples(index=False, name=None):
+            feuille.append(ligne)
+    classeur.save(filename)
+
+
+@chronometre("export.exporter_fichier")
+def exporter_fichier(portefeuille, filename, taille_bloc=None):
+    """
+    Exporte le portefeuille sans boîte de dialogue, selon l'extension de 'filename' :
+    .parquet, .csv, ou .xlsx (écriture en flux, mémoire constante).
+
+    Le fichier contiendra pour chaque actif :
+      - Classe
+      - Nom
+      - Quantité
+      - Date de transaction
+      - Prix dachat
+      - Prix de marché
+      - Taux Coupon (vide pour les actifs autres que les obligations)
+      - Date de maturité et Fréquence (vides sauf pour les obligations dont la maturité est connue)
+    """
+    with INSTRUMENTATION.mesurer("export.dataframe"):
+        df = portefeuille.vers_dataframe()
+    extension = os.path.splitext(filename)[1].lower()
+    with INSTRUMENTATION.mesurer(f"export.ecriture{extension}"):
+        _ecrire_fichier(df, filename, extension, taille_bloc)
+
+
+def _ecrire_fichier(df, filename, extension, taille_bloc):
+    if extension == ".parquet":
+        df.to_parquet(filename, index=False)
+    elif extension == ".csv":
+        # Conversion des dates en texte ISO par NumPy, bien plus rapide que strftime ligne à ligne
+        df["Date de transaction"] = df["Date de transaction"].to_numpy().astype("datetime64[D]").astype(str)
+        maturites = df["Date de maturité"].to_numpy().astype("datetime64[D]")
+        df["Date de maturité"] = np.where(np.isnat(maturites), "", maturites.astype(str))
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pa_csv
+        except ImportError:
+            df.to_csv(filename, index=False)
         else:
-            print(f"Aucune donnée trouvée pour {self.nom}")
+            pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), filename)
+    else:
+        _ecrire_xlsx(df, filename, taille_bloc or TAILLE_BLOC_IMPORT)
 
 
-class Obligation(Actif):
-    def __init__(self, isin, quantite, date_transaction, taux_coupon, prix_achat=None):
-        super().__init__(isin, quantite, date_transaction, prix_achat)
-        self.taux_coupon = taux_coupon
-        if self.prix_achat is None:
-            self.prix_achat = 100
+# ======================  GRILLE DES POSITIONS  ======================
 
-    def mise_a_jour_prix(self):
+class TablePositions:
+    """
+    Données de la grille des positions : les lots sont agrégés par symbole dans des colonnes
+    NumPy (quantité, prix d'achat moyen, prix de marché, valeur, PnL latent).
+    Les prix restent dans la devise du symbole ; valeur et PnL sont convertis dans 'base'
+    avec les seuls facteurs déjà connus (aucune requête) : 'complet' est faux tant qu'il en manque,
+    et la valeur et le PnL des symboles concernés restent vides.
+
+    Le filtre et le tri ne déplacent pas les données : ils produisent 'ordre', les indices
+    des lignes affichées. Seules les lignes demandées par lignes() sont mises en forme.
+    """
+
+    COLONNES = ("Classe", "Nom", "Devise", "Quantité", "Prix d'achat", "Prix de marché", "Valeur", "PnL")
+
+    def __init__(self, portefeuille):
+        self.portefeuille = portefeuille
+        self.tri = None  # (colonne, décroissant)
+        self.filtre_texte = ""
+        self.filtre_classe = None
+        self.recharger()
+
+    @chronometre("grille.recharger")
+    def recharger(self):
         """
-        Pour simplifier, on simule ici le prix de l'obligation.
+        Reconstruit les positions à partir des lots (après un ajout, une vente, un import
+        ou un rafraîchissement des prix), en conservant le tri et le filtre.
         """
-        self.prix_marche = 100  
+        with self.portefeuille.verrou:
+            lots = self.portefeuille.vers_dataframe()
+            lots["Facteur"] = np.asarray(self.portefeuille.facteurs_change(resoudre=False), dtype=float)
+        lots["Coût"] = lots["Quantité"] * lots["Prix dachat"]
+        positions = lots.groupby("Nom", sort=False).agg(
+            classe=("Classe", "first"), quantite=("Quantité", "sum"), cout=("Coût", "sum"),
+            prix=("Prix de marché", "last"), facteur=("Facteur", "first"))
+        self.base = CHANGE.base
+        self.noms = positions.index.to_numpy(dtype=object)
+        self.classes = positions["classe"].to_numpy(dtype=object)
+        self.devises = np.array([self.portefeuille.devise(nom) or "" for nom in self.noms], dtype=object)
+        self.facteur = positions["facteur"].to_numpy(dtype=float)
+        self.complet = not np.isnan(self.facteur).any()
+        self.quantite = positions["quantite"].to_numpy(dtype=float)
+        self.cout = positions["cout"].to_numpy(dtype=float)
+        self.prix_marche = positions["prix"].to_numpy(dtype=float, copy=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.prix_achat = np.where(self.quantite != 0, self.cout / self.quantite, np.nan)
+        self._ligne_symbole = {nom: ligne for ligne, nom in enumerate(self.noms)}
+        self._valoriser()
+        self._appliquer_vue()
 
-class Crypto(Actif):
-    def __init__(self, symbole, quantite, date_transaction, prix_achat=None):
-        super().__init__(symbole, quantite, date_transaction, prix_achat)
-        if self.prix_achat is None:
-            client = Client(
-                api_key="XXXXXX", #à remplacer par votre clef API BINANCE 
-                api_secret="XXXXXX" #à remplacer par votre clef API BINANCE 
-            )
-            start_str = self.date_transaction.strftime("%d %b, %Y")
-            end_str = (self.date_transaction + datetime.timedelta(days=1)).strftime("%d %b, %Y")
-            try:
-                klines = client.get_historical_klines(
-                    self.nom, Client.KLINE_INTERVAL_1DAY, start_str, end_str)
-                if klines:
-            
-                    self.prix_achat = float(klines[0][4])
-                else:
-                    print(f"Pas de données historiques pour fixer le prix d'achat de {self.nom} à la date {self.date_transaction}")
-                    self.prix_achat = 0.0
-            except Exception as e:
-                print(f"Erreur lors de la récupération du prix d'achat pour {self.nom} : {e}")
-                self.prix_achat = 0.0
+    def _valoriser(self):
+        self.valeur = self.quantite * self.prix_marche * self.facteur
+        self.pnl = self.valeur - self.cout * self.facteur
 
-    def mise_a_jour_prix(self):
+    def mettre_a_jour_prix(self, prix):
         """
-        Récupère le prix actuel via Binance en utilisant l'API publique.
+        Applique des prix de marché ({symbole: prix}) sans reconstruire les positions.
+        L'ordre d'affichage ne change pas, pour que les lignes ne sautent pas à chaque mise à jour.
         """
-        client = Client(
-            api_key="XXXXXXX", #à remplacer par votre clef API BINANCE
-            api_secret="XXXXX" #à remplacer par votre clef API BINANCE
-        )
-        try:
-            prix_info = client.get_symbol_ticker(symbol=self.nom)
-            self.prix_marche = float(prix_info['price'])
-        except Exception as e:
-            print(f"Erreur lors de la récupération du prix pour {self.nom} : {e}")
+        lignes = np.fromiter((self._ligne_symbole.get(symbole, -1) for symbole in prix),
+                             dtype=np.int64, count=len(prix))
+        valeurs = np.fromiter(prix.values(), dtype=float, count=len(prix))
+        connues = lignes >= 0
+        self.prix_marche[lignes[connues]] = valeurs[connues]
+        self._valoriser()
 
+    def _colonne(self, colonne):
+        return dict(zip(self.COLONNES, (self.classes, self.noms, self.devises, self.quantite, self.prix_achat,
+                                        self.prix_marche, self.valeur, self.pnl)))[colonne]
 
-class Portefeuille:
-    def __init__(self):
-        self.actifs = []
+    def _appliquer_vue(self):
+        lignes = np.arange(len(self.noms))
+        if self.filtre_classe:
+            lignes = lignes[self.classes == self.filtre_classe]
+        if self.filtre_texte:
+            noms = pd.Series(self.noms[lignes], dtype=object).str
+            lignes = lignes[noms.contains(self.filtre_texte, case=False, regex=False).to_numpy(dtype=bool)]
+        if self.tri is not None:
+            colonne, decroissant = self.tri
+            cle = self._colonne(colonne)[lignes]
+            if cle.dtype == object:
+                ordre = np.argsort(cle, kind="stable")
+                ordre = ordre[::-1] if decroissant else ordre
+            else:
+                # Les prix inconnus (NaN) restent en fin de liste dans les deux sens
+                ordre = np.argsort(-cle if decroissant else cle, kind="stable")
+            lignes = lignes[ordre]
+        self.ordre = lignes
 
-    def ajouter_actif(self, actif):
-        self.actifs.append(actif)
+    @chronometre("grille.trier")
+    def trier(self, colonne, decroissant=False):
+        self.tri = (colonne, decroissant)
+        self._appliquer_vue()
 
-    def mise_a_jour_prix_actifs(self):
+    @chronometre("grille.filtrer")
+    def filtrer(self, texte="", classe=None):
         """
-        Met à jour le prix de marché de chacun des actifs du portefeuille.
+        Ne garde que les symboles contenant 'texte' (sans tenir compte de la casse)
+        et, si elle est précisée, de la classe 'classe'.
         """
-        for actif in self.actifs:
-            actif.mise_a_jour_prix()
+        self.filtre_texte = texte
+        self.filtre_classe = classe
+        self._appliquer_vue()
 
-    def valorisation_totale(self):
+    def __len__(self):
+        return len(self.ordre)
+
+    def symbole(self, position):
+        return self.noms[self.ordre[position]]
+
+    def lignes(self, debut, nombre):
         """
-        Calcule la valorisation totale du portefeuille.
+        Retourne les valeurs mises en forme des lignes affichées [debut, debut + nombre).
         """
-        total = 0
-        for actif in self.actifs:
-            total += actif.valorisation()
-        return total
+        def montant(valeur):
+            return "—" if np.isnan(valeur) else f"{valeur:,.2f}"
 
-    def calcul_pnl(self):
-        """
-        Calcule le PnL du portefeuille entre le prix d'achat et le prix de marché actuel.
+        return [(self.classes[ligne], self.noms[ligne], self.devises[ligne], f"{self.quantite[ligne]:g}",
+                 montant(self.prix_achat[ligne]), montant(self.prix_marche[ligne]),
+                 montant(self.valeur[ligne]), montant(self.pnl[ligne]))
+                for ligne in self.ordre[debut:debut + nombre]]
 
-        PnL = (prix_marche - prix_achat) * quantite
 
-        Retourne un dictionnaire par actif et le PnL total.
-        """
-        total_pnl = 0.0
-        pnl_details = {}
-        for actif in self.actifs:
-            if actif.prix_marche is None:
-                actif.mise_a_jour_prix()
-            pnl = (actif.prix_marche - actif.prix_achat) * actif.quantite
-            pnl_details[actif.nom] = pnl
-            total_pnl += pnl
-        return pnl_details, total_pnl
+class GrillePositions(tk.Frame):
+    """
+    Grille virtualisée des positions : le Treeview ne contient que les lignes visibles,
+    réutilisées à chaque défilement, les données restant dans une TablePositions.
+    Un clic sur un en-tête trie la colonne (un second clic inverse l'ordre).
+    """
 
-    def supprimer_actif(self, nom, quantite=None):
-        """
-        Supprime (ou vend) un actif du portefeuille.
+    HAUTEUR_LIGNE = 20
+    # Délai avant d'appliquer le filtre saisi (ms), pour ne pas filtrer à chaque touche
+    DELAI_FILTRE = 200
 
-        Si 'quantite' est précisée, la quantité de l'actif est réduite de cette valeur.
-        Si la quantité restante est <= 0 ou si aucune quantité n'est précisée, l'actif est supprimé.
+    def __init__(self, parent, portefeuille, au_clic=None):
+        super().__init__(parent)
+        self.portefeuille = portefeuille
+        self.au_clic = au_clic
+        self.table = None
+        self.debut = 0
+        self._items = []
+        self._peinture = None
+        self._filtrage = None
 
-        Parameters:
-            nom (str): Le nom (symbole ou ISIN) de l'actif.
-            quantite (float, optionnel): La quantité à vendre.
+        barre = tk.Frame(self)
+        barre.pack(side=tk.TOP, fill=tk.X)
+        tk.Label(barre, text="Filtrer:").pack(side=tk.LEFT)
+        self.texte_filtre = tk.StringVar()
+        self.texte_filtre.trace_add("write", lambda *_: self._planifier_filtre())
+        tk.Entry(barre, textvariable=self.texte_filtre).pack(side=tk.LEFT, padx=5)
+        self.classe_filtre = tk.StringVar(value="Toutes")
+        option_classe = ttk.Combobox(barre, textvariable=self.classe_filtre, state="readonly", width=12,
+                                     values=["Toutes"] + [classe.__name__ for classe in CLASSES_ACTIF])
+        option_classe.bind("<<ComboboxSelected>>", lambda evenement: self._filtrer())
+        option_classe.pack(side=tk.LEFT)
+        self.label_nombre = tk.Label(barre, text="", anchor=tk.E)
+        self.label_nombre.pack(side=tk.RIGHT)
+
+        ttk.Style(self).configure("Grille.Treeview", rowheight=self.HAUTEUR_LIGNE)
+        self.arbre = ttk.Treeview(self, columns=TablePositions.COLONNES, show="headings",
+                                  selectmode="none", style="Grille.Treeview", height=10)
+        for colonne in TablePositions.COLONNES:
+            self.arbre.heading(colonne, text=colonne, command=lambda c=colonne: self.trier(c))
+            self.arbre.column(colonne, width=60 if colonne == "Devise" else 110,
+                              anchor=tk.W if colonne in ("Classe", "Nom", "Devise") else tk.E)
+        self.defilement = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._defiler)
+        self.defilement.pack(side=tk.RIGHT, fill=tk.Y)
+        self.arbre.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.arbre.bind("<Configure>", self._redimensionner)
+        self.arbre.bind("<MouseWheel>", self._molette)
+        self.arbre.bind("<Button-4>", self._molette)
+        self.arbre.bind("<Button-5>", self._molette)
+        self.arbre.bind("<ButtonRelease-1>", self._cliquer)
+
+    def recharger(self):
         """
-        for actif in self.actifs:
-            if actif.nom == nom:
-                if quantite is None or quantite >= actif.quantite:
-                    self.actifs.remove(actif)
-                    print(f"Actif {nom} entièrement vendu et supprimé du portefeuille.")
-                else:
-                    actif.quantite -= quantite
-                    montant_vente = quantite * actif.prix_marche
-                    print(f"Vente de {quantite} de {nom}. Nouvelle quantité: {actif.quantite}")
-                    print(f"Montant de la vente: {montant_vente}")
-                return
-        print(f"Aucun actif trouvé avec le nom {nom}.")
+        Relit les positions du portefeuille ; tri, filtre et position de défilement sont conservés.
+        """
+        if self.table is None:
+            self.table = TablePositions(self.portefeuille)
+        else:
+            self.table.recharger()
+        self._titrer()
+        self._planifier()
+
+    def mettre_a_jour_prix(self, prix):
+        if self.table is not None:
+            self.table.mettre_a_jour_prix(prix)
+            self._planifier()
 
+    def trier(self, colonne):
+        if self.table is None:
+            return
+        tri = self.table.tri
+        decroissant = tri is not None and tri[0] == colonne and not tri[1]
+        self.table.trier(colonne, decroissant)
+        self._titrer()
+        self.debut = 0
+        self._planifier()
 
+    def _titrer(self):
+        # En-têtes : devise de base des montants convertis et sens du tri
+        colonne_triee, decroissant = self.table.tri or (None, False)
+        for nom in TablePositions.COLONNES:
+            titre = f"{nom} ({self.table.base})" if self.table.base and nom in ("Valeur", "PnL") else nom
+            if nom == colonne_triee:
+                titre += " ▼" if decroissant else " ▲"
+            self.arbre.heading(nom, text=titre)
 
-def graphique_repartition_portefeuille(portefeuille):
-    """
-    Affiche un camembert de la répartition du portefeuille par classe d'actif,
-    basé sur la valorisation de chaque actif.
-    """
-    portefeuille.mise_a_jour_prix_actifs()
-    distribution = {}
-    for actif in portefeuille.actifs:
-        classe = actif.__class__.__name__
-        valeur = actif.valorisation()
-        distribution[classe] = distribution.get(classe, 0) + valeur
-    labels = list(distribution.keys())
-    sizes = list(distribution.values())
-    plt.figure(figsize=(8, 8))
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
-    plt.title("Répartition du portefeuille par classe d'actif")
-    plt.axis('equal')
-    plt.show()
+    def _planifier_filtre(self):
+        if self._filtrage is not None:
+            self.after_cancel(self._filtrage)
+        self._filtrage = self.after(self.DELAI_FILTRE, self._filtrer)
+
+    def _filtrer(self):
+        self._filtrage = None
+        if self.table is None:
+            return
+        classe = self.classe_filtre.get()
+        self.table.filtrer(self.texte_filtre.get().strip(), None if classe == "Toutes" else classe)
+        self.debut = 0
+        self._planifier()
+
+    def _planifier(self):
+        # Plusieurs défilements ou mises à jour rapprochés ne donnent qu'un seul dessin
+        if self._peinture is None:
+            self._peinture = self.after_idle(self._peindre)
+
+    def _peindre(self):
+        self._peinture = None
+        total = len(self.table) if self.table is not None else 0
+        visibles = len(self._items)
+        self.debut = max(0, min(self.debut, total - visibles))
+        lignes = self.table.lignes(self.debut, visibles) if total else []
+        for position, item in enumerate(self._items):
+            self.arbre.item(item, values=lignes[position] if position < len(lignes) else ())
+        if total:
+            self.defilement.set(self.debut / total, min(1.0, (self.debut + visibles) / total))
+        else:
+            self.defilement.set(0.0, 1.0)
+        self.label_nombre.config(text=f"{total} positions")
+
+    def _redimensionner(self, evenement):
+        # Une ligne de hauteur est réservée aux en-têtes
+        visibles = max(1, evenement.height // self.HAUTEUR_LIGNE - 1)
+        while len(self._items) < visibles:
+            self._items.append(self.arbre.insert("", tk.END, values=()))
+        while len(self._items) > visibles:
+            self.arbre.delete(self._items.pop())
+        self._planifier()
+
+    def _defiler(self, action, quantite, unite=None):
+        if self.table is None:
+            return
+        if action == "moveto":
+            self.debut = int(float(quantite) * len(self.table))
+        else:
+            self.debut += int(quantite) * (len(self._items) if unite == "pages" else 1)
+        self._planifier()
+
+    def _molette(self, evenement):
+        vers_le_haut = evenement.num == 4 or evenement.delta > 0
+        self._defiler("scroll", -3 if vers_le_haut else 3)
+        return "break"  # le Treeview ne doit pas défiler lui-même
+
+    def _cliquer(self, evenement):
+        if self.table is None or self.au_clic is None or self.arbre.identify_region(evenement.x, evenement.y) != "cell":
+            return
+        item = self.arbre.identify_row(evenement.y)
+        if item in self._items:
+            position = self.debut + self._items.index(item)
+            if position < len(self.table):
+                self.au_clic(self.table.symbole(position))
 
 
 # ======================  INTERFACE GRAPHIQUE (Tkinter)  ======================
@@ -250,8 +3643,22 @@ class Application(tk.Tk):
         self.entry_taux_coupon = tk.Entry(self.frame_form)
         self.entry_taux_coupon.grid(row=5, column=1)
 
+        tk.Label(self.frame_form, text="Date de maturité (Obligation, YYYY-MM-DD):").grid(row=6, column=0, sticky=tk.W)
+        self.entry_maturite = tk.Entry(self.frame_form)
+        self.entry_maturite.grid(row=6, column=1)
+
+        tk.Label(self.frame_form, text="Coupons par an (Obligation):").grid(row=7, column=0, sticky=tk.W)
+        self.entry_frequence = tk.Entry(self.frame_form)
+        self.entry_frequence.grid(row=7, column=1)
+
+        tk.Label(self.frame_form, text="Méthode de vente:").grid(row=8, column=0, sticky=tk.W)
+        self.methode_vente = tk.StringVar(value="FIFO")
+        self.option_methode = ttk.Combobox(self.frame_form, textvariable=self.methode_vente,
+                                           values=list(METHODES_VENTE))
+        self.option_methode.grid(row=8, column=1)
+
         self.btn_ajouter = tk.Button(self.frame_form, text="Ajouter Actif", command=self.ajouter_actif)
-        self.btn_ajouter.grid(row=6, column=0, columnspan=2, pady=5)
+        self.btn_ajouter.grid(row=9, column=0, columnspan=2, pady=5)
 
         
         self.btn_supprimer = tk.Button(self.frame_actions, text="Supprimer Actif", command=self.supprimer_actif)
@@ -267,116 +3674,329 @@ class Application(tk.Tk):
         self.btn_graph = tk.Button(self.frame_actions, text="Afficher Graphique", command=self.afficher_graphique)
         self.btn_graph.grid(row=0, column=3, padx=5)
 
-        # Zone d'affichage des résultats
-        self.text_output = tk.Text(self.frame_output, height=10)
-        self.text_output.pack(fill=tk.BOTH, expand=True)
+        # Zone d'affichage : grille des positions et ligne de résultats
+        self.grille = GrillePositions(self.frame_output, self.portefeuille, au_clic=self._selectionner_symbole)
+        self.grille.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.label_resultats = tk.Label(self.frame_output, text="", anchor=tk.W)
+        self.label_resultats.pack(side=tk.TOP, fill=tk.X)
         
         self.btn_export = tk.Button(self.frame_actions, text="Exporter Portefeuille", command=self.exporter_portefeuille)
         self.btn_export.grid(row=0, column=5, padx=5)
+
+        # Tâches réseau en arrière-plan : les résultats reviennent par une file
+        # relevée périodiquement dans le thread Tk
+        self.executeur = ThreadPoolExecutor(max_workers=2)
+        self.file_resultats = queue.Queue()
+        self.tache = None
+
+        self.progression = ttk.Progressbar(self.frame_actions, mode="determinate", length=150)
+        self.progression.grid(row=0, column=6, padx=5)
+        self.btn_annuler = tk.Button(self.frame_actions, text="Annuler", command=self.annuler_tache,
+                                     state=tk.DISABLED)
+        self.btn_annuler.grid(row=0, column=7, padx=5)
+        self.label_statut = tk.Label(self.frame_actions, text="", anchor=tk.W)
+        self.label_statut.grid(row=1, column=0, columnspan=8, sticky=tk.W)
+
+        # Mode temps réel : les ticks sont appliqués en continu, l'affichage suit à IMAGES_PAR_SECONDE.
+        # demande_temps_reel identifie le démarrage en préparation (positions construites en arrière-plan)
+        self.temps_reel = None
+        self.demande_temps_reel = None
+        self.btn_temps_reel = tk.Button(self.frame_actions, text="Temps réel", command=self.basculer_temps_reel)
+        self.btn_temps_reel.grid(row=0, column=8, padx=5)
+        self.label_temps_reel = tk.Label(self.frame_actions, text="", anchor=tk.W)
+        self.label_temps_reel.grid(row=2, column=0, columnspan=10, sticky=tk.W)
+
+        self.fenetre_statistiques = None
+        self.btn_statistiques = tk.Button(self.frame_actions, text="Statistiques", command=self.afficher_statistiques)
+        self.btn_statistiques.grid(row=0, column=9, padx=5)
+
+        self.protocol("WM_DELETE_WINDOW", self.fermer)
+        self.after(100, self._traiter_file)
+        self.after_idle(self.afficher_portefeuille)
+
+    def lancer_tache(self, nom, travail, suite, cle=None):
+        """
+        Exécute travail(rappel, annulation) dans le pool de threads, puis suite(resultat)
+        dans le thread Tk. Un clic pendant une tâche de même nom et de même 'cle' (qui
+        distingue les tâches d'un même nom dont le résultat diffère) ne relance rien :
+        sa suite est rattachée à la tâche en cours et reçoit le même résultat.
+        """
+        if self.tache is not None:
+            if self.tache["nom"] == nom and self.tache["cle"] == cle:
+                self.tache["suites"].append(suite)
+            else:
+                messagebox.showinfo("Patientez", "Une autre opération est en cours.")
+            return
+
+        tache = {"nom": nom, "cle": cle, "suites": [suite], "annulation": threading.Event()}
+
+        def rappel(fait, total, texte):
+            self.file_resultats.put((tache, "progression", (fait, total, texte)))
+
+        def executer():
+            try:
+                with INSTRUMENTATION.mesurer(f"tache.{nom}"):
+                    resultat = INSTRUMENTATION.profiler(travail, rappel, tache["annulation"])
+            except Exception as e:
+                self.file_resultats.put((tache, "erreur", e))
+            else:
+                self.file_resultats.put((tache, "fin", resultat))
+
+        self.tache = tache
+        self.progression["value"] = 0
+        self.label_statut.config(text=f"{nom} en cours...")
+        self.btn_annuler.config(state=tk.NORMAL)
+        self.executeur.submit(executer)
+
+    def en_arriere_plan(self, travail, suite, echec=None):
+        """
+        Exécute travail() dans le pool de threads puis suite(resultat) dans le thread Tk, sans
+        barre de progression ni exclusivité : pour les chargements complémentaires (devises, change).
+        En cas d'erreur, echec(erreur) est appelé dans le thread Tk après le message d'erreur.
+        """
+        def executer():
+            try:
+                self.file_resultats.put((None, "arriere_plan", (suite, travail())))
+            except Exception as e:
+                self.file_resultats.put((None, "erreur_arriere_plan", (echec, e)))
+
+        self.executeur.submit(executer)
+
+    def rafraichir_puis(self, suite, calcul=None):
+        """
+        Met à jour les prix en arrière-plan, y exécute calcul() (totaux, répartition...)
+        puis appelle suite(resultat) dans le thread Tk, qui n'a plus qu'à afficher.
+        """
+        def travail(rappel, annulation):
+            self.portefeuille.mise_a_jour_prix_actifs(rappel, annulation)
+            if annulation.is_set():
+                return None
+            # Devises et cours de change chargés ici, hors du thread Tk
+            self.portefeuille.facteurs_change()
+            return calcul() if calcul is not None else None
+
+        # Chaque affichage a son propre calcul : seuls les clics sur le même bouton sont regroupés
+        self.lancer_tache("rafraichissement", travail, suite, cle=suite)
+
+    def annuler_tache(self):
+        if self.tache is None:
+            return
+        self.tache["annulation"].set()
+        self.label_statut.config(text=f"{self.tache['nom']} annulé.")
+        self._terminer_tache()
+
+    def _terminer_tache(self):
+        self.tache = None
+        self.progression["value"] = 0
+        self.btn_annuler.config(state=tk.DISABLED)
+
+    @staticmethod
+    def _executer_suite(suite, *arguments):
+        # Une suite en erreur ne doit pas interrompre le traitement de la file
+        try:
+            INSTRUMENTATION.profiler(suite, *arguments)
+        except Exception as e:
+            messagebox.showerror("Erreur", str(e))
+
+    def _traiter_file(self):
+        try:
+            while True:
+                tache, evenement, contenu = self.file_resultats.get_nowait()
+                if evenement == "arriere_plan":
+                    suite, resultat = contenu
+                    self._executer_suite(suite, resultat)
+                    continue
+                if evenement == "erreur_arriere_plan":
+                    echec, erreur = contenu
+                    messagebox.showerror("Erreur", str(erreur))
+                    if echec is not None:
+                        self._executer_suite(echec, erreur)
+                    continue
+                if tache is not self.tache:
+                    continue  # message d'une tâche annulée
+                if evenement == "progression":
+                    fait, total, texte = contenu
+                    self.progression["value"] = 100 * fait / total if total else 100
+                    self.label_statut.config(text=f"{tache['nom']} : {texte} ({fait}/{total})")
+                elif evenement == "erreur":
+                    self._terminer_tache()
+                    self.label_statut.config(text="")
+                    messagebox.showerror("Erreur", str(contenu))
+                elif evenement == "fin":
+                    self._terminer_tache()
+                    self.label_statut.config(text=f"{tache['nom']} terminé.")
+                    for suite in tache["suites"]:
+                        with INSTRUMENTATION.mesurer(f"tk.{tache['nom']}"):
+                            self._executer_suite(suite, contenu)
+        except queue.Empty:
+            pass
+        finally:
+            self.after(100, self._traiter_file)
+
+    def fermer(self):
+        if self.temps_reel is not None:
+            self.temps_reel.arreter()
+        if self.tache is not None:
+            self.tache["annulation"].set()
+        self.executeur.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
         
     
+    def basculer_temps_reel(self):
+        if self.temps_reel is not None or self.demande_temps_reel is not None:
+            self.demande_temps_reel = None
+            if self.temps_reel is not None:
+                self._arreter_temps_reel()
+            self.btn_temps_reel.config(text="Temps réel")
+            self.label_temps_reel.config(text="Temps réel arrêté.")
+            return
+        self._preparer_temps_reel()
+
+    def _preparer_temps_reel(self):
+        # Les positions (devises et cours de change compris) sont construites hors du thread Tk
+        demande = self.demande_temps_reel = object()
+        self.btn_temps_reel.config(text="Arrêter temps réel")
+        self.label_temps_reel.config(text="Préparation du temps réel...")
+        self.en_arriere_plan(lambda: PositionsTempsReel(self.portefeuille),
+                             lambda positions: self._demarrer_temps_reel(demande, positions),
+                             lambda erreur: self._demarrer_temps_reel(demande, None))
+
+    def _demarrer_temps_reel(self, demande, positions):
+        if demande is not self.demande_temps_reel:
+            return  # arrêté ou redemandé pendant la préparation
+        self.demande_temps_reel = None
+        diffusion = DiffusionTempsReel(positions) if positions is not None else None
+        if diffusion is None or not diffusion.abonnements:
+            self.btn_temps_reel.config(text="Temps réel")
+            self.label_temps_reel.config(text="")
+            if diffusion is not None:
+                messagebox.showinfo("Temps réel", "Aucun flux temps réel pour les actifs du portefeuille.")
+            return
+        self.temps_reel = diffusion
+        self._image_precedente = (time.perf_counter(), 0)
+        diffusion.demarrer()
+        self._repeindre_temps_reel(diffusion)
+
+    def _arreter_temps_reel(self):
+        # Les derniers prix reçus restent acquis pour les autres vues du portefeuille
+        self.temps_reel.arreter()
+        self.temps_reel.reporter(self.portefeuille)
+        self.temps_reel = None
+
+    def _resynchroniser_temps_reel(self):
+        # Après un ajout ou une vente, les positions agrégées sont reconstruites
+        if self.temps_reel is not None or self.demande_temps_reel is not None:
+            if self.temps_reel is not None:
+                self._arreter_temps_reel()
+            self._preparer_temps_reel()
+
+    def _repeindre_temps_reel(self, diffusion):
+        if diffusion is not self.temps_reel:
+            return
+        valeur, pnl, distribution, ticks = diffusion.etat()
+        maintenant = time.perf_counter()
+        instant, ticks_precedents = self._image_precedente
+        cadence = (ticks - ticks_precedents) / (maintenant - instant) if maintenant > instant else 0.0
+        self._image_precedente = (maintenant, ticks)
+        repartition = "  ".join(f"{classe}: {montant:,.2f}" for classe, montant in distribution.items())
+        texte = f"Valorisation: {valeur:,.2f}  PnL latent: {pnl:,.2f}  |  {repartition}  |  {cadence:,.0f} ticks/s"
+        if diffusion.erreur is not None:
+            texte += f"  |  Erreur: {diffusion.erreur}"
+        self.label_temps_reel.config(text=texte)
+        if ticks != ticks_precedents:
+            self.grille.mettre_a_jour_prix(diffusion.prix())
+        self.after(1000 // IMAGES_PAR_SECONDE, self._repeindre_temps_reel, diffusion)
+
+    def afficher_statistiques(self):
+        """
+        Fenêtre des mesures de performance (INSTRUMENTATION), rafraîchie chaque seconde.
+        """
+        if self.fenetre_statistiques is not None and self.fenetre_statistiques.winfo_exists():
+            self.fenetre_statistiques.lift()
+            return
+        fenetre = self.fenetre_statistiques = tk.Toplevel(self)
+        fenetre.title("Statistiques de performance")
+
+        barre = tk.Frame(fenetre)
+        barre.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
+        actif = tk.BooleanVar(value=INSTRUMENTATION.actif)
+        profilage = tk.BooleanVar(value=INSTRUMENTATION.profilage)
+        tk.Checkbutton(barre, text="Mesures actives", variable=actif,
+                       command=lambda: setattr(INSTRUMENTATION, "actif", actif.get())).pack(side=tk.LEFT)
+        tk.Checkbutton(barre, text="Profilage cProfile", variable=profilage,
+                       command=lambda: setattr(INSTRUMENTATION, "profilage", profilage.get())).pack(side=tk.LEFT)
+        tk.Button(barre, text="Réinitialiser", command=INSTRUMENTATION.reinitialiser).pack(side=tk.LEFT, padx=5)
+        tk.Button(barre, text="Exporter JSON", command=self._exporter_statistiques).pack(side=tk.LEFT, padx=5)
+
+        texte = tk.Text(fenetre, height=30, width=100, font=("Courier", 9))
+        texte.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+        def rafraichir():
+            if not fenetre.winfo_exists():
+                return
+            contenu = INSTRUMENTATION.resume()
+            if INSTRUMENTATION.profilage:
+                contenu += "\n\nProfil cProfile :\n" + INSTRUMENTATION.rapport_profil(lignes=20)
+            texte.delete("1.0", tk.END)
+            texte.insert(tk.END, contenu)
+            fenetre.after(1000, rafraichir)
+
+        rafraichir()
+
+    def _exporter_statistiques(self):
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if filename:
+            INSTRUMENTATION.exporter_json(filename)
+
     def importer_portefeuille(self):
         filename = filedialog.askopenfilename(
-            title="Sélectionner un fichier Excel",
-            filetypes=[("Fichiers Excel", "*.xlsx *.xls")]
+            title="Sélectionner un fichier de portefeuille",
+            filetypes=[("Fichiers Excel", "*.xlsx *.xls"), ("Fichiers CSV", "*.csv"),
+                       ("Fichiers Parquet", "*.parquet")]
         )
         if not filename:
             return
-    
-        try:
-            df = pd.read_excel(filename)
-        except Exception as e:
-            messagebox.showerror("Erreur", f"Impossible de lire le fichier Excel.\n{e}")
+        def travail(rappel, annulation):
+            lecture = lire_portefeuille(filename, annulation)
+            if lecture is None:
+                return None
+            actifs, rapport = lecture
+            if CHANGE.base is not None:
+                resoudre_devises(actifs)
+                CHANGE.charger({actif.devise for actif in actifs} | {CHANGE.base})
+            if annulation.is_set():
+                return None
+            self.portefeuille.ajouter_actifs(actifs)
+            return rapport
+
+        self.lancer_tache("import", travail, self._terminer_import)
+
+    def _terminer_import(self, rapport):
+        if rapport is None:
             return
-    
-        colonnes_attendues = ["Classe", "Nom", "Quantité", "Prix dachat", "Date de transaction"]
-        for col in colonnes_attendues:
-            if col not in df.columns:
-                messagebox.showerror("Erreur", f"Colonne '{col}' manquante.")
-                return
-    
-        for idx, row in df.iterrows():
-            classe = str(row["Classe"]).strip()
-            nom = str(row["Nom"]).strip()
-    
-            # Quantité
-            try:
-                quantite = float(row["Quantité"])
-            except ValueError:
-                messagebox.showwarning("Avertissement", f"Ligne {idx}: Quantité invalide, ignorée.")
-                continue
-    
-            
-            try:
-                prix_achat = float(row["Prix dachat"])
-            except ValueError:
-                prix_achat = None
-    
-            
-            try:
-                date_transaction = pd.to_datetime(row["Date de transaction"]).date()
-            except Exception:
-                messagebox.showwarning("Avertissement", f"Ligne {idx}: Date de transaction invalide, ignorée.")
-                continue
-    
-            
-            if classe.lower() == "action":
-                actif = Action(nom, quantite, date_transaction, prix_achat=prix_achat)
-            elif classe.lower() == "crypto":
-                actif = Crypto(nom, quantite, date_transaction, prix_achat=prix_achat)
-            elif classe.lower() == "obligation":
-                actif = Obligation(nom, quantite, date_transaction, taux_coupon=0.0, prix_achat=prix_achat)
-            else:
-                messagebox.showwarning("Avertissement", f"Ligne {idx}: Classe '{classe}' inconnue, ignorée.")
-                continue
-    
-            self.portefeuille.ajouter_actif(actif)
-    
+        self._resynchroniser_temps_reel()
+        if rapport.nombre:
+            messagebox.showwarning("Avertissement", rapport.resume())
         messagebox.showinfo("Succès", "Portefeuille importé avec succès.")
         self.afficher_portefeuille()
 
     def exporter_portefeuille(self):
         """
-        Exporte le portefeuille actuel dans un fichier Excel.
-        On demande à l'utilisateur de choisir le nom et l'emplacement du fichier.
-        Le fichier contiendra pour chaque actif : 
-          - Classe
-          - Nom
-          - Quantité
-          - Date de transaction
-          - Prix d'achat
-          - Prix de marché
-          - (Taux Coupon pour les obligations)
+        Exporte le portefeuille actuel dans un fichier Excel, CSV ou Parquet.
+        On demande à l'utilisateur de choisir le nom et l'emplacement du fichier ;
+        le format suit l'extension choisie (voir exporter_fichier).
         """
         filename = filedialog.asksaveasfilename(
             title="Enregistrer le portefeuille",
             defaultextension=".xlsx",
-            filetypes=[("Fichiers Excel", "*.xlsx")]
+            filetypes=[("Fichiers Excel", "*.xlsx"), ("Fichiers CSV", "*.csv"),
+                       ("Fichiers Parquet", "*.parquet")]
         )
         if not filename:
             return
 
-        data = []
-        for actif in self.portefeuille.actifs:
-            asset_data = {
-                "Classe": actif.__class__.__name__,
-                "Nom": actif.nom,
-                "Quantité": actif.quantite,
-                "Date de transaction": actif.date_transaction.strftime("%Y-%m-%d") 
-                                        if isinstance(actif.date_transaction, datetime.date)
-                                        else actif.date_transaction,
-                "Prix d'achat": actif.prix_achat,
-                "Prix de marché": actif.prix_marche
-            }
-            if isinstance(actif, Obligation):
-                asset_data["Taux Coupon"] = actif.taux_coupon
-            else:
-                asset_data["Taux Coupon"] = None
-            data.append(asset_data)
-
-        df = pd.DataFrame(data)
         try:
-            df.to_excel(filename, index=False)
+            exporter_fichier(self.portefeuille, filename)
             messagebox.showinfo("Succès", f"Portefeuille exporté dans {filename}")
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de l'exportation du portefeuille : {e}")
@@ -401,7 +4021,7 @@ class Application(tk.Tk):
         prix_achat = float(prix_achat_str) if prix_achat_str else None
 
         if asset_type == "Action":
-            actif = Action(nom, quantite, date_transaction, prix_achat)
+            construire = functools.partial(Action, nom, quantite, date_transaction, prix_achat)
         elif asset_type == "Obligation":
             taux_coupon_str = self.entry_taux_coupon.get().strip()
             try:
@@ -409,17 +4029,40 @@ class Application(tk.Tk):
             except ValueError:
                 messagebox.showerror("Erreur", "Taux coupon invalide.")
                 return
-            actif = Obligation(nom, quantite, date_transaction, taux_coupon, prix_achat)
+            maturite_str = self.entry_maturite.get().strip()
+            frequence_str = self.entry_frequence.get().strip()
+            try:
+                date_maturite = datetime.datetime.strptime(maturite_str, "%Y-%m-%d").date() if maturite_str else None
+                frequence = int(frequence_str) if frequence_str else 1
+            except ValueError:
+                messagebox.showerror("Erreur", "Date de maturité ou nombre de coupons invalide.")
+                return
+            if frequence not in FREQUENCES_COUPON:
+                messagebox.showerror("Erreur", "Nombre de coupons par an attendu : 1, 2, 4 ou 12.")
+                return
+            construire = functools.partial(Obligation, nom, quantite, date_transaction, taux_coupon, prix_achat,
+                                           date_maturite=date_maturite, frequence=frequence)
         elif asset_type == "Crypto":
-            actif = Crypto(nom, quantite, date_transaction, prix_achat)
+            construire = functools.partial(Crypto, nom, quantite, date_transaction, prix_achat)
         else:
             messagebox.showerror("Erreur", "Type d'actif inconnu.")
             return
 
-        self.portefeuille.ajouter_actif(actif)
-        messagebox.showinfo("Succès", f"Actif {nom} ajouté.")
-        self.effacer_champs()
-        self.afficher_portefeuille()
+        def travail(rappel, annulation):
+            # Le prix d'achat manquant, la devise et son cours sont récupérés hors du thread Tk
+            actif = construire()
+            if CHANGE.base is not None:
+                resoudre_devises([actif])
+                CHANGE.charger({actif.devise, CHANGE.base})
+            self.portefeuille.ajouter_actif(actif)
+
+        def suite(resultat):
+            self._resynchroniser_temps_reel()
+            messagebox.showinfo("Succès", f"Actif {nom} ajouté.")
+            self.effacer_champs()
+            self.afficher_portefeuille()
+
+        self.lancer_tache("ajout", travail, suite)
 
     def supprimer_actif(self):
         nom = self.entry_nom.get().strip()
@@ -431,28 +4074,61 @@ class Application(tk.Tk):
             except ValueError:
                 messagebox.showerror("Erreur", "Quantité invalide.")
                 return
-        self.portefeuille.supprimer_actif(nom, quantite)
-        self.afficher_portefeuille()
+        methode = self.methode_vente.get()
+        if methode not in METHODES_VENTE:
+            messagebox.showerror("Erreur", "Méthode de vente inconnue.")
+            return
+
+        def suite(resultat):
+            self._resynchroniser_temps_reel()
+            self.afficher_portefeuille()
+
+        # La vente peut récupérer le prix de marché et le cours de change : hors du thread Tk
+        self.lancer_tache("vente", lambda rappel, annulation: self.portefeuille.supprimer_actif(
+            nom, quantite, methode=methode), suite)
 
     def afficher_valorisation(self):
-        self.portefeuille.mise_a_jour_prix_actifs()
-        valorisation = self.portefeuille.valorisation_totale()
-        self.text_output.insert(tk.END, f"Valorisation totale du portefeuille: {valorisation}\n")
+        self.rafraichir_puis(self._afficher_valorisation,
+                             lambda: (self.portefeuille.valorisation_totale(), self.portefeuille.lots_sans_prix(),
+                                      self.portefeuille.lots_sans_change()))
+
+    def _afficher_valorisation(self, resultat):
+        valorisation, sans_prix, sans_change = resultat
+        self.afficher_portefeuille()
+        self.label_resultats.config(
+            text=f"Valorisation totale du portefeuille: {valorisation:,.2f} {CHANGE.base or ''}"
+                 + _mention_exclus(sans_prix, sans_change))
 
     def afficher_pnl(self):
-        pnl_details, pnl_total = self.portefeuille.calcul_pnl()
-        self.text_output.insert(tk.END, "PnL par actif:\n")
-        for nom, pnl in pnl_details.items():
-            self.text_output.insert(tk.END, f"{nom}: {pnl}\n")
-        self.text_output.insert(tk.END, f"PnL total: {pnl_total}\n")
+        def calcul():
+            _, pnl_total = self.portefeuille.calcul_pnl()
+            _, pnl_realise = self.portefeuille.calcul_pnl_realise()
+            return pnl_total, pnl_realise, self.portefeuille.lots_sans_prix(), self.portefeuille.lots_sans_change()
+
+        self.rafraichir_puis(self._afficher_pnl, calcul)
+
+    def _afficher_pnl(self, resultat):
+        # Le PnL par actif est dans la colonne PnL de la grille
+        pnl_total, pnl_realise, sans_prix, sans_change = resultat
+        self.afficher_portefeuille()
+        devise = CHANGE.base or ""
+        self.label_resultats.config(
+            text=f"PnL total: {pnl_total:,.2f} {devise}  |  PnL réalisé: {pnl_realise:,.2f} {devise}"
+                 + _mention_exclus(sans_prix, sans_change))
 
     def afficher_graphique(self):
         graphique_repartition_portefeuille(self.portefeuille)
 
     def afficher_portefeuille(self):
-        self.text_output.insert(tk.END, "Portefeuille actuel:\n")
-        for actif in self.portefeuille.actifs:
-            self.text_output.insert(tk.END, f"{actif.nom} - Quantité: {actif.quantite}\n")
+        self.grille.recharger()
+        if not self.grille.table.complet:
+            # Devises ou cours de change encore inconnus : chargés hors du thread Tk, puis grille relue
+            self.en_arriere_plan(self.portefeuille.facteurs_change, lambda facteurs: self.grille.recharger())
+
+    def _selectionner_symbole(self, symbole):
+        # Un clic sur une ligne prépare la vente de ce symbole
+        self.entry_nom.delete(0, tk.END)
+        self.entry_nom.insert(0, symbole)
 
     def effacer_champs(self):
         self.entry_nom.delete(0, tk.END)
@@ -460,34 +4136,50 @@ class Application(tk.Tk):
         self.entry_date.delete(0, tk.END)
         self.entry_prix_achat.delete(0, tk.END)
         self.entry_taux_coupon.delete(0, tk.END)
+        self.entry_maturite.delete(0, tk.END)
+        self.entry_frequence.delete(0, tk.END)
         
     def afficher_graphique(self):
+        self.rafraichir_puis(self._afficher_graphique, self.portefeuille.distribution_par_classe)
+
+    def _afficher_graphique(self, distribution):
         new_window = tk.Toplevel(self)
         new_window.title("Graphique de répartition")
     
-        fig = construire_camembert(self.portefeuille)
+        fig = construire_camembert(self.portefeuille, rafraichir=False, distribution=distribution)
 
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
         canvas = FigureCanvasTkAgg(fig, master=new_window)
         canvas.draw()  
         canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         
     
-def construire_camembert(portefeuille):
+def _mention_exclus(sans_prix, sans_change=0):
+    # Lots laissés hors des totaux, pour que le montant affiché ne soit pas pris pour complet
+    exclus = [f"{sans_prix} lots sans prix"] if sans_prix else []
+    if sans_change:
+        exclus.append(f"{sans_change} lots sans cours de change")
+    return f"  ({', '.join(exclus)}, exclus)" if exclus else ""
+
+
+@chronometre("graphique.construire_camembert")
+def construire_camembert(portefeuille, rafraichir=True, distribution=None):
     """
     Construit et renvoie un objet Figure contenant le camembert de répartition.
     Ne fait pas d'appel à plt.show() pour ne pas ouvrir de fenêtre Matplotlib.
+    Avec rafraichir=False, les prix de marché déjà connus sont utilisés tels quels ;
+    'distribution' ({classe: valeur}) évite de la recalculer quand elle est déjà connue.
     """
-    portefeuille.mise_a_jour_prix_actifs()
-    distribution = {}
-    for actif in portefeuille.actifs:
-        classe = actif.__class__.__name__
-        valeur = actif.valorisation()
-        distribution[classe] = distribution.get(classe, 0) + valeur
+    if distribution is None:
+        if rafraichir:
+            portefeuille.mise_a_jour_prix_actifs()
+        distribution = portefeuille.distribution_par_classe()
 
     labels = list(distribution.keys())
     sizes = list(distribution.values())
 
     # Création de la figure
+    from matplotlib.figure import Figure
     fig = Figure(figsize=(5, 5), dpi=100)
     ax = fig.add_subplot(111)
     ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
@@ -495,9 +4187,142 @@ def construire_camembert(portefeuille):
     ax.axis('equal')
     return fig
 
+# ======================  LIGNE DE COMMANDE  ======================
+
+FORMATS_EXPORT = ("parquet", "csv", "xlsx")
+
+
+def traiter_fichier(commande, filename, sortie=None, format_export="parquet", prix=True):
+    """
+    Charge un fichier de portefeuille (stockage colonnaire) et exécute 'commande' :
+    "valoriser", "pnl" ou "exporter". Retourne un dictionnaire de résultats.
+    """
+    portefeuille = PortefeuilleColonnaire()
+    rapport = portefeuille.importer_fichier(filename)
+    resultat = {"fichier": filename, "lots": portefeuille.taille, "lignes_rejetees": rapport.nombre}
+    if prix:
+        portefeuille.mise_a_jour_prix_actifs()
+    if commande == "exporter":
+        base = os.path.splitext(os.path.basename(filename))[0]
+        cible = os.path.join(sortie or os.path.dirname(filename), f"{base}.{format_export}")
+        if os.path.abspath(cible) == os.path.abspath(filename):
+            cible = os.path.join(os.path.dirname(cible), f"{base}_export.{format_export}")
+        exporter_fichier(portefeuille, cible)
+        resultat["export"] = cible
+        return resultat
+    resultat["devise"] = CHANGE.base
+    resultat["valorisation"] = portefeuille.valorisation_totale()
+    if commande == "pnl":
+        resultat["pnl_par_symbole"], resultat["pnl"] = portefeuille.calcul_pnl()
+    resultat["lots_sans_prix"] = portefeuille.lots_sans_prix()
+    resultat["lots_sans_change"] = portefeuille.lots_sans_change()
+    return resultat
+
+
+def _sans_nan(valeur):
+    # JSON strict : un montant NaN (symbole sans prix) devient null
+    if isinstance(valeur, dict):
+        return {cle: _sans_nan(v) for cle, v in valeur.items()}
+    if isinstance(valeur, list):
+        return [_sans_nan(v) for v in valeur]
+    if isinstance(valeur, float) and math.isnan(valeur):
+        return None
+    return valeur
+
+
+def _traiter_fichier_protege(commande, filename, *args):
+    # Les messages des fournisseurs vont sur la sortie d'erreur : la sortie standard reste aux résultats
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return traiter_fichier(commande, filename, *args)
+        except Exception as e:
+            return {"fichier": filename, "erreur": str(e)}
+
+
+def traiter_fichiers(commande, fichiers, config, processus=None, *args):
+    """
+    Traite plusieurs fichiers, répartis sur un pool de processus quand il y en a plusieurs.
+
+    Chaque processus initialise ses fournisseurs avec 'config' ; leurs prix sont partagés
+    par l'historique SQLite (table des derniers prix, valable "fraicheur" secondes) :
+    un symbole déjà récupéré par un processus, ou par une exécution récente, n'est pas redemandé.
+    """
+    processus = min(processus or os.cpu_count() or 1, len(fichiers))
+    if processus <= 1:
+        initialiser_fournisseurs(config)
+        return [_traiter_fichier_protege(commande, filename, *args) for filename in fichiers]
+    with ProcessPoolExecutor(processus, initializer=initialiser_fournisseurs, initargs=(config,)) as pool:
+        taches = [pool.submit(_traiter_fichier_protege, commande, filename, *args) for filename in fichiers]
+        return [tache.result() for tache in taches]
+
+
+def _afficher_resultat(resultat):
+    if "erreur" in resultat:
+        print(f"{resultat['fichier']} : erreur : {resultat['erreur']}")
+        return
+    texte = f"{resultat['fichier']} : {resultat['lots']} lots"
+    if resultat["lignes_rejetees"]:
+        texte += f" ({resultat['lignes_rejetees']} lignes rejetées)"
+    devise = f" {resultat['devise']}" if resultat.get("devise") else ""
+    if "valorisation" in resultat:
+        texte += f", valorisation {resultat['valorisation']:,.2f}{devise}"
+    if "pnl" in resultat:
+        texte += f", PnL latent {resultat['pnl']:,.2f}{devise}"
+    texte += _mention_exclus(resultat.get("lots_sans_prix"), resultat.get("lots_sans_change"))
+    if "export" in resultat:
+        texte += f" -> {resultat['export']}"
+    print(texte)
+
+
+def principal(arguments=None):
+    """
+    Point d'entrée : sans commande, lance l'interface graphique ; sinon traite les fichiers
+    sans interface (valoriser, pnl, exporter).
+    """
+    parser = argparse.ArgumentParser(
+        description="Gestion de portefeuille. Sans commande, lance l'interface graphique.")
+    parser.add_argument("--config", help="fichier de configuration (défaut : portefeuille_config.json)")
+    parser.add_argument("--hors-ligne", action="store_true", help="n'utilise que les données locales")
+    parser.add_argument("--devise", help="devise de valorisation (défaut : devise_base de la configuration)")
+    commandes = parser.add_subparsers(dest="commande")
+    for commande, aide in (("valoriser", "valorisation totale de chaque fichier"),
+                           ("pnl", "valorisation et PnL latent de chaque fichier"),
+                           ("exporter", "réexporte chaque fichier avec les prix de marché")):
+        sous_commande = commandes.add_parser(commande, help=aide)
+        sous_commande.add_argument("fichiers", nargs="+", help="fichiers de portefeuille (xlsx, csv, parquet)")
+        sous_commande.add_argument("--processus", type=int, help="taille du pool (défaut : nombre de cœurs)")
+        sous_commande.add_argument("--json", action="store_true", help="résultats au format JSON")
+        if commande == "exporter":
+            sous_commande.add_argument("--format", choices=FORMATS_EXPORT, default="parquet")
+            sous_commande.add_argument("--sortie", help="répertoire de destination (défaut : celui du fichier)")
+            sous_commande.add_argument("--sans-prix", action="store_true", help="n'actualise pas les prix")
+    arguments = parser.parse_args(arguments)
+
+    config = charger_configuration(arguments.config)
+    if arguments.hors_ligne:
+        config["hors_ligne"] = True
+    if arguments.devise:
+        config["devise_base"] = arguments.devise
+    if arguments.commande is None:
+        initialiser_fournisseurs(config)
+        app = Application(Portefeuille())
+        app.mainloop()
+        return 0
+
+    if arguments.commande == "exporter":
+        options = (arguments.sortie, arguments.format, not arguments.sans_prix)
+    else:
+        options = ()
+    resultats = traiter_fichiers(arguments.commande, arguments.fichiers, config, arguments.processus, *options)
+    if arguments.json:
+        print(json.dumps(_sans_nan(resultats), indent=2, ensure_ascii=False, allow_nan=False))
+    else:
+        for resultat in resultats:
+            _afficher_resultat(resultat)
+    return 1 if any("erreur" in resultat for resultat in resultats) else 0
+
+
 # ======================  PROGRAMME PRINCIPAL  ======================
 
 if __name__ == "__main__":
-    portefeuille = Portefeuille()
-    app = Application(portefeuille)
-    app.mainloop()
+    sys.exit(principal())
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark du gestionnaire de portefeuille sur des portefeuilles synthétiques.
+
+Les portefeuilles (1k, 100k et 1M lots par défaut) mélangent actions, obligations et cryptos ;
+les prix viennent de faux fournisseurs Yahoo / Binance en mémoire, avec une latence réglable.
+Pour chaque opération sont mesurés le temps écoulé, le pic de mémoire allouée (tracemalloc)
+et le nombre d'appels aux fournisseurs. Les résultats sont écrits en JSON et peuvent être
+comparés à ceux d'une exécution précédente :
+
+    python benchmark.py --json resultats.json
+    python benchmark.py --tailles 1000 100000 --json nouveaux.json --comparer resultats.json
+
+--planificateur mesure plutôt le débit soutenable face à un faux fournisseur qui fait respecter
+une limite de requêtes (refus 429 puis bannissement), avec et sans FournisseurPlanifie.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")  # construire_camembert sans affichage
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import Python_simple_portfolio_manager as gestion
+
+
+TAILLES = (1_000, 100_000, 1_000_000)
+FORMATS = ("csv", "xlsx", "parquet")
+STOCKAGES = ("objets", "colonnaire")
+
+# Au-delà, la génération et la lecture xlsx prennent plusieurs minutes : format ignoré
+TAILLE_MAX_XLSX = 100_000
+
+# Répartition des lots et des symboles entre les classes d'actifs
+PARTS_CLASSES = {"Action": 0.5, "Obligation": 0.2, "Crypto": 0.3}
+
+# Nombre de ventes partielles mesurées par supprimer_actif
+VENTES = 100
+PAGES_GRILLE = 1000
+
+
+# ======================  DONNÉES SYNTHÉTIQUES  ======================
+
+def nombre_symboles(taille):
+    return max(10, min(taille // 20, 10_000))
+
+
+def livre_synthetique(taille, graine=0):
+    """
+    Retourne un DataFrame de 'taille' lots aux colonnes de l'import (COLONNES_IMPORT + Taux Coupon)
+    et les prix de marché des symboles utilisés : {classe: {symbole: prix}}.
+    """
+    generateur = np.random.default_rng(graine)
+    symboles = nombre_symboles(taille)
+    classes, noms, prix = [], [], {}
+    for classe, part in PARTS_CLASSES.items():
+        lots = int(round(taille * part)) if classe != "Crypto" else taille - len(classes)
+        universel = [f"{classe[:3].upper()}{i:05d}" for i in range(max(1, int(symboles * part)))]
+        if classe == "Crypto":
+            universel = [f"C{i:05d}USDT" for i in range(len(universel))]
+        prix[classe] = dict(zip(universel, generateur.uniform(5, 500, len(universel)).round(2).tolist()))
+        classes += [classe] * lots
+        noms += [universel[i] for i in generateur.integers(0, len(universel), lots)]
+
+    debut = np.datetime64("2020-01-01")
+    dates = debut + generateur.integers(0, 5 * 365, taille).astype("timedelta64[D]")
+    livre = pd.DataFrame({
+        "Classe": classes,
+        "Nom": noms,
+        "Quantité": generateur.integers(1, 100, taille).astype(float),
+        "Prix dachat": generateur.uniform(5, 500, taille).round(2),
+        "Date de transaction": dates,
+        "Taux Coupon": np.where(np.array(classes) == "Obligation",
+                                generateur.uniform(0, 0.06, taille).round(4), np.nan),
+    })
+    return livre, prix
+
+
+def ecrire_fichier_synthetique(livre, chemin):
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == ".csv":
+        livre.to_csv(chemin, index=False)
+    elif extension == ".parquet":
+        livre.to_parquet(chemin, index=False)
+    else:
+        gestion._ecrire_xlsx(livre, chemin, gestion.TAILLE_BLOC_IMPORT)
+
+
+def construire_portefeuille(livre, stockage):
+    """
+    Construit un Portefeuille (stockage "objets") ou un PortefeuilleColonnaire à partir du livre.
+    """
+    if stockage == "colonnaire":
+        portefeuille = gestion.PortefeuilleColonnaire(capacite=len(livre))
+        for classe, lignes in livre.groupby("Classe", sort=False):
+            portefeuille.ajouter_lots(classe, lignes["Nom"].tolist(), lignes["Quantité"].to_numpy(),
+                                      lignes["Prix dachat"].to_numpy(), lignes["Date de transaction"].to_numpy(),
+                                      taux_coupon=lignes["Taux Coupon"].to_numpy())
+        return portefeuille
+    portefeuille = gestion.Portefeuille()
+    actifs = []
+    colonnes = zip(livre["Classe"].tolist(), livre["Nom"].tolist(), livre["Quantité"].tolist(),
+                   livre["Date de transaction"].dt.date.tolist(), livre["Prix dachat"].tolist(),
+                   livre["Taux Coupon"].tolist())
+    for classe, nom, quantite, date_transaction, prix, taux_coupon in colonnes:
+        if classe == "Obligation":
+            actif = gestion.Obligation(nom, quantite, date_transaction, taux_coupon, prix_achat=prix)
+        elif classe == "Action":
+            actif = gestion.Action(nom, quantite, date_transaction, prix_achat=prix, resoudre_prix=False)
+        else:
+            actif = gestion.Crypto(nom, quantite, date_transaction, prix_achat=prix, resoudre_prix=False)
+        actifs.append(actif)
+    portefeuille.ajouter_actifs(actifs)
+    return portefeuille
+
+
+# ======================  FAUX FOURNISSEURS  ======================
+
+def installer_fournisseurs_factices(prix, latence=0.0):
+    """
+    Remplace Yahoo et Binance par des fournisseurs en mémoire (FournisseurLocal) qui
+    comptent leurs appels, derrière un cache de prix neuf. Retourne (fournisseurs, cache).
+    """
+    fournisseurs = {
+        "yahoo": gestion.FournisseurLocal(prix["Action"], nom="yahoo", latence=latence),
+        "binance": gestion.FournisseurLocal(prix["Crypto"], nom="binance", latence=latence),
+    }
+    gestion.Action.fournisseur = fournisseurs["yahoo"]
+    gestion.Crypto.fournisseur = fournisseurs["binance"]
+    gestion.Obligation.fournisseur = gestion.FournisseurObligation()
+    cache = gestion.activer_cache_prix(gestion.CachePrix(taille_max=len(prix["Action"]) + len(prix["Crypto"])
+                                                         + len(prix["Obligation"]) + 1))
+    return fournisseurs, cache
+
+
+# ======================  MESURES  ======================
+
+class Mesureur:
+    """
+    Exécute les opérations et accumule les mesures (temps, pic mémoire, appels fournisseurs).
+    """
+
+    def __init__(self, fournisseurs, memoire=True):
+        self.fournisseurs = fournisseurs
+        self.memoire = memoire
+        self.mesures = []
+
+    def _compteurs(self):
+        return (sum(f.appels for f in self.fournisseurs.values()),
+                sum(f.symboles_demandes for f in self.fournisseurs.values()))
+
+    def mesurer(self, operation, fonction, **contexte):
+        appels, symboles = self._compteurs()
+        if self.memoire:
+            tracemalloc.start()
+        debut = time.perf_counter()
+        try:
+            resultat = fonction()
+        finally:
+            secondes = time.perf_counter() - debut
+            pic = tracemalloc.get_traced_memory()[1] if self.memoire else None
+            if self.memoire:
+                tracemalloc.stop()
+        appels_fin, symboles_fin = self._compteurs()
+        mesure = {
+            **contexte,
+            "operation": operation,
+            "secondes": secondes,
+            "memoire_pic_mo": None if pic is None else pic / 2 ** 20,
+            "appels_fournisseurs": appels_fin - appels,
+            "symboles_demandes": symboles_fin - symboles,
+        }
+        self.mesures.append(mesure)
+        print(f"{contexte.get('taille', ''):>9} {contexte.get('stockage', ''):<10} {operation:<32} "
+              f"{secondes:9.3f} s  {mesure['memoire_pic_mo'] or 0:9.1f} Mo  {mesure['appels_fournisseurs']:>4} appels")
+        return resultat
+
+
+def _dessiner_camembert(portefeuille):
+    figure = gestion.construire_camembert(portefeuille, rafraichir=False)
+    FigureCanvasAgg(figure).draw()
+
+
+def _ventes(portefeuille, livre, nombre, graine=0):
+    generateur = np.random.default_rng(graine)
+    noms = livre["Nom"].unique()
+    # Les messages de vente affichés par supprimer_actif ne sont pas mesurés
+    with contextlib.redirect_stdout(io.StringIO()):
+        for nom in generateur.choice(noms, min(nombre, len(noms)), replace=False).tolist():
+            portefeuille.supprimer_actif(nom, quantite=1.0, methode="FIFO")
+
+
+def _defiler(table):
+    # Pages de 40 lignes réparties sur toute la hauteur de la grille
+    pas = max(1, len(table) // PAGES_GRILLE)
+    for debut in range(0, pas * PAGES_GRILLE, pas):
+        table.lignes(debut, 40)
+
+
+def executer(tailles=TAILLES, stockages=STOCKAGES, formats=FORMATS, latence=0.0, memoire=True, graine=0):
+    """
+    Exécute le benchmark complet et retourne la liste des mesures (dictionnaires).
+    """
+    mesures = []
+    with tempfile.TemporaryDirectory() as repertoire:
+        for taille in tailles:
+            livre, prix = livre_synthetique(taille, graine)
+            fournisseurs, cache = installer_fournisseurs_factices(prix, latence)
+            mesureur = Mesureur(fournisseurs, memoire)
+            contexte = {"taille": taille}
+
+            fichiers = {}
+            for format_ in formats:
+                if format_ == "xlsx" and taille > TAILLE_MAX_XLSX:
+                    print(f"{taille:>9} xlsx ignoré (plus de {TAILLE_MAX_XLSX} lots)")
+                    continue
+                fichiers[format_] = os.path.join(repertoire, f"livre_{taille}.{format_}")
+                ecrire_fichier_synthetique(livre, fichiers[format_])
+
+            for stockage in stockages:
+                contexte = {"taille": taille, "stockage": stockage}
+                portefeuille = mesureur.mesurer("construction", lambda: construire_portefeuille(livre, stockage),
+                                                **contexte)
+                cache.invalider()
+                mesureur.mesurer("mise_a_jour_prix_actifs (froid)", portefeuille.mise_a_jour_prix_actifs, **contexte)
+                mesureur.mesurer("mise_a_jour_prix_actifs (cache)", portefeuille.mise_a_jour_prix_actifs, **contexte)
+                mesureur.mesurer("valorisation_totale", portefeuille.valorisation_totale, **contexte)
+                mesureur.mesurer("calcul_pnl", portefeuille.calcul_pnl, **contexte)
+                mesureur.mesurer("construire_camembert", lambda: _dessiner_camembert(portefeuille), **contexte)
+                table = mesureur.mesurer("grille positions", lambda: gestion.TablePositions(portefeuille), **contexte)
+                mesureur.mesurer("grille tri PnL", lambda: table.trier("PnL", True), **contexte)
+                mesureur.mesurer(f"grille défilement (x{PAGES_GRILLE})", lambda: _defiler(table), **contexte)
+                del table
+                for format_, chemin in fichiers.items():
+                    sortie = os.path.join(repertoire, f"export_{taille}_{stockage}.{format_}")
+                    mesureur.mesurer(f"export {format_}", lambda: gestion.exporter_fichier(portefeuille, sortie),
+                                     **contexte)
+                    if stockage == "colonnaire":
+                        mesureur.mesurer(f"import {format_}",
+                                         lambda: gestion.PortefeuilleColonnaire().importer_fichier(chemin),
+                                         **contexte)
+                    else:
+                        mesureur.mesurer(f"import {format_}", lambda: gestion.lire_portefeuille(chemin), **contexte)
+                mesureur.mesurer(f"supprimer_actif (x{VENTES})", lambda: _ventes(portefeuille, livre, VENTES, graine),
+                                 **contexte)
+                del portefeuille
+            mesures += mesureur.mesures
+    return mesures
+
+
+def _marteler(fournisseur, symboles, clients, duree, graine):
+    # 'clients' threads demandent en boucle 5 symboles au hasard pendant 'duree' secondes
+    fin = time.monotonic() + duree
+    compteurs = {"reussies": 0, "echouees": 0}
+    verrou = threading.Lock()
+
+    def client(numero):
+        generateur = random.Random(graine + numero)
+        while time.monotonic() < fin:
+            try:
+                reussie = bool(fournisseur.prix_actuels(generateur.sample(symboles, 5)))
+            except Exception:
+                reussie = False
+            with verrou:
+                compteurs["reussies" if reussie else "echouees"] += 1
+
+    threads = [threading.Thread(target=client, args=(numero,)) for numero in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return compteurs
+
+
+def debit_planificateur(limite=10.0, clients=8, duree=5.0, latence=0.01, graine=0):
+    """
+    Débit obtenu par 'clients' threads face à un fournisseur limité à 'limite' requêtes par seconde,
+    qui bannit le client après 5 refus consécutifs : appels directs, puis via FournisseurPlanifie
+    réglé juste sous la limite. 'secondes' est le temps moyen par demande servie.
+    """
+    prix = {f"S{i:03d}": float(i + 1) for i in range(200)}
+    mesures = []
+    for mode in ("direct", "planifié"):
+        faux = gestion.FournisseurLocal(prix, nom="limite", latence=latence, limite=(limite, limite),
+                                        bannissement=5, duree_bannissement=duree / 2)
+        fournisseur = faux
+        if mode == "planifié":
+            fournisseur = gestion.FournisseurPlanifie(faux, debit=0.9 * limite, capacite=0.9 * limite,
+                                                      attente_base=0.1, delai_max=duree)
+        with contextlib.redirect_stdout(io.StringIO()):
+            compteurs = _marteler(fournisseur, list(prix), clients, duree, graine)
+        mesure = {
+            "operation": f"planificateur {mode}",
+            "secondes": duree / compteurs["reussies"] if compteurs["reussies"] else None,
+            "demandes_servies": compteurs["reussies"],
+            "demandes_echouees": compteurs["echouees"],
+            "requetes_acceptees": faux.appels,
+            "requetes_par_seconde": faux.appels / duree,
+            "refus_429": faux.refus,
+            "bannissements": faux.bannissements,
+        }
+        if mode == "planifié":
+            mesure.update(fournisseur.statistiques())
+        mesures.append(mesure)
+        print(f"{mode:<9} {compteurs['reussies']:>7} demandes servies  {compteurs['echouees']:>8} échouées  "
+              f"{faux.appels / duree:6.1f} req/s acceptées  {faux.refus:>8} refus  {faux.bannissements} bannissement(s)")
+    return mesures
+
+
+def comparer(mesures, reference, seuil=1.2):
+    """
+    Compare les temps à ceux d'un fichier de résultats précédent.
+    Retourne la liste des régressions (temps multiplié par plus de 'seuil').
+    """
+    with open(reference, encoding="utf-8") as fichier:
+        anciennes = json.load(fichier)["mesures"]
+    cle = lambda mesure: (mesure.get("taille"), mesure.get("stockage"), mesure["operation"])
+    index = {cle(mesure): mesure for mesure in anciennes}
+    regressions = []
+    for mesure in mesures:
+        ancienne = index.get(cle(mesure))
+        if ancienne is None or not ancienne["secondes"] or mesure["secondes"] is None:
+            continue
+        rapport = mesure["secondes"] / ancienne["secondes"]
+        if rapport > seuil:
+            regressions.append({**mesure, "secondes_reference": ancienne["secondes"], "rapport": rapport})
+            print(f"RÉGRESSION {cle(mesure)} : {ancienne['secondes']:.3f} s -> {mesure['secondes']:.3f} s "
+                  f"(x{rapport:.2f})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du gestionnaire de portefeuille")
+    parser.add_argument("--tailles", type=int, nargs="+", default=list(TAILLES), help="nombres de lots")
+    parser.add_argument("--stockages", nargs="+", choices=STOCKAGES, default=list(STOCKAGES))
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--latence", type=float, default=0.0, help="latence des faux fournisseurs (secondes)")
+    parser.add_argument("--sans-memoire", action="store_true",
+                        help="ne mesure pas le pic mémoire (tracemalloc ralentit le code Python)")
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--json", help="fichier où écrire les mesures")
+    parser.add_argument("--comparer", help="fichier de mesures de référence")
+    parser.add_argument("--seuil", type=float, default=1.2, help="rapport de temps signalé comme régression")
+    parser.add_argument("--planificateur", action="store_true",
+                        help="mesure le débit soutenable face à un fournisseur limité")
+    parser.add_argument("--limite", type=float, default=10.0, help="requêtes par seconde du faux fournisseur")
+    parser.add_argument("--clients", type=int, default=8, help="threads concurrents (--planificateur)")
+    parser.add_argument("--duree", type=float, default=5.0, help="durée de chaque mesure (--planificateur)")
+    arguments = parser.parse_args()
+
+    if arguments.planificateur:
+        resultats = debit_planificateur(arguments.limite, arguments.clients, arguments.duree,
+                                        arguments.latence or 0.01, arguments.graine)
+    else:
+        resultats = executer(arguments.tailles, arguments.stockages, arguments.formats, arguments.latence,
+                             not arguments.sans_memoire, arguments.graine)
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as fichier:
+            json.dump({
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "plateforme": platform.platform(),
+                "parametres": {k: v for k, v in vars(arguments).items() if k not in ("json", "comparer")},
+                "mesures": resultats,
+            }, fichier, indent=2)
+    if arguments.comparer and comparer(resultats, arguments.comparer, arguments.seuil):
+        sys.exit(1)
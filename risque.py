@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de risque du portefeuille : volatilité, VaR et CVaR paramétriques,
+historiques et Monte Carlo.
+
+Les simulations Monte Carlo sont découpées en blocs répartis sur un pool de processus.
+Chaque bloc a sa propre graine, dérivée de la graine principale : le résultat ne dépend
+ni du nombre de processus ni de l'ordre d'exécution. Seules les pires pertes de chaque
+bloc sont conservées, la mémoire reste donc bornée quel que soit le nombre de chemins.
+
+Benchmark de montée en charge :
+    python risque.py --benchmark
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import Python_simple_portfolio_manager as gestion
+
+
+# Jours de bourse par an : les rendements et les horizons sont comptés en jours ouvrés
+JOURS_PAR_AN = 252
+
+# Nombre maximal de tirages (chemins × positions) générés à la fois par bloc
+TIRAGES_PAR_BLOC = 2_000_000
+
+
+# ======================  SIMULATION (exécutée dans les processus)  ======================
+
+_parametres = {}
+
+
+def _initialiser_processus(moyenne, cholesky, expositions):
+    _parametres["moyenne"] = moyenne
+    _parametres["cholesky"] = cholesky
+    _parametres["expositions"] = expositions
+
+
+def _simuler_bloc(chemins, graine, pires):
+    """
+    Simule 'chemins' rendements log-normaux du portefeuille et retourne
+    les 'pires' PnL les plus défavorables, triés.
+    """
+    generateur = np.random.default_rng(graine)
+    tirages = generateur.standard_normal((chemins, len(_parametres["moyenne"])))
+    rendements = np.expm1(tirages @ _parametres["cholesky"].T + _parametres["moyenne"])
+    pnl = rendements @ _parametres["expositions"]
+    pires = min(pires, chemins)
+    queue = np.partition(pnl, pires - 1)[:pires] if pires < chemins else pnl
+    return np.sort(queue)
+
+
+# ======================  MOTEUR DE RISQUE  ======================
+
+class MoteurRisque:
+    """
+    Risque d'un portefeuille décrit par ses expositions (valeur actuelle par symbole)
+    et l'historique des rendements logarithmiques par jour ouvré de ces symboles (dates × symboles).
+
+    Les pertes sont exprimées en valeur positive, dans la devise des expositions.
+    """
+
+    def __init__(self, expositions, rendements, symboles=None):
+        self.expositions = np.asarray(expositions, dtype=float)
+        self.rendements = np.asarray(rendements, dtype=float)
+        self.symboles = list(symboles) if symboles is not None else list(range(len(self.expositions)))
+        self.moyenne = self.rendements.mean(axis=0)
+        self.covariance = np.atleast_2d(np.cov(self.rendements, rowvar=False))
+
+    @classmethod
+    def depuis_portefeuille(cls, portefeuille, jours=500, fin=None):
+        """
+        Construit le moteur à partir des lots du portefeuille et de 'jours' jours ouvrés d'historique.
+        Les rendements sont pris d'un jour ouvré au suivant (un lundi porte le week-end),
+        comme le suppose l'annualisation sur JOURS_PAR_AN ; les expositions sont valorisées à 'fin'.
+        Un symbole sans cotation (obligation simulée par exemple) est valorisé à son coût
+        et considéré sans risque.
+        """
+        lots = portefeuille.vers_dataframe()
+        lots["Coût"] = lots["Quantité"] * lots["Prix dachat"]
+        positions = lots.groupby(["Classe", "Nom"], sort=False)[["Quantité", "Coût"]].sum()
+        symboles = list(positions.index)
+        fin = pd.Timestamp(fin or pd.Timestamp.today().normalize())
+        ouvres = pd.bdate_range(end=fin, periods=jours + 1)
+        dates = ouvres.union([fin])
+        prix = gestion.matrice_prix_historiques(symboles, dates)
+
+        dernier_prix = prix[-1]
+        expositions = np.where(np.isnan(dernier_prix), positions["Coût"].to_numpy(),
+                               positions["Quantité"].to_numpy() * dernier_prix)
+        rendements = np.nan_to_num(np.diff(np.log(prix[dates.isin(ouvres)]), axis=0))
+        return cls(expositions, rendements, [nom for _, nom in symboles])
+
+    @property
+    def valeur(self):
+        return float(self.expositions.sum())
+
+    def _moments(self, horizon):
+        # Rendements logarithmiques supposés indépendants d'un jour à l'autre
+        moyenne = float(self.expositions @ self.moyenne) * horizon
+        ecart_type = math.sqrt(max(float(self.expositions @ self.covariance @ self.expositions), 0.0) * horizon)
+        return moyenne, ecart_type
+
+    def volatilite(self, horizon=JOURS_PAR_AN):
+        """
+        Volatilité du portefeuille sur 'horizon' jours (annuelle par défaut), en proportion de sa valeur.
+        """
+        _, ecart_type = self._moments(horizon)
+        return ecart_type / self.valeur if self.valeur else 0.0
+
+    def var_parametrique(self, confiance=0.99, horizon=1):
+        """
+        VaR et CVaR gaussiennes (variance-covariance) : retourne (var, cvar).
+        """
+        moyenne, ecart_type = self._moments(horizon)
+        loi = NormalDist()
+        z = loi.inv_cdf(confiance)
+        var = ecart_type * z - moyenne
+        cvar = ecart_type * loi.pdf(z) / (1 - confiance) - moyenne
+        return var, cvar
+
+    def var_historique(self, confiance=0.99, horizon=1):
+        """
+        VaR et CVaR historiques sur des fenêtres glissantes de 'horizon' jours : retourne (var, cvar).
+        Lève ValueError si l'historique ne contient aucune fenêtre complète.
+        """
+        if not 1 <= horizon < len(self.rendements):
+            raise ValueError(f"Historique de {len(self.rendements)} rendements trop court pour "
+                             f"une VaR historique à {horizon} jours.")
+        cumules = np.cumsum(np.vstack([np.zeros(len(self.expositions)), self.rendements]), axis=0)
+        fenetres = cumules[horizon:] - cumules[:-horizon]
+        pnl = np.expm1(fenetres) @ self.expositions
+        return _var_cvar(np.sort(pnl), confiance, len(pnl))
+
+    def var_monte_carlo(self, confiance=0.99, horizon=1, chemins=1_000_000, processus=None, graine=0,
+                        taille_bloc=None):
+        """
+        VaR et CVaR Monte Carlo avec des rendements gaussiens corrélés : retourne (var, cvar).
+
+        Les 'chemins' sont simulés par blocs sur 'processus' processus (tous les cœurs par défaut,
+        1 pour calculer dans le processus courant). À graine égale, le résultat est identique
+        quel que soit le nombre de processus.
+        """
+        nombre = len(self.expositions)
+        taille_bloc = taille_bloc or max(1000, TIRAGES_PAR_BLOC // max(nombre, 1))
+        tailles = [min(taille_bloc, chemins - debut) for debut in range(0, chemins, taille_bloc)]
+        graines = np.random.SeedSequence(graine).spawn(len(tailles))
+        pires = max(1, math.ceil(chemins * (1 - confiance)))
+
+        moyenne = self.moyenne * horizon
+        cholesky = _racine_covariance(self.covariance * horizon)
+        parametres = (moyenne, cholesky, self.expositions)
+        processus = processus or os.cpu_count() or 1
+        if processus == 1:
+            _initialiser_processus(*parametres)
+            resultats = [_simuler_bloc(taille, g, pires) for taille, g in zip(tailles, graines)]
+        else:
+            with ProcessPoolExecutor(processus, initializer=_initialiser_processus, initargs=parametres) as pool:
+                resultats = list(pool.map(_simuler_bloc, tailles, graines, [pires] * len(tailles)))
+
+        queue = np.sort(np.concatenate(resultats))[:pires]
+        return _var_cvar(queue, confiance, chemins)
+
+
+def _racine_covariance(covariance):
+    """
+    Matrice L telle que L @ L.T = covariance ; repli sur la décomposition spectrale
+    quand la covariance n'est que semi-définie (symboles sans risque, colinéarités).
+    """
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        valeurs, vecteurs = np.linalg.eigh(covariance)
+        return vecteurs * np.sqrt(np.clip(valeurs, 0, None))
+
+
+def _var_cvar(pertes_triees, confiance, total):
+    """
+    VaR et CVaR à partir des PnL les plus défavorables triés (au moins les ceil(total × (1 - confiance)) premiers).
+    """
+    pires = max(1, math.ceil(total * (1 - confiance)))
+    queue = pertes_triees[:pires]
+    return -float(queue[-1]), -float(queue.mean())
+
+
+# ======================  BENCHMARK  ======================
+
+def portefeuille_synthetique(positions, jours=500, graine=0):
+    """
+    Expositions et rendements aléatoires mais réalistes (facteur de marché commun).
+    """
+    generateur = np.random.default_rng(graine)
+    marche = generateur.normal(0.0003, 0.01, jours)
+    betas = generateur.uniform(0.5, 1.5, positions)
+    rendements = np.outer(marche, betas) + generateur.normal(0, 0.015, (jours, positions))
+    expositions = generateur.uniform(1_000, 100_000, positions)
+    return expositions, rendements
+
+
+def benchmark(chemins=(100_000, 1_000_000), positions=(10, 100, 500), processus=None, repetitions=1):
+    """
+    Mesure le temps de la VaR Monte Carlo selon le nombre de chemins, de positions et de processus.
+    Retourne une liste de mesures (dictionnaires).
+    """
+    processus = processus or sorted({1, 2, 4, os.cpu_count() or 1})
+    mesures = []
+    for nombre_positions in positions:
+        moteur = MoteurRisque(*portefeuille_synthetique(nombre_positions))
+        for nombre_chemins in chemins:
+            for nombre_processus in processus:
+                temps = []
+                for _ in range(repetitions):
+                    debut = time.perf_counter()
+                    var, cvar = moteur.var_monte_carlo(chemins=nombre_chemins, processus=nombre_processus)
+                    temps.append(time.perf_counter() - debut)
+                mesures.append({
+                    "positions": nombre_positions,
+                    "chemins": nombre_chemins,
+                    "processus": nombre_processus,
+                    "secondes": min(temps),
+                    "var_99": var,
+                    "cvar_99": cvar,
+                })
+                print(f"{nombre_positions:>5} positions  {nombre_chemins:>9} chemins  "
+                      f"{nombre_processus:>2} processus  {min(temps):8.3f} s")
+    return mesures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Moteur de risque du portefeuille")
+    parser.add_argument("--benchmark", action="store_true", help="mesure la montée en charge de la VaR Monte Carlo")
+    parser.add_argument("--chemins", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--positions", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--processus", type=int, nargs="+")
+    parser.add_argument("--json", help="fichier où écrire les mesures")
+    arguments = parser.parse_args()
+    if arguments.benchmark:
+        resultats = benchmark(arguments.chemins, arguments.positions, arguments.processus)
+        if arguments.json:
+            with open(arguments.json, "w", encoding="utf-8") as fichier:
+                json.dump(resultats, fichier, indent=2)
+    else:
+        parser.print_help()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from unittest import mock
+
+import Python_simple_portfolio_manager as gestion
+
+
+class FausseApplication:
+    """
+    Les méthodes de tâche de l'Application, sans fenêtre Tk : les widgets sont des simulacres.
+    """
+    lancer_tache = gestion.Application.lancer_tache
+    _executer_suite = staticmethod(gestion.Application._executer_suite)
+    _traiter_file = gestion.Application._traiter_file
+    _terminer_tache = gestion.Application._terminer_tache
+
+    def __init__(self):
+        self.tache = None
+        self.file_resultats = Queue()
+        self.executeur = ThreadPoolExecutor(1)
+        self.progression = {}
+        self.label_statut = mock.Mock()
+        self.btn_annuler = mock.Mock()
+        self.after = mock.Mock()
+
+    def attendre(self):
+        self.executeur.shutdown(wait=True)
+        self._traiter_file()
+
+
+class TestTaches(unittest.TestCase):
+    def setUp(self):
+        correctif = mock.patch.object(gestion, "messagebox")
+        self.messagebox = correctif.start()
+        self.addCleanup(correctif.stop)
+        self.app = FausseApplication()
+
+    def test_regroupement_par_cle(self):
+        recus = []
+        valorisation, pnl = recus.append, (lambda resultat: recus.append(("pnl", resultat)))
+        self.app.lancer_tache("rafraichissement", lambda rappel, annulation: 1, valorisation, cle="valorisation")
+        self.app.lancer_tache("rafraichissement", lambda rappel, annulation: 2, pnl, cle="pnl")
+        self.app.lancer_tache("rafraichissement", lambda rappel, annulation: 3, valorisation, cle="valorisation")
+        self.app.attendre()
+        # Le clic sur un autre bouton est refusé au lieu de recevoir le résultat d'un autre calcul
+        self.assertEqual(recus, [1, 1])
+        self.messagebox.showinfo.assert_called_once()
+
+    def test_suite_en_erreur(self):
+        def suite(resultat):
+            raise ValueError("suite en erreur")
+
+        self.app.lancer_tache("rafraichissement", lambda rappel, annulation: None, suite)
+        self.app.attendre()
+        self.messagebox.showerror.assert_called_once()
+        self.app.after.assert_called_once_with(100, self.app._traiter_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import datetime
+import io
+import unittest
+from unittest import mock
+
+import Python_simple_portfolio_manager as gestion
+
+
+class TestFournisseurEnCache(unittest.TestCase):
+    def setUp(self):
+        self.local = gestion.FournisseurLocal({"AAPL": 110.0, "MSFT": 400.0})
+        self.cache = gestion.CachePrix()
+        self.fournisseur = gestion.FournisseurEnCache(self.local, self.cache, ttl=60)
+
+    def test_symboles_absents_retenus(self):
+        for _ in range(3):
+            self.assertEqual(self.fournisseur.prix_actuels(["AAPL", "RADIE"]), {"AAPL": 110.0})
+        self.assertEqual(self.local.appels, 1)
+
+    def test_symbole_absent_redemande_apres_son_ttl(self):
+        fournisseur = gestion.FournisseurEnCache(self.local, self.cache, ttl=60, ttl_absent=0)
+        fournisseur.prix_actuels(["RADIE"])
+        fournisseur.prix_actuels(["RADIE"])
+        self.assertEqual(self.local.appels, 2)
+
+    def test_seuls_les_symboles_manquants_sont_demandes(self):
+        self.fournisseur.prix_actuels(["AAPL"])
+        self.assertEqual(self.fournisseur.prix_actuels(["AAPL", "MSFT"]), {"AAPL": 110.0, "MSFT": 400.0})
+        self.assertEqual((self.local.appels, self.local.symboles_demandes), (2, 2))
+        self.assertEqual(self.cache.statistiques()["hits"], 1)
+
+    def test_prix_expire_redemande(self):
+        fournisseur = gestion.FournisseurEnCache(self.local, self.cache, ttl=0)
+        fournisseur.prix_actuels(["AAPL"])
+        fournisseur.prix_actuels(["AAPL"])
+        self.assertEqual(self.local.appels, 2)
+
+    def test_eviction_lru(self):
+        cache = gestion.CachePrix(taille_max=2)
+        fournisseur = gestion.FournisseurEnCache(self.local, cache, ttl=60)
+        fournisseur.prix_actuels(["AAPL"])
+        fournisseur.prix_actuels(["MSFT"])
+        fournisseur.prix_actuels(["AAPL"])
+        fournisseur.prix_actuels(["RADIE"])
+        # MSFT, le moins récemment utilisé, a été évincé ; AAPL est resté en cache
+        self.assertEqual(cache.statistiques()["taille"], 2)
+        appels = self.local.appels
+        fournisseur.prix_actuels(["AAPL"])
+        self.assertEqual(self.local.appels, appels)
+        fournisseur.prix_actuels(["MSFT"])
+        self.assertEqual(self.local.appels, appels + 1)
+
+
+class TestCacheDesClasses(unittest.TestCase):
+    """
+    Avec le cache activé, les vues successives d'un portefeuille ne refont aucune requête pendant le TTL.
+    """
+
+    def setUp(self):
+        self.local = gestion.FournisseurLocal({"AAPL": 110.0, "MSFT": 400.0})
+        for correctif in (mock.patch.object(gestion.Action, "fournisseur", self.local),
+                          mock.patch.object(gestion.Obligation, "fournisseur", gestion.FournisseurLocal()),
+                          mock.patch.object(gestion.Crypto, "fournisseur", gestion.FournisseurLocal()),
+                          mock.patch.object(gestion.CHANGE, "base", None)):
+            correctif.start()
+            self.addCleanup(correctif.stop)
+        self.cache = gestion.activer_cache_prix(gestion.CachePrix())
+
+    def portefeuille(self):
+        portefeuille = gestion.Portefeuille()
+        for symbole, prix in (("AAPL", 100.0), ("MSFT", 350.0), ("AAPL", 105.0)):
+            portefeuille.ajouter_actif(gestion.Action(symbole, 1, datetime.date(2024, 1, 2), prix_achat=prix,
+                                                      resoudre_prix=False))
+        return portefeuille
+
+    def test_aucune_requete_pendant_le_ttl(self):
+        self.assertIsInstance(gestion.Action.fournisseur, gestion.FournisseurEnCache)
+        self.assertEqual(self.portefeuille().valorisation_totale(), 620.0)
+        self.assertEqual(self.local.appels, 1)
+        for _ in range(3):
+            portefeuille = self.portefeuille()
+            portefeuille.valorisation_totale()
+            portefeuille.calcul_pnl()
+            portefeuille.distribution_par_classe()
+        self.assertEqual(self.local.appels, 1)
+        self.assertEqual(self.cache.statistiques()["misses"], 2)
+        self.assertEqual(self.cache.statistiques()["hits"], 6)
+
+    def test_ttl_par_classe(self):
+        gestion.activer_cache_prix(self.cache, {"Action": 0})
+        self.assertIs(gestion.Action.fournisseur.fournisseur, self.local)
+        self.portefeuille().valorisation_totale()
+        self.portefeuille().valorisation_totale()
+        self.assertEqual(self.local.appels, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+
+import Python_simple_portfolio_manager as gestion
+
+
+class TestMatriceChange(unittest.TestCase):
+    def setUp(self):
+        self.cours = gestion.FournisseurLocal({"EURUSD=X": 1.10, "GBPUSD=X": 1.25, "BTC-USD": 60000.0}, nom="yahoo")
+        self.matrice = gestion.MatriceChange(gestion.FournisseurChange(self.cours))
+
+    def test_triangulation_en_une_requete(self):
+        facteurs = self.matrice.facteurs(["EUR", "GBP", "GBp", "BTC", None, "EUR"], "EUR")
+        np.testing.assert_allclose(facteurs, [1.0, 1.25 / 1.10, 0.0125 / 1.10, 60000 / 1.10, 1.0, 1.0])
+        self.assertEqual(self.cours.appels, 1)
+
+    def test_devise_sans_cours_exclue(self):
+        sortie = io.StringIO()
+        with contextlib.redirect_stdout(sortie):
+            facteurs = self.matrice.facteurs(["JPY", "GBP", None], "EUR")
+            self.matrice.facteurs(["JPY"], "EUR")
+        np.testing.assert_allclose(facteurs, [np.nan, 1.25 / 1.10, 1.0])
+        self.assertEqual(sortie.getvalue().count("JPY"), 1)
+        self.assertEqual(self.cours.appels, 1)
+
+    def test_devise_de_base_sans_cours(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            facteurs = self.matrice.facteurs(["EUR", "GBP"], "CHF")
+        np.testing.assert_allclose(facteurs, [np.nan, np.nan])
+
+
+class MetadonneesDistantes(gestion.FournisseurLocal):
+    """
+    Devises servies comme par Yahoo : une requête par symbole, erreur propagée.
+    """
+    devises_locales = False
+
+    def __init__(self, devises, pannes=()):
+        super().__init__(nom="yahoo", devises=devises)
+        self.pannes = set(pannes)
+        self.requetes_devises = []
+
+    def devises(self, symboles):
+        self.requetes_devises.append(list(symboles))
+        if self.pannes & set(symboles):
+            raise ConnectionError("métadonnées indisponibles")
+        return super().devises(symboles)
+
+
+class TestDevises(unittest.TestCase):
+    def setUp(self):
+        self.repertoire = tempfile.TemporaryDirectory()
+        self.stock = gestion.StockHistoriquePrix(os.path.join(self.repertoire.name, "historique.sqlite"))
+
+    def tearDown(self):
+        self.stock.fermer()
+        self.repertoire.cleanup()
+
+    def envelopper(self, fournisseur, hors_ligne=False):
+        planifie = gestion.FournisseurPlanifie(fournisseur, debit=1000, attente_base=0.0, tentatives=2,
+                                               seuil_echecs=3, secours=False)
+        return gestion.FournisseurAvecHistorique(planifie, self.stock, hors_ligne=hors_ligne), planifie
+
+    def test_une_requete_planifiee_par_symbole_puis_stockage(self):
+        distant = MetadonneesDistantes({"AIR.PA": "EUR", "AAPL": "USD"})
+        fournisseur, planifie = self.envelopper(distant)
+        self.assertEqual(fournisseur.devises(["AIR.PA", "AAPL"]), {"AIR.PA": "EUR", "AAPL": "USD"})
+        self.assertEqual(distant.requetes_devises, [["AIR.PA"], ["AAPL"]])
+        self.assertEqual(planifie.requetes, 2)
+
+        # Nouveau processus : les devises viennent du stock SQLite, sans requête
+        autre = MetadonneesDistantes({})
+        fournisseur, _ = self.envelopper(autre)
+        self.assertEqual(fournisseur.devises(["AIR.PA", "AAPL"]), {"AIR.PA": "EUR", "AAPL": "USD"})
+        self.assertEqual(autre.requetes_devises, [])
+
+    def test_erreurs_vues_par_le_disjoncteur(self):
+        distant = MetadonneesDistantes({"AAPL": "USD"}, pannes={"X1", "X2"})
+        fournisseur, planifie = self.envelopper(distant)
+        with contextlib.redirect_stdout(io.StringIO()):
+            devises = fournisseur.devises(["X1", "X2", "AAPL"])
+        self.assertEqual(devises, {})
+        self.assertEqual(planifie.disjoncteur.etat, "ouvert")
+
+    def test_paires_binance_hors_ligne(self):
+        fournisseur, _ = self.envelopper(gestion.FournisseurBinance(), hors_ligne=True)
+        self.assertEqual(fournisseur.devises(["ETHBTC", "BTCUSDT"]), {"ETHBTC": "BTC", "BTCUSDT": "USDT"})
+        distant, _ = self.envelopper(MetadonneesDistantes({"AAPL": "USD"}), hors_ligne=True)
+        self.assertEqual(distant.devises(["AAPL"]), {})
+
+
+class TestGrilleSansRequete(unittest.TestCase):
+    """
+    La grille est relue dans le thread Tk : elle ne doit ni résoudre de devise ni charger de cours.
+    """
+
+    def setUp(self):
+        self.distant = MetadonneesDistantes({"AIR.PA": "EUR", "AAPL": "USD"})
+        self.cours = gestion.FournisseurLocal({"EURUSD=X": 1.10}, nom="yahoo")
+        matrice = gestion.MatriceChange(gestion.FournisseurChange(self.cours), base="EUR")
+        for correctif in (mock.patch.object(gestion.Action, "fournisseur", self.distant),
+                          mock.patch.object(gestion, "CHANGE", matrice)):
+            correctif.start()
+            self.addCleanup(correctif.stop)
+        self.portefeuille = gestion.Portefeuille()
+        for symbole, prix in (("AIR.PA", 150.0), ("AAPL", 110.0)):
+            action = gestion.Action(symbole, 10, datetime(2024, 1, 2), prix_achat=prix)
+            action.prix_marche = prix
+            self.portefeuille.ajouter_actif(action)
+
+    def test_facteurs_inconnus_sans_requete(self):
+        table = gestion.TablePositions(self.portefeuille)
+        self.assertFalse(table.complet)
+        self.assertEqual(self.distant.requetes_devises, [])
+        self.assertEqual(self.cours.appels, 0)
+        self.assertEqual(table.lignes(0, 2)[0][6], "—")
+
+        # Chargement fait hors du thread Tk, puis simple relecture de la grille
+        self.portefeuille.facteurs_change()
+        table.recharger()
+        self.assertTrue(table.complet)
+        np.testing.assert_allclose(sorted(table.valeur), [1000.0, 1500.0])
+
+    def test_totaux_sans_montants_non_convertis(self):
+        # JPY n'a pas de cours : son lot est compté à part, pas ajouté en yens à un total en euros
+        self.distant._devises["7203.T"] = "JPY"
+        action = gestion.Action("7203.T", 100, datetime(2024, 1, 2), prix_achat=2500.0)
+        action.prix_marche = 3000.0
+        self.portefeuille.ajouter_actif(action)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertAlmostEqual(self.portefeuille.valorisation_totale(), 1500.0 + 1100.0 / 1.10)
+            self.assertEqual(self.portefeuille.lots_sans_change(), 1)
+            details, _ = self.portefeuille.calcul_pnl()
+            self.assertTrue(np.isnan(details["7203.T"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import benchmark
+import Python_simple_portfolio_manager as gestion
+
+
+class TestAllerRetour(unittest.TestCase):
+    """
+    Un portefeuille exporté puis réimporté garde les conditions de ses obligations.
+    """
+
+    def setUp(self):
+        self.repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(self.repertoire.cleanup)
+        self.portefeuille = gestion.Portefeuille()
+        self.portefeuille.ajouter_actif(gestion.Obligation(
+            "FR0000000TST", 5, datetime.date(2024, 1, 2), taux_coupon=0.035, prix_achat=98.0,
+            date_maturite=datetime.date(2030, 6, 15), frequence=2))
+        self.portefeuille.ajouter_actif(gestion.Crypto("BTCUSDT", 0.5, datetime.date(2024, 1, 3), prix_achat=40000.0,
+                                                       resoudre_prix=False))
+
+    def verifier(self, df):
+        obligation, crypto = df.iloc[0], df.iloc[1]
+        self.assertEqual(obligation["Date de maturité"], gestion.pd.Timestamp(2030, 6, 15))
+        self.assertEqual(obligation["Fréquence"], 2)
+        self.assertTrue(gestion.pd.isna(crypto["Date de maturité"]))
+        self.assertTrue(gestion.pd.isna(crypto["Fréquence"]))
+
+    def test_deux_registres(self):
+        for extension in (".csv", ".xlsx", ".parquet"):
+            with self.subTest(extension=extension):
+                fichier = os.path.join(self.repertoire.name, "portefeuille" + extension)
+                gestion.exporter_fichier(self.portefeuille, fichier)
+
+                actifs, _ = gestion.lire_portefeuille(fichier)
+                relu = gestion.Portefeuille()
+                for actif in actifs:
+                    relu.ajouter_actif(actif)
+                self.verifier(relu.vers_dataframe())
+
+                colonnaire = gestion.PortefeuilleColonnaire()
+                colonnaire.importer_fichier(fichier)
+                self.verifier(colonnaire.vers_dataframe())
+
+
+class TestLivreSynthetique(unittest.TestCase):
+    def test_ecriture_et_relecture(self):
+        livre, _ = benchmark.livre_synthetique(200)
+        with tempfile.TemporaryDirectory() as repertoire:
+            for extension in (".csv", ".xlsx", ".parquet"):
+                with self.subTest(extension=extension):
+                    fichier = os.path.join(repertoire, "livre" + extension)
+                    benchmark.ecrire_fichier_synthetique(livre, fichier)
+                    portefeuille = gestion.PortefeuilleColonnaire()
+                    with mock.patch.object(gestion.PortefeuilleColonnaire, "resoudre_prix_achat"):
+                        rapport = portefeuille.importer_fichier(fichier)
+                    self.assertEqual(rapport.nombre, 0)
+                    relu = portefeuille.vers_dataframe()
+                    self.assertEqual(relu["Nom"].tolist(), livre["Nom"].tolist())
+                    self.assertEqual(relu["Quantité"].tolist(), livre["Quantité"].tolist())
+                    self.assertEqual(relu["Prix dachat"].tolist(), livre["Prix dachat"].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
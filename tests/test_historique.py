@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import Python_simple_portfolio_manager as gestion
+
+
+class TestSynchronisation(unittest.TestCase):
+    def setUp(self):
+        self.repertoire = tempfile.TemporaryDirectory()
+        self.stock = gestion.StockHistoriquePrix(os.path.join(self.repertoire.name, "historique.sqlite"))
+        dates = pd.date_range("2020-01-01", "2024-06-30", freq="D")
+        serie = pd.Series(range(len(dates)), index=dates, dtype=float)
+        self.local = gestion.FournisseurLocal(historiques={"AAA": serie})
+        self.fournisseur = gestion.FournisseurAvecHistorique(self.local, self.stock)
+
+    def tearDown(self):
+        self.stock.fermer()
+        self.repertoire.cleanup()
+
+    def test_demandes_disjointes_sans_trou(self):
+        self.fournisseur.historique("AAA", datetime.date(2020, 1, 1), datetime.date(2020, 1, 5))
+        self.fournisseur.historique("AAA", datetime.date(2024, 6, 1), datetime.date(2024, 6, 5))
+        serie = self.fournisseur.historique("AAA", datetime.date(2020, 1, 1), datetime.date(2024, 6, 5))
+        attendu = len(pd.date_range("2020-01-01", "2024-06-04", freq="D"))
+        self.assertEqual(len(serie), attendu)
+
+    def test_demande_anterieure_sans_trou(self):
+        self.fournisseur.historique("AAA", datetime.date(2024, 6, 1), datetime.date(2024, 6, 5))
+        self.fournisseur.historique("AAA", datetime.date(2020, 1, 1), datetime.date(2020, 1, 5))
+        serie = self.fournisseur.historique("AAA", datetime.date(2020, 1, 1), datetime.date(2024, 6, 5))
+        self.assertEqual(len(serie), len(pd.date_range("2020-01-01", "2024-06-04", freq="D")))
+
+    def test_periode_couverte_non_redemandee(self):
+        self.fournisseur.historique("AAA", datetime.date(2020, 1, 1), datetime.date(2020, 2, 1))
+        appels = self.local.appels
+        self.fournisseur.historique("AAA", datetime.date(2020, 1, 10), datetime.date(2020, 1, 20))
+        self.assertEqual(self.local.appels, appels)
+
+
+class TestSerieHistorique(unittest.TestCase):
+    """
+    Chaque lot compte à partir de sa date de transaction ; un symbole sans cotation est valorisé à son coût.
+    """
+
+    def setUp(self):
+        jours = pd.date_range("2024-01-01", "2024-01-10", freq="D")
+        self.local = gestion.FournisseurLocal(historiques={"AAPL": pd.Series(np.arange(100.0, 110.0), jours)})
+        correctif = mock.patch.object(gestion.Action, "fournisseur", self.local)
+        correctif.start()
+        self.addCleanup(correctif.stop)
+        self.portefeuille = gestion.Portefeuille()
+        for symbole, quantite, date, prix in (("AAPL", 10, datetime.date(2024, 1, 2), 100.0),
+                                              ("MSFT", 2, datetime.date(2024, 1, 4), 50.0),
+                                              ("AAPL", 5, datetime.date(2024, 1, 5), 104.0)):
+            self.portefeuille.ajouter_actif(gestion.Action(symbole, quantite, date, prix_achat=prix,
+                                                           resoudre_prix=False))
+
+    def test_positions_datees(self):
+        serie = gestion.SerieHistorique(self.portefeuille).calculer(fin=datetime.date(2024, 1, 6))
+        self.assertEqual(list(serie.index), list(pd.date_range("2024-01-02", "2024-01-06")))
+        np.testing.assert_allclose(serie["valeur"], [1010.0, 1020.0, 1130.0, 1660.0, 1675.0])
+        np.testing.assert_allclose(serie["cout"], [1000.0, 1000.0, 1100.0, 1620.0, 1620.0])
+        np.testing.assert_allclose(serie["apport"], [1000.0, 0.0, 100.0, 520.0, 0.0])
+        np.testing.assert_allclose(serie["pnl"], [10.0, 20.0, 30.0, 40.0, 55.0])
+        # Les achats du jour ne sont pas comptés comme rendement
+        np.testing.assert_allclose(serie["rendement"], [0.0, 1020 / 1010 - 1, 1030 / 1020 - 1,
+                                                        1140 / 1130 - 1, 1675 / 1660 - 1])
+        self.assertAlmostEqual(serie["indice"].iloc[-1], np.prod(1 + serie["rendement"]))
+        # Une requête d'historique par symbole
+        self.assertEqual(self.local.appels, 2)
+
+    def test_mise_a_jour_incrementale(self):
+        serie = gestion.SerieHistorique(self.portefeuille)
+        serie.calculer(fin=datetime.date(2024, 1, 6))
+        serie.mettre_a_jour(fin=datetime.date(2024, 1, 8))
+        self.assertEqual(self.local.appels, 4)
+        serie.mettre_a_jour(fin=datetime.date(2024, 1, 8))
+        self.assertEqual(self.local.appels, 4)
+        complete = gestion.SerieHistorique(self.portefeuille).calculer(fin=datetime.date(2024, 1, 8))
+        self.assertEqual(list(serie.serie.index), list(complete.index))
+        pd.testing.assert_frame_equal(serie.serie, complete, check_freq=False, check_index_type=False)
+
+    def test_recalcul_si_les_lots_changent(self):
+        serie = gestion.SerieHistorique(self.portefeuille)
+        serie.calculer(fin=datetime.date(2024, 1, 6))
+        self.portefeuille.ajouter_actif(gestion.Action("AAPL", 1, datetime.date(2024, 1, 3), prix_achat=102.0,
+                                                       resoudre_prix=False))
+        resultat = serie.mettre_a_jour(fin=datetime.date(2024, 1, 6))
+        self.assertEqual(resultat["valeur"].iloc[1], 1122.0)
+        self.assertEqual(self.local.appels, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import Python_simple_portfolio_manager as gestion
+
+CONTENU = """Classe,Nom,Quantité,Prix dachat,Date de transaction
+Action,AAPL,10,100,2024-01-02
+Action,MSFT,dix,350,2024-01-02
+Action,MSFT,5,350,pas une date
+Option,XYZ,1,5,2024-01-02
+Action,AAPL,5,,2024-01-03
+Crypto,BTCUSDT,0.5,,2024-01-06
+Action,AAPL,2,,2024-01-06
+"""
+
+
+class TestRapportImport(unittest.TestCase):
+    """
+    Les lignes invalides sont décrites dans un rapport unique, les lignes valides importées,
+    et les prix d'achat manquants résolus en une requête d'historique par symbole.
+    """
+
+    def setUp(self):
+        repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(repertoire.cleanup)
+        self.fichier = os.path.join(repertoire.name, "portefeuille.csv")
+        with open(self.fichier, "w", encoding="utf-8") as f:
+            f.write(CONTENU)
+        jours = pd.date_range("2024-01-02", "2024-01-05")
+        self.actions = gestion.FournisseurLocal(historiques={"AAPL": pd.Series([101.0, 102.0, 103.0, 104.0], jours)})
+        self.cryptos = gestion.FournisseurLocal(historiques={"BTCUSDT": pd.Series([4e4, 41e3, 42e3, 43e3], jours)})
+        for correctif in (mock.patch.object(gestion.Action, "fournisseur", self.actions),
+                          mock.patch.object(gestion.Crypto, "fournisseur", self.cryptos)):
+            correctif.start()
+            self.addCleanup(correctif.stop)
+
+    def verifier_rapport(self, rapport):
+        self.assertEqual(rapport.nombre, 3)
+        self.assertEqual(rapport.messages, ["Ligne 1: Quantité invalide, ignorée.",
+                                            "Ligne 2: Date de transaction invalide, ignorée.",
+                                            "Ligne 3: Classe 'Option' inconnue, ignorée."])
+
+    def test_lire_portefeuille(self):
+        actifs, rapport = gestion.lire_portefeuille(self.fichier, taille_bloc=2)
+        self.verifier_rapport(rapport)
+        self.assertEqual([(actif.nom, actif.quantite) for actif in actifs],
+                         [("AAPL", 10), ("AAPL", 5), ("BTCUSDT", 0.5), ("AAPL", 2)])
+        # Le prix d'achat d'un samedi est la clôture de la veille
+        self.assertEqual([actif.prix_achat for actif in actifs], [100.0, 102.0, 43e3, 104.0])
+        self.assertEqual((self.actions.appels, self.cryptos.appels), (1, 1))
+
+    def test_import_colonnaire(self):
+        portefeuille = gestion.PortefeuilleColonnaire()
+        rapport = portefeuille.importer_fichier(self.fichier, taille_bloc=2)
+        self.verifier_rapport(rapport)
+        self.assertEqual(portefeuille.taille, 4)
+        np.testing.assert_allclose(np.sort(portefeuille.prix_achat[:portefeuille.taille]),
+                                   [100.0, 102.0, 104.0, 43e3])
+        self.assertEqual((self.actions.appels, self.cryptos.appels), (1, 1))
+
+    def test_colonne_manquante(self):
+        with open(self.fichier, "w", encoding="utf-8") as f:
+            f.write("Classe,Nom,Quantité\nAction,AAPL,10\n")
+        with self.assertRaisesRegex(ValueError, "Prix dachat"):
+            gestion.lire_portefeuille(self.fichier)
+
+    def test_messages_bornes(self):
+        rapport = gestion.RapportImport(max_messages=2)
+        for numero in range(5):
+            rapport.ajouter(f"Ligne {numero}: Quantité invalide, ignorée.")
+        self.assertEqual((rapport.nombre, len(rapport.messages)), (5, 2))
+        self.assertTrue(rapport.resume(lignes=2).endswith("... et 3 autre(s) ligne(s) ignorée(s)."))
+
+
+if __name__ == "__main__":
+    unittest.main()
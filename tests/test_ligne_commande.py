@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import json
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import Python_simple_portfolio_manager as gestion
+
+
+class TestLotsSansPrix(unittest.TestCase):
+    """
+    Un symbole sans prix de marché est compté à part et ne rend pas les totaux NaN.
+    """
+
+    def setUp(self):
+        self.repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(self.repertoire.cleanup)
+        self.fichier = os.path.join(self.repertoire.name, "portefeuille.csv")
+        with open(self.fichier, "w", encoding="utf-8") as f:
+            f.write("Classe,Nom,Quantité,Date de transaction,Prix dachat\n"
+                    "Action,AAPL,10,2024-01-02,100\n"
+                    "Action,INCONNU,5,2024-01-02,20\n"
+                    "Action,INCONNU,5,2024-01-03,22\n")
+        fournisseur = gestion.FournisseurLocal({"AAPL": 110.0})
+        for correctif in (mock.patch.object(gestion.Action, "fournisseur", fournisseur),
+                          mock.patch.object(gestion.CHANGE, "base", None)):
+            correctif.start()
+            self.addCleanup(correctif.stop)
+
+    def test_resultat_et_json_strict(self):
+        sortie = io.StringIO()
+        with contextlib.redirect_stdout(sortie):
+            resultat = gestion.traiter_fichier("pnl", self.fichier)
+        # Une seule demande du symbole sans prix : la mise à jour, pas chaque total
+        self.assertEqual(sortie.getvalue().count("Aucune donnée trouvée pour INCONNU"), 1)
+        self.assertEqual(resultat["lots_sans_prix"], 2)
+        self.assertEqual(resultat["valorisation"], 1100.0)
+        self.assertEqual(resultat["pnl"], 100.0)
+        self.assertTrue(math.isnan(resultat["pnl_par_symbole"]["INCONNU"]))
+
+        texte = json.dumps(gestion._sans_nan([resultat]), allow_nan=False)
+        self.assertIsNone(json.loads(texte)[0]["pnl_par_symbole"]["INCONNU"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import threading
+import unittest
+
+import Python_simple_portfolio_manager as gestion
+
+
+class FournisseurEnPanne(gestion.FournisseurLocal):
+    """
+    Échoue (erreur réseau) tant que 'en_panne' est vrai ; chaque tentative est comptée dans 'appels'.
+    """
+
+    def __init__(self, prix):
+        super().__init__(prix)
+        self.en_panne = False
+
+    def prix_actuels(self, symboles):
+        if self.en_panne:
+            self.appels += 1
+            raise ConnectionError("fournisseur injoignable")
+        return super().prix_actuels(symboles)
+
+
+class FournisseurRetenu(gestion.FournisseurLocal):
+    """
+    Retient chaque requête de prix jusqu'à 'liberation'.
+    """
+
+    def __init__(self, prix):
+        super().__init__(prix)
+        self.en_requete = threading.Event()
+        self.liberation = threading.Event()
+
+    def prix_actuels(self, symboles):
+        self.en_requete.set()
+        self.liberation.wait(5)
+        return super().prix_actuels(symboles)
+
+
+def planifier(fournisseur, **options):
+    return gestion.FournisseurPlanifie(fournisseur, **{"debit": 1000, "attente_base": 0.0, **options})
+
+
+class TestDedoublonnage(unittest.TestCase):
+    def test_symbole_en_vol_demande_une_fois(self):
+        local = FournisseurRetenu({"AAPL": 110.0, "MSFT": 400.0})
+        planifie = planifier(local)
+        resultats = []
+        premier = threading.Thread(target=lambda: resultats.append(planifie.prix_actuels(["AAPL"])))
+        premier.start()
+        self.assertTrue(local.en_requete.wait(5))
+        local.en_requete.clear()
+        second = threading.Thread(target=lambda: resultats.append(planifie.prix_actuels(["AAPL", "MSFT"])))
+        second.start()
+        # Le second thread ne redemande que MSFT et attend le résultat en vol pour AAPL
+        self.assertTrue(local.en_requete.wait(5))
+        local.liberation.set()
+        premier.join(5)
+        second.join(5)
+        self.assertEqual(local.appels, 2)
+        self.assertEqual(local.symboles_demandes, 2)
+        self.assertEqual(planifie.dedoublonnes, 1)
+        self.assertIn({"AAPL": 110.0, "MSFT": 400.0}, resultats)
+
+
+class TestReessais(unittest.TestCase):
+    def test_limite_depassee_puis_reessai(self):
+        local = gestion.FournisseurLocal({"AAPL": 110.0, "MSFT": 400.0}, limite=(20.0, 1))
+        planifie = planifier(local, tentatives=3, attente_base=0.01)
+        planifie.prix_actuels(["AAPL"])
+        self.assertEqual(planifie.prix_actuels(["MSFT"]), {"MSFT": 400.0})
+        self.assertEqual((local.appels, local.refus), (2, 1))
+        self.assertEqual((planifie.requetes, planifie.reessais), (3, 1))
+        self.assertEqual(planifie.disjoncteur.etat, "fermé")
+
+    def test_client_banni_sert_les_derniers_prix(self):
+        local = gestion.FournisseurLocal({"AAPL": 110.0}, limite=(20.0, 1), bannissement=1)
+        planifie = planifier(local, tentatives=2, attente_base=0.01)
+        planifie.prix_actuels(["AAPL"])
+        local.prix["AAPL"] = 120.0
+        with contextlib.redirect_stdout(io.StringIO()) as sortie:
+            self.assertEqual(planifie.prix_actuels(["AAPL"]), {"AAPL": 110.0})
+        self.assertIn("banni", sortie.getvalue())
+        self.assertEqual((local.appels, local.refus, local.bannissements), (1, 2, 1))
+        self.assertEqual(planifie.servis_en_secours, 1)
+
+
+class TestDisjoncteur(unittest.TestCase):
+    def setUp(self):
+        self.local = FournisseurEnPanne({"AAPL": 110.0})
+        self.planifie = planifier(self.local, tentatives=1, seuil_echecs=2, delai_reouverture=60.0)
+        self.planifie.prix_actuels(["AAPL"])
+        self.local.en_panne = True
+
+    def test_ouverture_apres_le_seuil(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(5):
+                self.assertEqual(self.planifie.prix_actuels(["AAPL"]), {"AAPL": 110.0})
+        # Deux échecs ouvrent le circuit : les trois vues suivantes n'envoient aucune requête
+        self.assertEqual(self.local.appels, 3)
+        self.assertEqual(self.planifie.disjoncteur.etat, "ouvert")
+        self.assertEqual(self.planifie.servis_en_secours, 5)
+
+    def test_requete_d_essai_referme_le_circuit(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(2):
+                self.planifie.prix_actuels(["AAPL"])
+        self.planifie.disjoncteur.delai_reouverture = 0.0
+        self.assertEqual(self.planifie.disjoncteur.etat, "semi-ouvert")
+        self.local.en_panne = False
+        self.local.prix["AAPL"] = 120.0
+        self.assertEqual(self.planifie.prix_actuels(["AAPL"]), {"AAPL": 120.0})
+        self.assertEqual(self.planifie.disjoncteur.etat, "fermé")
+
+    def test_echec_de_l_essai_rouvre_le_circuit(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(2):
+                self.planifie.prix_actuels(["AAPL"])
+            self.planifie.disjoncteur.delai_reouverture = 0.0
+            self.planifie.prix_actuels(["AAPL"])
+        self.planifie.disjoncteur.delai_reouverture = 60.0
+        self.assertEqual(self.planifie.disjoncteur.etat, "ouvert")
+        self.assertEqual(self.local.appels, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import datetime
+import io
+import math
+import threading
+import unittest
+from unittest import mock
+
+import Python_simple_portfolio_manager as gestion
+
+
+class TestRequetesGroupees(unittest.TestCase):
+    """
+    Une mise à jour des prix envoie une seule requête par fournisseur, pour ses symboles distincts.
+    """
+
+    def setUp(self):
+        self.actions = gestion.FournisseurLocal({"AAPL": 110.0, "MSFT": 400.0}, nom="yahoo")
+        self.cryptos = gestion.FournisseurLocal({"BTCUSDT": 60000.0}, nom="binance")
+        for correctif in (mock.patch.object(gestion.Action, "fournisseur", self.actions),
+                          mock.patch.object(gestion.Crypto, "fournisseur", self.cryptos)):
+            correctif.start()
+            self.addCleanup(correctif.stop)
+        date = datetime.date(2024, 1, 2)
+        self.portefeuilles = gestion.Portefeuille(), gestion.PortefeuilleColonnaire()
+        for portefeuille in self.portefeuilles:
+            for _ in range(3):
+                portefeuille.ajouter_actif(gestion.Action("AAPL", 1, date, prix_achat=100.0, resoudre_prix=False))
+                portefeuille.ajouter_actif(gestion.Action("MSFT", 1, date, prix_achat=350.0, resoudre_prix=False))
+                portefeuille.ajouter_actif(gestion.Crypto("BTCUSDT", 0.1, date, prix_achat=50000.0,
+                                                          resoudre_prix=False))
+
+    def test_une_requete_par_fournisseur(self):
+        for portefeuille in self.portefeuilles:
+            with self.subTest(portefeuille=type(portefeuille).__name__):
+                self.actions.appels = self.actions.symboles_demandes = 0
+                self.cryptos.appels = self.cryptos.symboles_demandes = 0
+                avancement = []
+                portefeuille.mise_a_jour_prix_actifs(rappel=lambda fait, total, symbole: avancement.append(fait))
+                self.assertEqual((self.actions.appels, self.actions.symboles_demandes), (1, 2))
+                self.assertEqual((self.cryptos.appels, self.cryptos.symboles_demandes), (1, 1))
+                self.assertEqual(avancement, [1, 2, 3])
+                with mock.patch.object(gestion.CHANGE, "base", None):
+                    self.assertAlmostEqual(portefeuille.valorisation_totale(), 3 * (110.0 + 400.0 + 6000.0))
+                # Les prix ont été reportés sur tous les lots : les totaux ne redemandent rien
+                self.assertEqual(self.actions.appels + self.cryptos.appels, 2)
+
+
+class TestLotsSansPrix(unittest.TestCase):
+    """
+    Les totaux calculés par la tâche de fond ne lèvent pas d'erreur sur un lot sans prix :
+    ils l'excluent, comme le stockage colonnaire, après une seule requête par fournisseur.
+    """
+
+    def setUp(self):
+        self.fournisseur = gestion.FournisseurLocal({"AAPL": 110.0})
+        for correctif in (mock.patch.object(gestion.Action, "fournisseur", self.fournisseur),
+                          mock.patch.object(gestion.CHANGE, "base", None)):
+            correctif.start()
+            self.addCleanup(correctif.stop)
+        self.portefeuilles = gestion.Portefeuille(), gestion.PortefeuilleColonnaire()
+        for portefeuille in self.portefeuilles:
+            for symbole, quantite, prix in (("AAPL", 10, 100.0), ("INCONNU", 5, 20.0), ("INCONNU", 5, 22.0)):
+                portefeuille.ajouter_actif(gestion.Action(symbole, quantite, datetime.date(2024, 1, 2),
+                                                          prix_achat=prix, resoudre_prix=False))
+
+    def test_totaux_identiques_sans_erreur(self):
+        for portefeuille in self.portefeuilles:
+            with self.subTest(portefeuille=type(portefeuille).__name__):
+                appels = self.fournisseur.appels
+                with contextlib.redirect_stdout(io.StringIO()):
+                    valorisation = portefeuille.valorisation_totale()
+                    details, pnl = portefeuille.calcul_pnl()
+                    distribution = portefeuille.distribution_par_classe()
+                self.assertEqual(valorisation, 1100.0)
+                self.assertEqual(pnl, 100.0)
+                self.assertTrue(math.isnan(details["INCONNU"]))
+                self.assertEqual(distribution, {"Action": 1100.0})
+                self.assertEqual(portefeuille.lots_sans_prix(), 2)
+                # Le symbole sans prix n'est demandé qu'une fois, pas à chaque total
+                self.assertEqual(self.fournisseur.appels - appels, 1)
+
+
+class FournisseurBloquant(gestion.FournisseurLocal):
+    """
+    Retient la première requête de prix jusqu'à 'liberation', pour ajouter des lots pendant un calcul.
+    """
+
+    def __init__(self, prix):
+        super().__init__(prix)
+        self.en_requete = threading.Event()
+        self.liberation = threading.Event()
+
+    def prix_actuels(self, symboles):
+        if not self.en_requete.is_set():
+            self.en_requete.set()
+            self.liberation.wait(5)
+        return super().prix_actuels(symboles)
+
+
+class TestCalculConcurrent(unittest.TestCase):
+    def test_ajout_pendant_un_calcul(self):
+        fournisseur = FournisseurBloquant({"AAPL": 110.0})
+        portefeuille = gestion.Portefeuille()
+        with mock.patch.object(gestion.Action, "fournisseur", fournisseur), \
+                mock.patch.object(gestion.CHANGE, "base", None):
+            portefeuille.ajouter_actif(gestion.Action("AAPL", 10, datetime.date(2024, 1, 2), prix_achat=100.0,
+                                                      resoudre_prix=False))
+            resultats = []
+            calcul = threading.Thread(target=lambda: resultats.append(portefeuille.valorisation_totale()))
+            calcul.start()
+            self.assertTrue(fournisseur.en_requete.wait(5))
+            # Le verrou n'est pas tenu pendant la requête : l'ajout n'attend pas la fin du calcul
+            for jour in range(1, 101):
+                lot = gestion.Action("AAPL", 1, datetime.date(2024, 2, 1) - datetime.timedelta(days=jour),
+                                     prix_achat=100.0, resoudre_prix=False)
+                lot.prix_marche = 110.0
+                portefeuille.ajouter_actif(lot)
+            fournisseur.liberation.set()
+            calcul.join(5)
+        self.assertEqual(resultats, [110.0 * 110])
+
+
+if __name__ == "__main__":
+    unittest.main()
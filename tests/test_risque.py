@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import datetime
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import Python_simple_portfolio_manager as gestion
+import risque
+
+
+class TestDepuisPortefeuille(unittest.TestCase):
+    def test_rendements_par_jour_ouvre(self):
+        # Action cotée les jours ouvrés, en hausse de 1 % par séance
+        seances = pd.bdate_range("2024-01-01", "2024-06-28")
+        serie = pd.Series(100 * 1.01 ** np.arange(len(seances)), index=seances)
+        fournisseur = gestion.FournisseurLocal(historiques={"AAPL": serie})
+        with mock.patch.object(gestion.Action, "fournisseur", fournisseur):
+            portefeuille = gestion.Portefeuille()
+            portefeuille.ajouter_actif(gestion.Action("AAPL", 10, datetime.date(2024, 1, 2), prix_achat=100.0,
+                                                      resoudre_prix=False))
+            moteur = risque.MoteurRisque.depuis_portefeuille(portefeuille, jours=20, fin="2024-06-30")
+
+        # Aucun rendement nul de week-end : la moyenne annualisée sur 252 jours reste celle de la série
+        self.assertEqual(len(moteur.rendements), 20)
+        np.testing.assert_allclose(moteur.rendements, np.log(1.01))
+        np.testing.assert_allclose(moteur.expositions, [10 * serie.iloc[-1]])
+
+
+class TestVarHistorique(unittest.TestCase):
+    def setUp(self):
+        rendements = np.log(1 + np.array([[-0.05], [0.01], [-0.02], [0.03]]))
+        self.moteur = risque.MoteurRisque(np.array([1000.0]), rendements)
+
+    def test_pire_fenetre(self):
+        var, cvar = self.moteur.var_historique(confiance=0.75, horizon=3)
+        self.assertAlmostEqual(var, 1000 * (1 - 0.95 * 1.01 * 0.98))
+        self.assertGreaterEqual(cvar, var)
+
+    def test_historique_trop_court(self):
+        for horizon in (0, 4, 10):
+            with self.subTest(horizon=horizon), self.assertRaisesRegex(ValueError, "trop court"):
+                self.moteur.var_historique(horizon=horizon)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import datetime
+import io
+import time
+import unittest
+
+import Python_simple_portfolio_manager as gestion
+
+
+class FluxEnPanne:
+    nom = "panne"
+
+    async def ticks(self, symboles):
+        raise ConnectionError("réseau indisponible")
+        yield
+
+
+class TestDiffusionTempsReel(unittest.TestCase):
+    def setUp(self):
+        self.flux = gestion.Action.flux
+        self.portefeuille = gestion.Portefeuille()
+        self.portefeuille.ajouter_actif(gestion.Action("AAA", 1, datetime.date(2024, 1, 2), 10.0))
+
+    def tearDown(self):
+        gestion.Action.flux = self.flux
+
+    def test_arret_apres_erreur_du_flux(self):
+        gestion.Action.flux = FluxEnPanne()
+        diffusion = gestion.DiffusionTempsReel(gestion.PositionsTempsReel(self.portefeuille))
+        with contextlib.redirect_stdout(io.StringIO()):
+            diffusion.demarrer()
+            diffusion._thread.join(2)
+        self.assertIsInstance(diffusion.erreur, ConnectionError)
+        diffusion.arreter()  # la boucle est fermée : ne doit pas lever
+        diffusion.arreter()
+
+    def test_arret_pendant_le_rejeu(self):
+        gestion.Action.flux = gestion.FluxRejeu(cadence=1000)
+        diffusion = gestion.DiffusionTempsReel(gestion.PositionsTempsReel(self.portefeuille))
+        diffusion.demarrer()
+        time.sleep(0.2)
+        diffusion.arreter()
+        self.assertFalse(diffusion._thread.is_alive())
+        self.assertGreater(diffusion.etat()[3], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import datetime
+import io
+import random
+import unittest
+from unittest import mock
+
+import Python_simple_portfolio_manager as gestion
+
+
+def lot(quantite, jour, prix_achat):
+    return gestion.Action("AAPL", quantite, datetime.date(2024, 1, 1) + datetime.timedelta(days=jour),
+                          prix_achat=prix_achat, resoudre_prix=False)
+
+
+class TestVentes(unittest.TestCase):
+    def setUp(self):
+        correctif = mock.patch.object(gestion.CHANGE, "base", None)
+        correctif.start()
+        self.addCleanup(correctif.stop)
+        self.portefeuille = gestion.Portefeuille()
+        # Le lot le plus récent est ajouté en premier : la file reste triée par date
+        self.portefeuille.ajouter_actif(lot(10, 31, 120.0))
+        self.portefeuille.ajouter_actif(lot(10, 0, 100.0))
+
+    def vendre(self, quantite, methode):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.portefeuille.supprimer_actif("AAPL", quantite, methode=methode, prix_vente=130.0)
+
+    def restants(self):
+        return [(l.quantite, l.prix_achat) for l in self.portefeuille.lots("AAPL")]
+
+    def test_fifo(self):
+        self.assertEqual(self.vendre(15, "FIFO"), 10 * 30 + 5 * 10)
+        self.assertEqual(self.restants(), [(5, 120.0)])
+
+    def test_lifo(self):
+        self.assertEqual(self.vendre(15, "LIFO"), 10 * 10 + 5 * 30)
+        self.assertEqual(self.restants(), [(5, 100.0)])
+
+    def test_pmp(self):
+        self.assertEqual(self.vendre(15, "PMP"), 15 * 20)
+        self.assertEqual(self.restants(), [(5, 110.0)])
+
+    def test_ventes_successives_puis_totale(self):
+        self.vendre(5, "FIFO")
+        self.vendre(None, "FIFO")
+        self.assertEqual(self.portefeuille.lots("AAPL"), [])
+        self.assertEqual(self.portefeuille.calcul_pnl_realise(), ({"AAPL": 5 * 30 + 5 * 30 + 10 * 10}, 400.0))
+
+    def test_methode_inconnue(self):
+        with self.assertRaises(ValueError):
+            self.vendre(1, "HIFO")
+
+
+class TestAjoutEnBloc(unittest.TestCase):
+    def test_meme_ordre_que_les_ajouts_unitaires(self):
+        generateur = random.Random(0)
+        actifs = [gestion.Action(f"S{generateur.randrange(5)}", 1, datetime.date(2024, 1, 1)
+                                 + datetime.timedelta(days=generateur.randrange(30)), prix_achat=float(i),
+                                 resoudre_prix=False) for i in range(2000)]
+        un_a_un, en_bloc = gestion.Portefeuille(), gestion.Portefeuille()
+        for actif in actifs[:500]:
+            un_a_un.ajouter_actif(actif)
+            en_bloc.ajouter_actif(actif)
+        for actif in actifs[500:]:
+            un_a_un.ajouter_actif(actif)
+        en_bloc.ajouter_actifs(actifs[500:])
+        self.assertEqual(en_bloc.actifs, un_a_un.actifs)
+        for symbole in {actif.nom for actif in actifs}:
+            self.assertEqual(en_bloc.lots(symbole), un_a_un.lots(symbole))
+
+
+if __name__ == "__main__":
+    unittest.main()